@@ -63,9 +63,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
-    'ghg.arcjet_simulation.ArcjetSimulatorMiddleware',  # Arcjet security simulation
-    'ghg.middleware.SecurityHeadersMiddleware',  # Custom security headers
-    'ghg.middleware.RateLimitMiddleware',  # Rate limiting
+    # Arcjet simulation, rate limiting, security logging and headers
+    'ghg.middleware.SecurityPipelineMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,7 +72,6 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'ghg.middleware.SecurityLoggingMiddleware',  # Security logging
 ]
 
 ROOT_URLCONF = 'carbon_tracker.urls'
@@ -261,7 +259,9 @@ LOGGING = {
             'formatter': 'verbose' if DEBUG else 'simple',
         },
         'security_file': {
-            'class': 'logging.FileHandler',
+            # Every worker appends to the same file; logrotate renames it and the
+            # handler reopens the new file (see SECURITY.md)
+            'class': 'logging.handlers.WatchedFileHandler',
             'filename': BASE_DIR / 'logs' / 'security.log',
             'formatter': 'security',
         },
@@ -328,17 +328,30 @@ RATELIMIT_ENABLE = True
 RATELIMIT_USE_CACHE = 'default'
 
 # Cache Configuration
+# Shared by all worker processes on the host (rate limits, lockouts, API responses)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': 'ghg.cache_backends.SQLiteCache',
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache' / 'default.sqlite3')),
         'TIMEOUT': 300,
         'OPTIONS': {
-            'MAX_ENTRIES': 1000,
+            'MAX_ENTRIES': 50000,
+            'MAX_BYTES': 128 * 1024 * 1024,
         }
     }
 }
 
+# Background report jobs (see ghg.report_jobs and the run_report_worker command)
+REPORT_JOB_ROOT = config('REPORT_JOB_ROOT', default=str(BASE_DIR / 'reports'))
+REPORT_JOB_RETENTION_HOURS = config('REPORT_JOB_RETENTION_HOURS', default=24, cast=int)
+REPORT_JOB_STALE_SECONDS = config('REPORT_JOB_STALE_SECONDS', default=600, cast=int)
+REPORT_JOB_MAX_ATTEMPTS = 3
+REPORT_JOB_MAX_ACTIVE_PER_USER = 5
+
+# Rendered reports kept for repeat downloads (see ghg.report_cache)
+REPORT_CACHE_ROOT = config('REPORT_CACHE_ROOT', default=str(BASE_DIR / 'cache' / 'reports'))
+REPORT_CACHE_MAX_BYTES = config('REPORT_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int)
+
 # Arcjet Security Configuration
 ARCJET_KEY = config('ARCJET_KEY', default='')
 ARCJET_MODE = config('ARCJET_MODE', default='SIMULATION')  # SIMULATION, DRY_RUN, or LIVE
@@ -0,0 +1,29 @@
+"""
+Settings for running the test suite:
+
+    python manage.py test --settings=carbon_tracker.test_settings
+
+(or DJANGO_SETTINGS_MODULE=carbon_tracker.test_settings for other runners).
+
+The cache, report jobs and cached reports live in a private temporary
+directory, so rate limits and lockouts do not carry over between runs or
+into the shared cache files.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+_test_cache_dir = tempfile.mkdtemp(prefix='carbon-tracker-cache-')
+atexit.register(shutil.rmtree, _test_cache_dir, ignore_errors=True)
+
+CACHES = {
+    **CACHES,
+    'default': {**CACHES['default'], 'LOCATION': os.path.join(_test_cache_dir, 'cache.sqlite3')},
+}
+REPORT_JOB_ROOT = os.path.join(_test_cache_dir, 'reports')
+REPORT_CACHE_ROOT = os.path.join(_test_cache_dir, 'report-cache')
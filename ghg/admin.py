@@ -4,16 +4,17 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
 from django.utils import timezone
 from django.urls import reverse
+from django.db import transaction
 from django.db.models import Sum, Count, Q
-from django.http import HttpResponse
 from datetime import datetime, timedelta
-import csv
 import json
 
 from .models import (
     Country, EmissionData, EmissionRecord, Supplier, CustomEmissionFactor, 
-    MaterialRequest, ReportExtraInfo, IndustryType, IndustryRequest
+    MaterialRequest, ReportExtraInfo, IndustryType, IndustryRequest, RecalculationJob, ReportJob
 )
+from .data_version import bump_data_version
+from .exports import factors_rows, records_rows, stream_csv, suppliers_rows, users_rows
 import logging
 
 logger = logging.getLogger(__name__)
@@ -198,24 +199,10 @@ class UserAdmin(BaseUserAdmin):
     actions = ['export_users_csv', 'deactivate_users', 'activate_users']
     
     def export_users_csv(self, request, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="users_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
+        return stream_csv('users_export.csv', [
             'Username', 'Email', 'Full Name', 'Date Joined', 'Last Login',
             'Is Active', 'Total Emissions (kg)', 'Emissions Count', 'Suppliers Count'
-        ])
-        
-        for user in queryset:
-            total_emissions = user.emission_records.aggregate(total=Sum('emissions_kg'))['total'] or 0
-            writer.writerow([
-                user.username, user.email, user.get_full_name(),
-                user.date_joined, user.last_login, user.is_active,
-                total_emissions, user.emission_records.count(), user.suppliers.count()
-            ])
-        
-        return response
+        ], users_rows(queryset))
     export_users_csv.short_description = "📊 Export Users to CSV"
     
     def deactivate_users(self, request, queryset):
@@ -274,6 +261,10 @@ class EmissionRecordAdmin(admin.ModelAdmin):
             'fields': ('emission_factor', 'emissions_kg', 'emissions_tons', 'country', 'reference'),
             'classes': ('wide',)
         }),
+        ('🧪 Gas Breakdown', {
+            'fields': ('co2_kg', 'ch4_kg', 'n2o_kg'),
+            'classes': ('collapse',)
+        }),
         ('ℹ️ Additional Information', {
             'fields': ('description', 'industry_type', 'fuel_name', 'supplier', 'proof_document'),
             'classes': ('collapse',)
@@ -461,25 +452,10 @@ class EmissionRecordAdmin(admin.ModelAdmin):
     actions = ['export_records_csv', 'bulk_verify', 'calculate_totals']
     
     def export_records_csv(self, request, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="emission_records.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
+        return stream_csv('emission_records.csv', [
             'User', 'Date', 'Scope', 'Source', 'Activity Data', 'Unit',
             'Emissions (kg)', 'Emissions (tons)', 'Country', 'Supplier', 'Description'
-        ])
-        
-        for record in queryset:
-            writer.writerow([
-                record.user.username, record.created_at.strftime('%Y-%m-%d'),
-                f'Scope {record.scope}', record.source_name, record.activity_data,
-                record.unit, record.emissions_kg, record.emissions_tons,
-                record.country, record.supplier.name if record.supplier else '',
-                record.description or ''
-            ])
-        
-        return response
+        ], records_rows(queryset))
     export_records_csv.short_description = "📊 Export Records to CSV"
     
     def calculate_totals(self, request, queryset):
@@ -724,26 +700,10 @@ class SupplierAdmin(admin.ModelAdmin):
     actions = ['export_suppliers_csv', 'send_contact_email']
     
     def export_suppliers_csv(self, request, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="suppliers_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
+        return stream_csv('suppliers_export.csv', [
             'Name', 'Type', 'Contact Person', 'Email', 'Phone', 'Country', 
             'City', 'Tax Number', 'Usage Count', 'Total Emissions (kg)', 'User'
-        ])
-        
-        for supplier in queryset:
-            usage_count = supplier.emission_records.count()
-            total_emissions = supplier.emission_records.aggregate(total=Sum('emissions_kg'))['total'] or 0
-            
-            writer.writerow([
-                supplier.name, supplier.supplier_type, supplier.contact_person,
-                supplier.email, supplier.phone, supplier.country, supplier.city,
-                supplier.tax_number, usage_count, total_emissions, supplier.user.username
-            ])
-        
-        return response
+        ], suppliers_rows(queryset))
     export_suppliers_csv.short_description = "📊 Export Suppliers to CSV"
 
 
@@ -938,28 +898,18 @@ class CustomEmissionFactorAdmin(admin.ModelAdmin):
     actions = ['verify_factors', 'export_factors_csv']
     
     def verify_factors(self, request, queryset):
-        count = queryset.update(is_verified=True)
+        with transaction.atomic():
+            count = queryset.update(is_verified=True)
+            # update() sends no signals
+            bump_data_version(queryset.values_list('user_id', flat=True))
         self.message_user(request, f"✅ {count} custom factors verified.")
     verify_factors.short_description = "✅ Verify Selected Factors"
     
     def export_factors_csv(self, request, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="custom_factors_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
+        return stream_csv('custom_factors_export.csv', [
             'Name', 'Category', 'Factor Value', 'Unit', 'Is Verified', 
             'Reference Source', 'User', 'Created Date'
-        ])
-        
-        for factor in queryset:
-            writer.writerow([
-                factor.name, factor.category, factor.factor_value, factor.unit,
-                'Yes' if factor.is_verified else 'No', factor.reference_source or '',
-                factor.user.username, factor.created_at.strftime('%Y-%m-%d')
-            ])
-        
-        return response
+        ], factors_rows(queryset))
     export_factors_csv.short_description = "📊 Export Factors to CSV"
 
 
@@ -1175,6 +1125,61 @@ class IndustryRequestAdmin(admin.ModelAdmin):
     has_consent.short_description = 'Consent Status'
 
 
+@admin.register(RecalculationJob)
+class RecalculationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'category', 'source', 'country', 'date_from', 'date_to', 'dry_run',
+                    'status', 'records_checked', 'records_changed', 'created_at']
+    list_filter = ['status', 'dry_run', 'created_at']
+    search_fields = ['category', 'source', 'country']
+    readonly_fields = ['status', 'last_record_id', 'records_checked', 'records_changed', 'records_skipped',
+                       'emissions_delta_kg', 'report', 'error', 'created_by', 'created_at', 'updated_at',
+                       'completed_at']
+    
+    fieldsets = (
+        ('Affected Records', {
+            'fields': ('category', 'source', 'country', 'date_from', 'date_to', 'dry_run')
+        }),
+        ('Progress', {
+            'fields': ('status', 'last_record_id', 'records_checked', 'records_changed',
+                       'records_skipped', 'emissions_delta_kg', 'error')
+        }),
+        ('Diff Report', {
+            'fields': ('report',),
+            'classes': ('collapse',)
+        }),
+        ('Timestamps', {
+            'fields': ('created_by', 'created_at', 'updated_at', 'completed_at'),
+            'classes': ('collapse',)
+        }),
+    )
+    
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'created_by', 'status', 'progress', 'attempts', 'size', 'created_at',
+                    'completed_at']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['created_by__username', 'created_by__email', 'filename']
+    readonly_fields = ['kind', 'params', 'status', 'progress', 'stage', 'attempts', 'error', 'download_token',
+                       'file_name', 'filename', 'content_type', 'size', 'created_by', 'created_at',
+                       'updated_at', 'started_at', 'completed_at']
+    actions = ['requeue_jobs']
+    
+    def has_add_permission(self, request):
+        # Jobs are queued from the report pages
+        return False
+    
+    def requeue_jobs(self, request, queryset):
+        count = queryset.exclude(status='running').update(status='pending', progress=0, stage='', error=None)
+        self.message_user(request, f'{count} report jobs requeued.')
+    requeue_jobs.short_description = "🔄 Requeue Jobs"
+
+
 # ============================================
 # Emission Sources Management Admin
 # ============================================
@@ -1183,6 +1188,7 @@ from .models_emission_sources import (
     EmissionScope, EmissionCategory, EmissionSource, 
     EmissionFactorData, EmissionCalculationLog
 )
+from .factor_resolver import invalidate_factor_cache
 
 
 @admin.register(EmissionScope)
@@ -1515,7 +1521,7 @@ class EmissionFactorDataAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
     
-    actions = ['set_as_default', 'activate_factors', 'deactivate_factors']
+    actions = ['set_as_default', 'activate_factors', 'deactivate_factors', 'queue_recalculation']
     
     def set_as_default(self, request, queryset):
         for factor in queryset:
@@ -1526,13 +1532,26 @@ class EmissionFactorDataAdmin(admin.ModelAdmin):
     
     def activate_factors(self, request, queryset):
         count = queryset.update(is_active=True)
+        # update() does not send post_save, so reload the resolver explicitly
+        transaction.on_commit(invalidate_factor_cache)
         self.message_user(request, f"{count} factors activated.")
     activate_factors.short_description = "🟢 Activate"
     
     def deactivate_factors(self, request, queryset):
         count = queryset.update(is_active=False)
+        transaction.on_commit(invalidate_factor_cache)
         self.message_user(request, f"{count} factors deactivated.")
     deactivate_factors.short_description = "🔴 Deactivate"
+    
+    def queue_recalculation(self, request, queryset):
+        """Queue recalculation of the emission records these factors apply to"""
+        from .recalculation import job_for_factor
+        jobs = [job_for_factor(factor, user=request.user) for factor in queryset.select_related('source__category')]
+        self.message_user(
+            request,
+            f"{len(jobs)} recalculation jobs queued. Run: python manage.py recalculate_emissions --pending"
+        )
+    queue_recalculation.short_description = "🔄 Queue recalculation of affected records"
 
 
 @admin.register(EmissionCalculationLog)
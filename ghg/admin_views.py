@@ -7,20 +7,23 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse
+from django.db import transaction
 from django.db.models import Sum, Count, Q, Avg
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import user_passes_test
 import json
-import csv
 
 from .models import (
     EmissionRecord, Supplier, CustomEmissionFactor, 
     MaterialRequest, ReportExtraInfo, IndustryRequest
 )
+from .data_version import bump_data_version
+from .rollups import rebuild_rollups
 from .security import get_client_ip, log_security_event
+from .exports import stream_csv, user_records_rows
 
 
 def is_admin_user(user):
@@ -342,36 +345,12 @@ def export_user_data(request, user_id):
     
     user = get_object_or_404(User, id=user_id)
     
-    # ایجاد response برای CSV
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="user_{user.username}_data.csv"'
-    
-    writer = csv.writer(response)
-    
-    # هدر CSV
-    writer.writerow([
+    # CSV به‌صورت جریانی (بدون بافر کردن کل فایل)
+    return stream_csv(f'user_{user.username}_data.csv', [
         'Date', 'Scope', 'Category', 'Source', 'Activity Data', 
         'Unit', 'Emissions (kg CO2e)', 'Emissions (tons CO2e)', 
         'Country', 'Description', 'Supplier'
-    ])
-    
-    # داده‌های انتشار
-    for record in user.emission_records.all():
-        writer.writerow([
-            record.created_at.strftime('%Y-%m-%d %H:%M'),
-            f"Scope {record.scope}",
-            record.category,
-            record.source_name,
-            record.activity_data,
-            record.unit,
-            record.emissions_kg,
-            record.emissions_tons,
-            record.country,
-            record.description or '',
-            record.supplier.name if record.supplier else record.supplier_old or ''
-        ])
-    
-    return response
+    ], user_records_rows(user))
 
 
 @user_passes_test(is_admin_user)
@@ -459,16 +438,20 @@ def delete_user_data(request, user_id):
         request_count = user.material_requests.count()
         
         # حذف داده‌ها
-        user.emission_records.all().delete()
-        user.suppliers.all().delete()
-        user.custom_factors.all().delete()
-        user.material_requests.all().delete()
-        
-        # حذف اطلاعات اضافی
-        try:
-            user.report_extra_info.delete()
-        except ReportExtraInfo.DoesNotExist:
-            pass
+        # Raw deletes skip the per-row signals; the rollups and the data
+        # version are brought up to date once afterwards
+        with transaction.atomic():
+            EmissionRecord.objects.filter(supplier__user=user).update(supplier=None)
+            for queryset in (
+                user.emission_records.all(),
+                user.suppliers.all(),
+                user.custom_factors.all(),
+                ReportExtraInfo.objects.filter(user=user),  # حذف اطلاعات اضافی
+            ):
+                queryset._raw_delete(queryset.db)
+            user.material_requests.all().delete()
+            rebuild_rollups(user)
+            bump_data_version([user.id])
         
         # لاگ امنیتی
         log_security_event(
@@ -501,28 +484,31 @@ def delete_user_data(request, user_id):
 def security_logs(request):
     """نمایش لاگ‌های امنیتی"""
     
-    # خواندن فایل لاگ امنیتی
+    # خواندن فایل لاگ امنیتی (و نسخه‌های چرخش‌شده)
     import os
     from django.conf import settings
+    from .security_log import LOG_LEVELS, SecurityLog
     
     log_file_path = os.path.join(settings.BASE_DIR, 'logs', 'security.log')
     
-    logs = []
-    if os.path.exists(log_file_path):
+    # فیلترها
+    level = request.GET.get('level', '')
+    event = request.GET.get('event', '')
+    if level not in LOG_LEVELS:
+        level = ''
+    
+    log = SecurityLog(log_file_path)
+    event_types = []
+    if log.exists():
         try:
-            with open(log_file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                # آخرین 1000 خط
-                for line in lines[-1000:]:
-                    if line.strip():
-                        logs.append(line.strip())
-        except Exception as e:
+            # جدیدترین‌ها اول؛ فقط خطوط صفحه‌ی جاری خوانده می‌شوند
+            logs = log.lines(level=level, event=event)
+            event_types = log.event_types()
+        except OSError as e:
             logs = [f"Error reading log file: {str(e)}"]
     else:
         logs = ["Security log file not found"]
     
-    logs.reverse()  # جدیدترین‌ها اول
-    
     # صفحه‌بندی
     paginator = Paginator(logs, 50)
     page_number = request.GET.get('page')
@@ -530,7 +516,11 @@ def security_logs(request):
     
     context = {
         'page_obj': page_obj,
-        'total_logs': len(logs),
+        'total_logs': paginator.count,
+        'level': level,
+        'event': event,
+        'levels': LOG_LEVELS,
+        'event_types': event_types,
     }
     
     return render(request, 'admin/security_logs.html', context)
@@ -5,8 +5,6 @@ using existing Django tools until the real SDK is available
 """
 
 import time
-import hashlib
-from django.core.cache import cache
 from django.http import JsonResponse, HttpResponseForbidden
 from django.conf import settings
 from django.utils.decorators import method_decorator
@@ -15,6 +13,9 @@ from functools import wraps
 import re
 import logging
 
+from .ratelimit import hit
+from .security_context import SecurityContext, allowed_requests
+
 logger = logging.getLogger(__name__)
 
 class SecurityDecision:
@@ -35,6 +36,10 @@ class SecurityDecision:
     def is_shield(self):
         return self.reason == 'shield_block'
 
+# Request bodies beyond this many bytes are not scanned by the WAF
+WAF_MAX_BODY_BYTES = getattr(settings, 'ARCJET_WAF_MAX_BODY_BYTES', 64 * 1024)
+
+
 class ArcjetSimulator:
     """Simulates Arcjet functionality using Django's built-in tools"""
     
@@ -52,6 +57,25 @@ class ArcjetSimulator:
         r'\.\./', r'etc/passwd', r'cmd.exe', r'powershell',
         r'eval\(', r'exec\(', r'system\(', r'shell_exec'
     ]
+    # All attack patterns as one alternation, matched in a single pass over
+    # lowercased text; only run when one of the literals every pattern
+    # contains is present
+    ATTACK_RE = re.compile('(?:' + ')|(?:'.join(ATTACK_PATTERNS) + ')')
+    ATTACK_LITERALS = (
+        '<script', 'javascript:', 'onload=', 'onerror=', 'union', 'drop', 'insert',
+        '../', 'etc/passwd', 'cmd', 'powershell', 'eval(', 'exec(', 'system(', 'shell_exec',
+    )
+    
+    # Only obvious bots are blocked, not legitimate browsers
+    STRICT_BOT_RE = re.compile(r'bot|crawler|spider|scraper', re.IGNORECASE)
+    
+    # Very relaxed limits for production to avoid blocking legitimate users
+    RATE_LIMITS = {
+        '/login/': {'max': 50, 'window': 300},  # 50 per 5 minutes
+        '/signup/': {'max': 20, 'window': 3600},  # 20 per hour
+        '/api/': {'max': 500, 'window': 60},  # 500 per minute
+        'default': {'max': 1000, 'window': 60}  # 1000 per minute
+    }
     
     def __init__(self, rules=None):
         self.rules = rules or []
@@ -106,36 +130,22 @@ class ArcjetSimulator:
             ip = request.META.get('REMOTE_ADDR', '127.0.0.1')
         return ip
     
+    def rate_limit_for(self, path):
+        """Rate limit config ({'max', 'window'}) that applies to ``path``"""
+        for pattern, config in self.RATE_LIMITS.items():
+            if pattern != 'default' and pattern in path:
+                return config
+        return self.RATE_LIMITS['default']
+    
     def is_rate_limited(self, ip, path):
         """Check if IP is rate limited"""
-        # Very relaxed limits for production to avoid blocking legitimate users
-        limits = {
-            '/login/': {'max': 50, 'window': 300},  # 50 per 5 minutes
-            '/signup/': {'max': 20, 'window': 3600},  # 20 per hour
-            '/api/': {'max': 500, 'window': 60},  # 500 per minute
-            'default': {'max': 1000, 'window': 60}  # 1000 per minute
-        }
-        
-        # Find matching limit
-        limit_config = limits.get('default')
-        for pattern, config in limits.items():
-            if pattern != 'default' and pattern in path:
-                limit_config = config
-                break
-        
-        # Create cache key
-        cache_key = f"arcjet_rate:{hashlib.md5(f'{ip}:{path}'.encode()).hexdigest()}"
+        limit_config = self.rate_limit_for(path)
         
-        # Get current count
         try:
-            current_count = cache.get(cache_key, 0)
-            
-            if current_count >= limit_config['max']:
+            result = hit(f"arcjet_rate:{ip}:{path}", limit_config['max'], limit_config['window'])
+            if not result.allowed:
                 logger.warning(f"Rate limit exceeded for {ip} on {path}")
                 return True
-            
-            # Increment counter
-            cache.set(cache_key, current_count + 1, limit_config['window'])
         except Exception as e:
             # If cache fails, don't block the user
             logger.error(f"Cache error in rate limiting: {e}")
@@ -150,15 +160,9 @@ class ArcjetSimulator:
             # Allow empty user agents in production (some browsers/proxies)
             return False
         
-        # Only block obvious bots, not legitimate browsers
-        strict_bot_patterns = [
-            r'bot', r'crawler', r'spider', r'scraper'
-        ]
-        
         # Check against strict bot patterns only
-        for pattern in strict_bot_patterns:
-            if re.search(pattern, user_agent, re.IGNORECASE):
-                return True
+        if self.STRICT_BOT_RE.search(user_agent):
+            return True
         
         # Don't check for missing headers - too strict for production
         # Don't check user agent length - too strict for production
@@ -167,43 +171,48 @@ class ArcjetSimulator:
     
     def is_attack(self, request):
         """Basic WAF - detect common attacks"""
-        # Check URL path
-        path = request.path.lower()
-        for pattern in self.ATTACK_PATTERNS:
-            if re.search(pattern, path, re.IGNORECASE):
-                return True
+        # One scan over path, query string and the start of the body; the
+        # newlines keep patterns such as union.*select within one part
+        parts = [request.path, request.META.get('QUERY_STRING', '')]
         
-        # Check query parameters
-        query_string = request.META.get('QUERY_STRING', '').lower()
-        for pattern in self.ATTACK_PATTERNS:
-            if re.search(pattern, query_string, re.IGNORECASE):
-                return True
-        
-        # Check POST data (if available)
-        if hasattr(request, 'body') and request.body:
+        # Check POST data, except file uploads, up to the byte budget
+        content_type = request.META.get('CONTENT_TYPE', '')
+        if WAF_MAX_BODY_BYTES and not content_type.startswith('multipart/'):
             try:
-                body = request.body.decode('utf-8', errors='ignore').lower()
-                for pattern in self.ATTACK_PATTERNS:
-                    if re.search(pattern, body, re.IGNORECASE):
-                        return True
-            except:
-                pass
+                body = request.body[:WAF_MAX_BODY_BYTES]
+            except Exception:
+                # Unreadable or over DATA_UPLOAD_MAX_MEMORY_SIZE; Django rejects it later
+                body = b''
+            if body:
+                parts.append(body.decode('utf-8', errors='ignore'))
         
-        return False
+        text = '\n'.join(parts).lower()
+        if not any(literal in text for literal in self.ATTACK_LITERALS):
+            return False
+        return self.ATTACK_RE.search(text) is not None
     
     def log_request(self, ip, user_agent, path, status):
-        """Log security events"""
+        """Log security events; allowed requests go to the pipeline's sampled summary"""
+        if status == 'allowed':
+            allowed_requests.record(SecurityContext(ip=ip, path=path.lower(), user_agent=user_agent))
+            return
         logger.info(f"ArcjetSim: {ip} | {user_agent[:50]} | {path} | {status}")
 
 # Global instance
 arcjet_sim = ArcjetSimulator()
 
 def arcjet_protect(rules=None):
-    """Decorator for view protection"""
+    """
+    Decorator for view protection. Behind SecurityPipelineMiddleware the
+    checks have already run for the request, so its decision is used; the
+    simulator only checks (and counts rate limits) without the middleware.
+    """
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
-            decision = arcjet_sim.protect(request)
+            decision = getattr(request, 'security_decision', None)
+            if decision is None:
+                decision = arcjet_sim.protect(request)
             
             if decision.is_denied():
                 if decision.is_rate_limit():
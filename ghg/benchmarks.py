@@ -0,0 +1,620 @@
+"""
+Micro-benchmarks for performance-sensitive code paths.
+
+Run with:
+    python manage.py benchmark                 # all benchmarks
+    python manage.py benchmark factor_lookup   # a single benchmark
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import timeit
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import HttpResponseForbidden
+from django.test import RequestFactory
+from django.utils.deprecation import MiddlewareMixin
+
+from . import emission_factors, exports, ratelimit, uncertainty, units
+from .arcjet_simulation import ArcjetSimulator
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    name: str
+    iterations: int
+    seconds: float
+
+    @property
+    def per_call_us(self) -> float:
+        return self.seconds / self.iterations * 1_000_000 if self.iterations else 0.0
+
+
+BENCHMARKS: Dict[str, Callable[[int], List[BenchmarkResult]]] = {}
+
+
+def register(name: str):
+    """Register a benchmark function under ``name``."""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def time_call(name: str, func: Callable[[], Any], iterations: int, repeat: int = 5) -> BenchmarkResult:
+    """Best-of-``repeat`` wall time for ``iterations`` calls of ``func``."""
+    timer = timeit.Timer(func)
+    best = min(timer.repeat(repeat=repeat, number=iterations))
+    return BenchmarkResult(name=name, iterations=iterations, seconds=best)
+
+
+# ============================================
+# Emission factor lookup
+# ============================================
+
+def _legacy_calculate_emissions(category, source, activity_data, country="global"):
+    """Previous implementation: rebuilds the registry dict on every call."""
+    if country.lower() == "turkey":
+        registry = {
+            "stationary": emission_factors.TURKEY_STATIONARY,
+            "mobile": emission_factors.TURKEY_TRANSPORTATION,
+            "fugitive": emission_factors.FUGITIVE_EMISSIONS,
+            "electricity": emission_factors.TURKEY_ELECTRICITY,
+            "steam-heat": emission_factors.TURKEY_DISTRICT_ENERGY,
+            "travel": emission_factors.TURKEY_TRANSPORTATION,
+            "waste": emission_factors.TURKEY_WASTE,
+            "water": emission_factors.WATER,
+            "purchased-goods": emission_factors.PURCHASED_GOODS_TURKEY,
+            "capital-goods": emission_factors.CAPITAL_GOODS,
+            "fuel-energy": emission_factors.FUEL_ENERGY_RELATED,
+            "upstream-transport": emission_factors.UPSTREAM_TRANSPORTATION,
+            "commuting": emission_factors.TURKEY_TRANSPORTATION,
+            "upstream-leased": emission_factors.UPSTREAM_LEASED,
+            "downstream-transport": emission_factors.DOWNSTREAM_TRANSPORTATION,
+            "end-of-life": emission_factors.TURKEY_WASTE,
+            "franchises": emission_factors.FRANCHISES,
+            "investments": emission_factors.INVESTMENTS,
+        }
+    else:
+        registry = {
+            "stationary": emission_factors.STATIONARY_COMBUSTION,
+            "mobile": emission_factors.MOBILE_COMBUSTION,
+            "fugitive": emission_factors.FUGITIVE_EMISSIONS,
+            "electricity": emission_factors.ELECTRICITY,
+            "steam-heat": emission_factors.STEAM_HEAT_COOLING,
+            "travel": emission_factors.BUSINESS_TRAVEL,
+            "waste": emission_factors.WASTE,
+            "water": emission_factors.WATER,
+            "purchased-goods": emission_factors.PURCHASED_GOODS_GLOBAL,
+            "capital-goods": emission_factors.CAPITAL_GOODS,
+            "fuel-energy": emission_factors.FUEL_ENERGY_RELATED,
+            "upstream-transport": emission_factors.UPSTREAM_TRANSPORTATION,
+            "commuting": emission_factors.EMPLOYEE_COMMUTING,
+            "upstream-leased": emission_factors.UPSTREAM_LEASED,
+            "downstream-transport": emission_factors.DOWNSTREAM_TRANSPORTATION,
+            "end-of-life": emission_factors.END_OF_LIFE,
+            "franchises": emission_factors.FRANCHISES,
+            "investments": emission_factors.INVESTMENTS,
+        }
+    cat = category.lower()
+    if cat not in registry:
+        return {"error": f"Invalid category: {category}"}
+    factors_for_cat = registry[cat]
+    if source not in factors_for_cat:
+        return {"error": f"Invalid source '{source}' for category '{category}' in country '{country}'"}
+    factor_data = factors_for_cat[source]
+    factor = factor_data["factor"]
+    emissions_kg = activity_data * factor
+    result = {
+        "emissions_kg": round(emissions_kg, 4),
+        "emissions_tons": round(emissions_kg / 1000.0, 6),
+        "factor": factor,
+        "unit": factor_data["unit"],
+        "source_name": factor_data.get("name", source),
+        "activity_data": activity_data,
+        "country": country.lower(),
+        "category": cat,
+        "source_key": source,
+    }
+    if "source" in factor_data:
+        result["reference"] = factor_data["source"]
+    return result
+
+
+_FACTOR_LOOKUP_CASES = [
+    ("stationary", "natural-gas", 1250.0, "turkey"),
+    ("electricity", "grid-average", 48000.0, "global"),
+    ("mobile", "on-road-diesel-desnz", 320.5, "global"),
+    ("purchased-goods", "plastic", 75.0, "Turkey"),
+]
+
+
+@register("factor_lookup")
+def bench_factor_lookup(iterations: int) -> List[BenchmarkResult]:
+    cases = _FACTOR_LOOKUP_CASES
+
+    def legacy():
+        for case in cases:
+            _legacy_calculate_emissions(*case)
+
+    def indexed():
+        for case in cases:
+            emission_factors.calculate_emissions(*case)
+
+    return [
+        time_call("calculate_emissions (per-call registry)", legacy, iterations),
+        time_call("calculate_emissions (precompiled index)", indexed, iterations),
+    ]
+
+
+@register("batch_calculation")
+def bench_batch_calculation(iterations: int) -> List[BenchmarkResult]:
+    items = [_FACTOR_LOOKUP_CASES[i % len(_FACTOR_LOOKUP_CASES)] for i in range(10000)]
+    runs = max(1, iterations // 1000)
+
+    def per_item():
+        for item in items:
+            emission_factors.calculate_emissions(*item)
+
+    def batch():
+        emission_factors.calculate_emissions_batch(items)
+
+    return [
+        time_call("10k items via calculate_emissions", per_item, runs, repeat=3),
+        time_call("10k items via calculate_emissions_batch", batch, runs, repeat=3),
+    ]
+
+
+# ============================================
+# Unit conversion
+# ============================================
+
+def _convert_by_dimension(value, from_unit, to_unit, fuel):
+    """Unit conversion without the precomputed matrix: walks dimensions per call."""
+    from_dim, from_scale = units.UNIT_DEFINITIONS[units.normalize_unit(from_unit)]
+    to_dim, to_scale = units.UNIT_DEFINITIONS[units.normalize_unit(to_unit)]
+    value = value * from_scale
+    if from_dim != to_dim:
+        kg_per_base = units._kg_per_base_unit(units.FUEL_PROPERTIES[fuel])
+        value = value * kg_per_base[from_dim] / kg_per_base[to_dim]
+    return value / to_scale
+
+
+_UNIT_CASES = [
+    (1250.0, "m3", "liters", "diesel"),
+    (48000.0, "kWh", "gj", "natural-gas"),
+    (3.5, "tonnes", "liters", "diesel"),
+    (900.0, "MWh", "gj", None),
+]
+
+
+@register("unit_conversion")
+def bench_unit_conversion(iterations: int) -> List[BenchmarkResult]:
+    cases = _UNIT_CASES
+    items = [
+        ("stationary", "diesel", 100.0, "global", None, ("m3", "t", "gal", None)[i % 4])
+        for i in range(10000)
+    ]
+    runs = max(1, iterations // 1000)
+
+    def by_dimension():
+        for case in cases:
+            _convert_by_dimension(*case)
+
+    def matrix():
+        for case in cases:
+            units.convert(*case)
+
+    def batch():
+        emission_factors.calculate_emissions_batch(items)
+
+    return [
+        time_call("convert (dimension walk)", by_dimension, iterations),
+        time_call("convert (precomputed matrix)", matrix, iterations),
+        time_call("10k items with units via calculate_emissions_batch", batch, runs, repeat=3),
+    ]
+
+
+# ============================================
+# Monte Carlo uncertainty
+# ============================================
+
+@register("uncertainty")
+def bench_uncertainty(iterations: int) -> List[BenchmarkResult]:
+    records = 10000
+    rng = np.random.default_rng(0)
+    emissions = rng.uniform(1.0, 10000.0, records)
+    scopes = [("1", "2", "3")[i % 3] for i in range(records)]
+    factor_keys = rng.integers(0, 200, records).tolist()
+    factor_uncertainty = rng.choice([5.0, 15.0, 30.0, 50.0], records)
+    activity_uncertainty = [uncertainty.ACTIVITY_UNCERTAINTY] * records
+
+    def propagate():
+        uncertainty.propagate_uncertainty(
+            emissions, scopes, factor_keys, factor_uncertainty, activity_uncertainty, samples=10000
+        )
+
+    return [
+        time_call("10k records x 10k samples", propagate, 1, repeat=3),
+    ]
+
+
+# ============================================
+# Rate limiting
+# ============================================
+
+def _legacy_rate_limit(key, limit, window):
+    """Previous implementation: read the counter, then write it back."""
+    count = cache.get(key, 0)
+    if count >= limit:
+        return False
+    cache.set(key, count + 1, window)
+    return True
+
+
+@register("ratelimit")
+def bench_ratelimit(iterations: int) -> List[BenchmarkResult]:
+    cache.delete_many(["bench-legacy"])
+
+    def legacy():
+        _legacy_rate_limit("bench-legacy", 10 ** 9, 60)
+
+    def atomic():
+        ratelimit.hit("bench-atomic", 10 ** 9, 60)
+
+    return [
+        time_call("get + set counter (legacy)", legacy, iterations),
+        time_call("ratelimit.hit (atomic incr)", atomic, iterations),
+    ]
+
+
+# ============================================
+# WAF request scanning
+# ============================================
+
+def _legacy_is_attack(request):
+    """Previous implementation: every pattern re-searched over each part."""
+    for part in (request.path.lower(), request.META.get('QUERY_STRING', '').lower()):
+        for pattern in ArcjetSimulator.ATTACK_PATTERNS:
+            if re.search(pattern, part, re.IGNORECASE):
+                return True
+    if request.body:
+        body = request.body.decode('utf-8', errors='ignore').lower()
+        for pattern in ArcjetSimulator.ATTACK_PATTERNS:
+            if re.search(pattern, body, re.IGNORECASE):
+                return True
+    return False
+
+
+@register("waf")
+def bench_waf(iterations: int) -> List[BenchmarkResult]:
+    factory = RequestFactory()
+    simulator = ArcjetSimulator()
+    items = [
+        {'category': 'stationary', 'source': 'natural-gas', 'activity_data': i, 'description': 'Boiler room'}
+        for i in range(2000)
+    ]
+    small = factory.get('/en/api/dashboard/', {'from': '2025-01-01', 'to': '2025-12-31'})
+    large = factory.post('/en/api/calculate/bulk/', json.dumps({'items': items}), content_type='application/json')
+
+    return [
+        time_call("GET with query (legacy)", lambda: _legacy_is_attack(small), iterations),
+        time_call("GET with query (compiled)", lambda: simulator.is_attack(small), iterations),
+        time_call(f"{len(large.body) // 1024} KB JSON body (legacy)", lambda: _legacy_is_attack(large), max(1, iterations // 100)),
+        time_call(f"{len(large.body) // 1024} KB JSON body (compiled)", lambda: simulator.is_attack(large), max(1, iterations // 100)),
+    ]
+
+
+# ============================================
+# Security middleware
+# ============================================
+
+_LEGACY_ARCJET_LIMITS = {
+    '/login/': {'max': 50, 'window': 300},
+    '/signup/': {'max': 20, 'window': 3600},
+    '/api/': {'max': 500, 'window': 60},
+    'default': {'max': 1000, 'window': 60},
+}
+
+
+def _legacy_client_ip(request):
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    return x_forwarded_for.split(',')[0].strip() if x_forwarded_for else request.META.get('REMOTE_ADDR', '127.0.0.1')
+
+
+def _legacy_arcjet_protect(request):
+    """Previous ArcjetSimulator.protect: get/set counter, regex loops, an INFO line per request."""
+    ip = _legacy_client_ip(request)
+    user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
+
+    limit = _LEGACY_ARCJET_LIMITS['default']
+    for pattern, config in _LEGACY_ARCJET_LIMITS.items():
+        if pattern != 'default' and pattern in request.path:
+            limit = config
+            break
+    key = f"arcjet_rate:{hashlib.md5(f'{ip}:{request.path}'.encode()).hexdigest()}"
+    if not _legacy_rate_limit(key, limit['max'], limit['window']):
+        return False
+
+    if user_agent and any(re.search(p, user_agent, re.IGNORECASE) for p in (r'bot', r'crawler', r'spider', r'scraper')):
+        return False
+    if _legacy_is_attack(request):
+        return False
+
+    logging.getLogger('ghg.arcjet_simulation').info(f"ArcjetSim: {ip} | {user_agent[:50]} | {request.path} | allowed")
+    return True
+
+
+class _LegacyArcjetSimulatorMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(('/static/', '/admin/', '/media/')) and not _legacy_arcjet_protect(request):
+            return HttpResponseForbidden('Request denied')
+        return self.get_response(request)
+
+
+class _LegacySecurityHeadersMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        from .middleware import CONTENT_SECURITY_POLICY
+        response['Content-Security-Policy'] = CONTENT_SECURITY_POLICY
+        response['X-Content-Type-Options'] = 'nosniff'
+        response['X-Frame-Options'] = 'DENY'
+        response['X-XSS-Protection'] = '1; mode=block'
+        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
+        if 'Server' in response:
+            del response['Server']
+        return response
+
+
+class _LegacyRateLimitMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        if request.path.startswith('/static/'):
+            return None
+        if not _legacy_rate_limit(f"rate_limit_{_legacy_client_ip(request)}", 100, 60):
+            return HttpResponseForbidden("Rate limit exceeded. Please try again later.")
+        return None
+
+
+class _LegacySecurityLoggingMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        path = request.path.lower()
+        for pattern in ['admin', 'wp-admin', 'phpmyadmin', '.env', 'config', 'backup', 'sql', 'database', 'shell', 'cmd']:
+            if pattern in path and not path.startswith('/admin/'):
+                logging.getLogger('ghg.security').warning(f"Suspicious request: {request.method} {request.path}")
+                break
+        return None
+
+    def process_response(self, request, response):
+        if request.path.endswith('/login/') and response.status_code == 200 and request.method == 'POST':
+            form = (getattr(response, 'context_data', None) or {}).get('form')
+            if form and form.errors:
+                logging.getLogger('ghg.security').warning(f"Failed login attempt from {_legacy_client_ip(request)}")
+        return response
+
+
+@contextmanager
+def _production_logging():
+    """Log at production levels (ghg at INFO) with console output discarded."""
+    loggers = [logging.getLogger(name) for name in ('ghg', 'ghg.security')]
+    levels = [logger.level for logger in loggers]
+    with open(os.devnull, 'w') as devnull:
+        handlers = {
+            handler: handler.setStream(devnull)
+            for logger in loggers for handler in logger.handlers
+            if type(handler) is logging.StreamHandler
+        }
+        logging.getLogger('ghg').setLevel(logging.INFO)
+        try:
+            yield
+        finally:
+            for logger, level in zip(loggers, levels):
+                logger.setLevel(level)
+            for handler, stream in handlers.items():
+                handler.setStream(stream)
+
+
+@register("security_pipeline")
+def bench_security_pipeline(iterations: int) -> List[BenchmarkResult]:
+    from django.http import HttpResponse
+    from .middleware import SecurityPipelineMiddleware
+
+    def view(request):
+        return HttpResponse('ok')
+
+    factory = RequestFactory()
+    # Spread requests over many clients so no rate limit is reached
+    requests = [
+        factory.get('/en/api/dashboard/', {'from': '2025-01-01'}, REMOTE_ADDR=f'10.0.{i // 250}.{i % 250}',
+                    HTTP_USER_AGENT='Mozilla/5.0 (X11; Linux x86_64) Firefox/130.0')
+        for i in range(500)
+    ]
+    legacy = _LegacyArcjetSimulatorMiddleware(_LegacySecurityHeadersMiddleware(
+        _LegacyRateLimitMiddleware(_LegacySecurityLoggingMiddleware(view))
+    ))
+    pipeline = SecurityPipelineMiddleware(view)
+
+    def run(middleware):
+        counter = iter(range(10 ** 9))
+        return lambda: middleware(requests[next(counter) % len(requests)])
+
+    with _production_logging():
+        cache.clear()
+        results = [time_call("4 chained middleware (legacy)", run(legacy), iterations)]
+        cache.clear()
+        results.append(time_call("SecurityPipelineMiddleware", run(pipeline), iterations))
+        cache.clear()
+    return results
+
+
+# ============================================
+# Security log page
+# ============================================
+
+def _legacy_security_log_page(path, page):
+    """Previous implementation: read every line, keep the last 1000."""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f.readlines()[-1000:] if line.strip()]
+    lines.reverse()
+    return Paginator(lines, 50).get_page(page).object_list
+
+
+@register("security_log")
+def bench_security_log(iterations: int) -> List[BenchmarkResult]:
+    import tempfile
+    from .security_log import SecurityLog
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'security.log')
+        with open(path, 'w') as f:
+            for i in range(200_000):
+                event = 'login_failed' if i % 10 == 0 else 'login_success'
+                f.write(f"SECURITY INFO 2026-01-01 12:00:00,000 security SECURITY EVENT: {event} | "
+                        f"Identifier: user{i}@example.com | Details: IP: 10.0.0.{i % 250}\n")
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        log = SecurityLog(path)
+        build = time_call(f"index {size_mb:.0f} MB log (first request)", lambda: len(log.lines()), 1, repeat=1)
+
+        def indexed(page, **filters):
+            return lambda: Paginator(log.lines(**filters), 50).get_page(page).object_list
+
+        return [
+            build,
+            time_call("page 1, readlines (legacy)", lambda: _legacy_security_log_page(path, 1), max(1, iterations // 100)),
+            time_call("page 1, indexed", indexed(1), iterations),
+            time_call("page 3000, indexed", indexed(3000), iterations),
+            time_call("page 300 of login_failed, indexed", indexed(300, event='login_failed'), iterations),
+        ]
+
+
+# ============================================
+# XLSX export memory
+# ============================================
+
+XLSX_BENCH_ROWS = 200_000
+
+
+def _xlsx_bench_rows(count):
+    for i in range(count):
+        yield (f"Natural Gas boiler {i % 40}", str(i % 3 + 1), i * 1.5, 'm3', i * 2.02, i * 0.00202)
+
+
+def _legacy_xlsx(rows):
+    """Previous implementation: full workbook, style objects on every cell, width rescan."""
+    import io
+    from openpyxl import Workbook
+    from openpyxl.styles import Border, Font, PatternFill, Side
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook()
+    ws = wb.active
+    border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    for col, header in enumerate(exports.EMISSIONS_ANALYSIS_HEADERS, 1):
+        cell = ws.cell(row=4, column=col, value=header)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.border = border
+    for row, (source_name, scope, activity, unit, kg, tons) in enumerate(rows, 5):
+        for col, value in enumerate([source_name, f"Scope {scope}", activity, unit, round(kg, 3), round(tons, 6)], 1):
+            cell = ws.cell(row=row, column=col)
+            cell.value = value
+            cell.border = border
+            if col == 2:
+                color = exports.SCOPE_FILLS[scope]
+                cell.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+    for col in range(1, len(exports.EMISSIONS_ANALYSIS_HEADERS) + 1):
+        letter = get_column_letter(col)
+        ws.column_dimensions[letter].width = min(max(len(str(c.value)) for c in ws[letter]) + 2, 50)
+    output = io.BytesIO()
+    wb.save(output)
+    return len(output.getvalue())
+
+
+def _write_only_xlsx(rows):
+    report = exports.XlsxReport('Emissions Analysis', '10B981', [20] * len(exports.EMISSIONS_ANALYSIS_HEADERS))
+    report.header(exports.EMISSIONS_ANALYSIS_HEADERS)
+    for cells in exports._scope_rows(report, (list(row) for row in rows), 1):
+        report.append(cells)
+    response = report.response('bench.xlsx')
+    size = response.file_to_stream.seek(0, 2)
+    response.close()
+    return size
+
+
+def _peak_memory(name, func, rows):
+    """Run ``func`` once under tracemalloc; the peak goes in the result name."""
+    import gc
+    import time
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    func(_xlsx_bench_rows(rows))
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return BenchmarkResult(name=f"{name}: peak {peak / 1024 / 1024:.1f} MB", iterations=rows, seconds=seconds)
+
+
+@register("xlsx_export")
+def bench_xlsx_export(iterations: int) -> List[BenchmarkResult]:
+    # Fixed size; µs/iter is per row. Timings include tracemalloc overhead.
+    return [
+        _peak_memory(f"{XLSX_BENCH_ROWS} rows, Workbook (legacy)", _legacy_xlsx, XLSX_BENCH_ROWS),
+        _peak_memory(f"{XLSX_BENCH_ROWS} rows, write-only", _write_only_xlsx, XLSX_BENCH_ROWS),
+    ]
+
+
+# ============================================
+# Report cache
+# ============================================
+
+REPORT_BENCH_RECORDS = 2000
+
+
+@register("report_cache")
+def bench_report_cache(iterations: int) -> List[BenchmarkResult]:
+    """Emissions PDF rendered vs served from the report cache (rolled back afterwards)"""
+    import tempfile
+
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from django.test import override_settings
+
+    from .models import EmissionRecord
+    from .report_cache import render_report
+    from .reporting.renderers import emissions_pdf
+
+    def served(params):
+        report, _ = render_report('emissions_pdf', user, params)
+        report.close()
+
+    with tempfile.TemporaryDirectory() as directory, override_settings(REPORT_CACHE_ROOT=directory):
+        with transaction.atomic():
+            user = User.objects.create_user('report-cache-bench', 'report-cache-bench@example.com')
+            EmissionRecord.objects.bulk_create([
+                EmissionRecord(
+                    user=user, scope=str(index % 3 + 1), category='stationary', source='natural-gas',
+                    source_name=f'Source {index % 40}', activity_data=index, unit='m3', emission_factor=2.0,
+                    emissions_kg=2.0 * index, emissions_tons=0.002 * index,
+                )
+                for index in range(REPORT_BENCH_RECORDS)
+            ])
+            served({})
+            results = [
+                time_call(f"{REPORT_BENCH_RECORDS} records, render", lambda: emissions_pdf(user, {}, io.BytesIO()),
+                          max(1, iterations // 100), repeat=3),
+                time_call(f"{REPORT_BENCH_RECORDS} records, cached", lambda: served({}), iterations),
+            ]
+            transaction.set_rollback(True)
+    return results
@@ -0,0 +1,285 @@
+"""
+Cache backend shared by every worker process on one host.
+
+SQLiteCache keeps entries in an SQLite database in WAL mode, so readers
+never block each other and all gunicorn workers see the same rate-limit
+counters, lockouts and cached responses without running Redis or
+memcached. Integers are stored as SQLite integers, which makes incr()
+a single atomic UPDATE ... RETURNING statement. Other values are
+pickled.
+
+Expired entries are ignored on read and purged when the cache is
+culled. Culling runs every CULL_EVERY writes per process. It enforces
+MAX_ENTRIES and the optional MAX_BYTES budget by dropping the least
+recently used entries (CULL_FREQUENCY as in Django's backends). The
+entry count and value bytes are kept in a one-row cache_stats table by
+triggers, so culling reads them instead of scanning the table, and the
+purge and eviction walk the expires and accessed indexes.
+
+Usage::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'ghg.cache_backends.SQLiteCache',
+            'LOCATION': '/var/tmp/app-cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_BYTES': 256 * 1024 * 1024},
+        }
+    }
+"""
+
+from __future__ import annotations
+
+import os
+import pickle
+import sqlite3
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+# Access times are refreshed at most this often per entry, so hot reads stay read-only
+ACCESS_RESOLUTION = 60
+CULL_EVERY = 64
+BUSY_TIMEOUT = 5.0
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    # Running entry count and value bytes, maintained by the triggers below
+    'CREATE TABLE IF NOT EXISTS cache_stats ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+    ' entries INTEGER NOT NULL,'
+    ' bytes INTEGER NOT NULL'
+    ')',
+    # Counted once for files created before cache_stats existed
+    'INSERT OR IGNORE INTO cache_stats (id, entries, bytes) '
+    'SELECT 0, COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache',
+    'CREATE TRIGGER IF NOT EXISTS cache_stats_insert AFTER INSERT ON cache BEGIN '
+    'UPDATE cache_stats SET entries = entries + 1, bytes = bytes + LENGTH(NEW.value) WHERE id = 0; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_stats_delete AFTER DELETE ON cache BEGIN '
+    'UPDATE cache_stats SET entries = entries - 1, bytes = bytes - LENGTH(OLD.value) WHERE id = 0; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_stats_update AFTER UPDATE OF value ON cache BEGIN '
+    'UPDATE cache_stats SET bytes = bytes + LENGTH(NEW.value) - LENGTH(OLD.value) WHERE id = 0; END',
+)
+
+_LIVE = '(expires IS NULL OR expires > ?)'
+
+
+def _encode(value):
+    if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    """Django cache backend on a WAL-mode SQLite file (LOCATION)"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._max_bytes = options.get('MAX_BYTES')
+        self._cull_every = options.get('CULL_EVERY', CULL_EVERY)
+        self._writes = 0
+        self._connection = None
+        self._pid = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # Connections are not shared across fork() (gunicorn preload)
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            # INSERT OR REPLACE fires the delete trigger for the replaced row only with this on
+            connection.execute('PRAGMA recursive_triggers=ON')
+            with _ImmediateTransaction(connection):
+                for statement in _SCHEMA:
+                    connection.execute(statement)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _expiry(self, timeout):
+        """Absolute expiry time, None for never; 0/negative timeouts expire at once"""
+        return self.get_backend_timeout(timeout)
+
+    def _wrote(self):
+        self._writes += 1
+        if self._writes >= self._cull_every:
+            self._writes = 0
+            self._cull()
+
+    # ---- reads ----
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self._db.execute(
+            f'SELECT value, accessed FROM cache WHERE key = ? AND {_LIVE}', (key, now)
+        ).fetchone()
+        if row is None:
+            return default
+        if row[1] < now - ACCESS_RESOLUTION:
+            self._db.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return _decode(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        placeholders = ','.join('?' * len(key_map))
+        rows = self._db.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) AND {_LIVE}',
+            (*key_map, time.time()),
+        ).fetchall()
+        return {key_map[key]: _decode(value) for key, value in rows}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {_LIVE}', (key, time.time())
+        ).fetchone() is not None
+
+    # ---- writes ----
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        # Inserts, or replaces an expired entry, in one statement
+        cursor = self._db.execute(
+            'INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, _encode(value), self._expiry(timeout), now, now),
+        )
+        self._wrote()
+        return cursor.rowcount == 1
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+            (key, _encode(value), self._expiry(timeout), time.time()),
+        )
+        self._wrote()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expiry(timeout)
+        now = time.time()
+        rows = [
+            (self.make_and_validate_key(key, version=version), _encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        with self._transaction():
+            self._db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)', rows
+            )
+        self._wrote()
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._db.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {_LIVE}',
+            (self._expiry(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        """Atomically add ``delta`` to an existing value, keeping its expiry"""
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self._db.execute(
+            f"UPDATE cache SET value = value + ? WHERE key = ? AND typeof(value) = 'integer' AND {_LIVE} "
+            'RETURNING value',
+            (delta, key, now),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+
+        # Missing, expired or not stored as an integer
+        with self._transaction():
+            row = self._db.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {_LIVE}', (key, now)
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = _decode(row[0]) + delta
+            self._db.execute('UPDATE cache SET value = ? WHERE key = ?', (_encode(value), key))
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self._db.execute(f"DELETE FROM cache WHERE key IN ({','.join('?' * len(keys))})", keys)
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Called after every request; the per-thread connection is kept open
+        pass
+
+    # ---- maintenance ----
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._db)
+
+    def _stats(self):
+        """(entries, value bytes) from the running totals"""
+        return self._db.execute('SELECT entries, bytes FROM cache_stats WHERE id = 0').fetchone()
+
+    def _cull(self):
+        """Purge expired entries, then drop LRU entries over the entry/byte budget"""
+        with self._transaction():
+            self._db.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+            entries, size = self._stats()
+            over_entries = entries > self._max_entries
+            over_bytes = self._max_bytes is not None and size > self._max_bytes
+            if not (over_entries or over_bytes):
+                return
+            if self._cull_frequency == 0:
+                self._db.execute('DELETE FROM cache')
+                return
+            drop = entries // self._cull_frequency
+            if over_entries:
+                drop = max(drop, entries - self._max_entries)
+            if over_bytes and entries:
+                # Assume average-sized entries to get back under the budget
+                drop = max(drop, int(entries * (size - self._max_bytes) / size) + 1)
+            self._db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)', (drop,)
+            )
+
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK on an autocommit connection"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
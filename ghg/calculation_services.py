@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import math
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .data_version import bump_data_version
+from .emission_factors import calculate_emissions_batch, get_scope_for_category
+from .factor_resolver import resolve_factor
+from .gwp import GASES
+from .models import EmissionRecord, Supplier
+from .rollups import add_records
+
+
+# Limits for the bulk calculation endpoint
+BULK_MAX_ITEMS = 1000
+BULK_CREATE_BATCH_SIZE = 500
+
+# Upper limit on activity data in the factor's unit (after unit conversion)
+MAX_ACTIVITY_DATA = 1000000
+
+
+class BulkValidationError(Exception):
+    """Raised when one or more bulk line items are invalid; nothing is saved"""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} invalid item(s)")
+        self.errors = errors
+
+
+def parse_activity_data(value: Any) -> Optional[float]:
+    """
+    Convert activity data to a finite, non-negative float. MAX_ACTIVITY_DATA
+    applies once it is converted to the factor's unit (see apply_activity_limit).
+    """
+    try:
+        activity_data = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(activity_data) or activity_data < 0:
+        return None
+    return activity_data
+
+
+def activity_limit_error(activity_data: float, unit: str) -> Optional[str]:
+    """Error for activity data (in the factor's ``unit``) above MAX_ACTIVITY_DATA, or None"""
+    if activity_data > MAX_ACTIVITY_DATA:
+        return f"Invalid activity data: more than {MAX_ACTIVITY_DATA} {unit}"
+    return None
+
+
+def apply_activity_limit(batch: Dict[str, Any]) -> None:
+    """Fail the items of a calculate_emissions_batch result whose converted activity data is too large"""
+    for index, activity_data in enumerate(batch['activity_data'].tolist()):
+        if batch['error_mask'][index]:
+            continue
+        error = activity_limit_error(activity_data, batch['factor_data'][index]['unit'])
+        if error is not None:
+            batch['errors'][index] = error
+            batch['error_mask'][index] = True
+            batch['factor_data'][index] = None
+
+
+def parse_activity_date(value: Any) -> Optional[date]:
+    """
+    Convert an activity date (date, datetime or ISO string) to a date.
+    Empty values give None; anything else unparseable raises ValueError.
+    """
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        return date.fromisoformat(value.strip()[:10])
+    raise ValueError(f"Invalid activity date: {value!r}")
+
+
+def _resolve_suppliers(user: User, items: Sequence[Dict[str, Any]]) -> Dict[str, Supplier]:
+    """Fetch every supplier referenced by the items with a single query"""
+    supplier_ids = {str(item['supplier_id']) for item in items if item.get('supplier_id')}
+    if not supplier_ids:
+        return {}
+    ids = [int(supplier_id) for supplier_id in supplier_ids if supplier_id.isdigit()]
+    return {
+        str(supplier.id): supplier
+        for supplier in Supplier.objects.filter(user=user, id__in=ids)
+    }
+
+
+def build_emission_records(
+    user: User,
+    items: Sequence[Any],
+    default_country: str = 'global',
+) -> Tuple[List[EmissionRecord], List[Dict[str, Any]]]:
+    """
+    Validate and calculate a list of line items.
+
+    Every item is checked before anything is returned, so callers can save
+    all records or none. Raises BulkValidationError listing each bad item.
+
+    Returns:
+        (unsaved EmissionRecord instances, per-item calculation results)
+    """
+    errors: List[Dict[str, Any]] = []
+
+    if not items:
+        raise BulkValidationError([{'index': None, 'error': 'No items provided'}])
+    if len(items) > BULK_MAX_ITEMS:
+        raise BulkValidationError([{
+            'index': None,
+            'error': f'Too many items (maximum {BULK_MAX_ITEMS})',
+        }])
+
+    batch_items = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Item must be an object'})
+            batch_items.append((None, None, None))
+            continue
+
+        category = item.get('category')
+        source = item.get('source')
+        country = item.get('country') or default_country
+        activity_data = parse_activity_data(item.get('activity_data', 0))
+        try:
+            activity_date = parse_activity_date(item.get('activity_date'))
+            date_error = None
+        except ValueError:
+            activity_date = None
+            date_error = 'Invalid activity date'
+
+        unit = item.get('unit') or None
+        unit_error = unit is not None and not isinstance(unit, str)
+        if unit_error:
+            unit = None
+
+        if not isinstance(category, str) or not isinstance(source, str) or not isinstance(country, str):
+            errors.append({'index': index, 'error': 'category, source and country must be strings'})
+        elif unit_error:
+            errors.append({'index': index, 'error': 'unit must be a string'})
+        elif activity_data is None:
+            errors.append({'index': index, 'error': 'Invalid activity data'})
+        elif date_error:
+            errors.append({'index': index, 'error': date_error})
+        batch_items.append((category, source, activity_data, country, activity_date, unit))
+
+    valid_items = [item for item in items if isinstance(item, dict)]
+    suppliers = _resolve_suppliers(user, valid_items)
+
+    batch = calculate_emissions_batch(batch_items, default_country, resolve=resolve_factor)
+    apply_activity_limit(batch)
+    failed = {error['index'] for error in errors}
+
+    for index, item in enumerate(items):
+        if index in failed:
+            continue
+        if batch['error_mask'][index]:
+            errors.append({'index': index, 'error': batch['errors'][index]})
+            continue
+        supplier_id = item.get('supplier_id')
+        if supplier_id and str(supplier_id) not in suppliers:
+            errors.append({'index': index, 'error': f'Unknown supplier: {supplier_id}'})
+
+    if errors:
+        errors.sort(key=lambda error: error['index'])
+        raise BulkValidationError(errors)
+
+    records = []
+    results = []
+    for index, item in enumerate(items):
+        _, source, activity_data, _, activity_date, unit = batch_items[index]
+        result = batch_result(batch, index, source, unit, activity_data)
+        supplier_id = item.get('supplier_id')
+        results.append(result)
+        records.append(new_emission_record(
+            user, result, item.get('country') or default_country, item,
+            supplier=suppliers.get(str(supplier_id)) if supplier_id else None,
+            activity_date=activity_date,
+        ))
+
+    return records, results
+
+
+def batch_result(
+    batch: Dict[str, Any],
+    index: int,
+    source: str,
+    unit: Optional[str] = None,
+    input_activity_data: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Per-item result dict (as returned by calculate_emissions) from a batch.
+    ``unit`` and ``input_activity_data`` describe the item as submitted.
+    """
+    factor_data = batch['factor_data'][index]
+    result = {
+        'emissions_kg': float(batch['emissions_kg'][index]),
+        'emissions_tons': float(batch['emissions_tons'][index]),
+        'factor': factor_data['factor'],
+        'unit': factor_data['unit'],
+        'source_name': factor_data.get('name', source),
+        'activity_data': float(batch['activity_data'][index]),
+        'country': batch['countries'][index],
+        'category': batch['categories'][index],
+        'source_key': source,
+    }
+    if 'source' in factor_data:
+        result['reference'] = factor_data['source']
+    if unit:
+        result['input_unit'] = unit
+        result['input_activity_data'] = input_activity_data
+    for gas in GASES:
+        gas_kg = batch[f'{gas}_kg'][index]
+        if not math.isnan(gas_kg):
+            result[f'{gas}_kg'] = float(gas_kg)
+    return result
+
+
+def new_emission_record(
+    user: User,
+    result: Dict[str, Any],
+    country: str,
+    item: Dict[str, Any],
+    supplier: Optional[Supplier] = None,
+    activity_date: Optional[date] = None,
+) -> EmissionRecord:
+    """Unsaved EmissionRecord for a calculation result and its line item"""
+    description = item.get('description') or ''
+    industry_type = item.get('industry_type') or ''
+    fuel_name = item.get('fuel_name') or ''
+    return EmissionRecord(
+        user=user,
+        scope=get_scope_for_category(result['category']),
+        category=result['category'],
+        source=result['source_key'],
+        source_name=result['source_name'],
+        activity_data=result['activity_data'],
+        activity_date=activity_date,
+        unit=result['unit'],
+        emission_factor=result['factor'],
+        emissions_kg=result['emissions_kg'],
+        emissions_tons=result['emissions_tons'],
+        co2_kg=result.get('co2_kg'),
+        ch4_kg=result.get('ch4_kg'),
+        n2o_kg=result.get('n2o_kg'),
+        country=country,
+        reference=result.get('reference', ''),
+        description=str(description)[:500],
+        industry_type=str(industry_type)[:100] or None,
+        fuel_name=str(fuel_name)[:100] or None,
+        supplier=supplier,
+    )
+
+
+def save_emission_records(records: List[EmissionRecord]) -> List[EmissionRecord]:
+    """Insert records with chunked bulk_create inside one transaction"""
+    with transaction.atomic():
+        created = EmissionRecord.objects.bulk_create(records, batch_size=BULK_CREATE_BATCH_SIZE)
+        # bulk_create() sends no signals
+        add_records(created)
+        bump_data_version({record.user_id for record in created})
+    return created
+
+
+def recalculate_emission_records(records: Sequence[EmissionRecord]) -> List[Tuple[EmissionRecord, Optional[Dict[str, Any]]]]:
+    """
+    Recalculate existing records with the factor in force on their activity date.
+
+    Records without an activity date use their creation date. Factors come from
+    the factor resolver's interval index, so each distinct
+    (country, category, source, date) is looked up once with a binary search.
+
+    Returns:
+        (record, result) pairs; result is None when the record's category or
+        source is no longer known. Records are not modified.
+    """
+    batch = calculate_emissions_batch(
+        [
+            (record.category, record.source, record.activity_data, record.country, record.effective_date)
+            for record in records
+        ],
+        resolve=resolve_factor,
+    )
+    return [
+        (record, None if batch['error_mask'][index] else batch_result(batch, index, record.source))
+        for index, record in enumerate(records)
+    ]
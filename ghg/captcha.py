@@ -3,13 +3,19 @@ Google reCAPTCHA v3 Integration for SustIndex
 Provides invisible CAPTCHA protection for forms
 """
 
+import hashlib
+import os
 import requests
 import logging
 from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+from .ratelimit import hit
 
 logger = logging.getLogger('ghg.security')
 
-# reCAPTCHA Configuration
+# reCAPTCHA Configuration (defaults; settings are re-read on each verification)
 RECAPTCHA_SITE_KEY = getattr(settings, 'RECAPTCHA_SITE_KEY', '')
 RECAPTCHA_SECRET_KEY = getattr(settings, 'RECAPTCHA_SECRET_KEY', '')
 RECAPTCHA_VERIFY_URL = 'https://www.google.com/recaptcha/api/siteverify'
@@ -19,6 +25,72 @@ RECAPTCHA_ENABLED = getattr(settings, 'RECAPTCHA_ENABLED', True)
 RECAPTCHA_SCORE_THRESHOLD = 0.5  # Default threshold
 RECAPTCHA_STRICT_THRESHOLD = 0.7  # For sensitive operations
 
+# Latency budget for one verification (connect and read timeouts, seconds)
+RECAPTCHA_TIMEOUT = (1.0, 2.0)
+# Google answers a reused token with timeout-or-duplicate; tokens live 2 minutes.
+# A cached success is handed out once more (a resubmitted form), then dropped.
+RECAPTCHA_TOKEN_CACHE_TTL = 120
+# Circuit breaker: this many upstream failures within the window opens it for the cooldown
+RECAPTCHA_BREAKER_FAILURES = 5
+RECAPTCHA_BREAKER_WINDOW = 60
+RECAPTCHA_BREAKER_COOLDOWN = 30
+
+_session = None
+_session_pid = None
+
+
+def get_session():
+    """Per-process requests.Session, so verifications reuse a kept-alive TLS connection"""
+    global _session, _session_pid
+    # Connections are not shared across fork() (gunicorn preload)
+    if _session is None or _session_pid != os.getpid():
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=10))
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream service after repeated failures.
+
+    Failures are counted in the shared cache, so every worker opens and
+    closes together. While open, callers fail fast instead of waiting for
+    a timeout; after the cooldown the next call tries the upstream again.
+    """
+
+    def __init__(self, name, failures, window, cooldown):
+        self.name = name
+        self.failures = failures
+        self.window = window
+        self.cooldown = cooldown
+
+    @property
+    def open_key(self):
+        return f'circuit_open:{self.name}'
+
+    def is_open(self):
+        return cache.get(self.open_key) is not None
+
+    def record_failure(self):
+        if not hit(f'circuit_failures:{self.name}', self.failures - 1, self.window).allowed:
+            logger.error(f"Circuit breaker '{self.name}' opened for {self.cooldown}s after repeated failures")
+            cache.set(self.open_key, True, self.cooldown)
+
+
+recaptcha_breaker = CircuitBreaker(
+    'recaptcha',
+    failures=getattr(settings, 'RECAPTCHA_BREAKER_FAILURES', RECAPTCHA_BREAKER_FAILURES),
+    window=RECAPTCHA_BREAKER_WINDOW,
+    cooldown=getattr(settings, 'RECAPTCHA_BREAKER_COOLDOWN', RECAPTCHA_BREAKER_COOLDOWN),
+)
+
+
+def _token_cache_key(token, action, remote_ip):
+    scope = f'{token}|{action}|{remote_ip or ""}'
+    return 'recaptcha_token:' + hashlib.sha256(scope.encode('utf-8')).hexdigest()
+
 
 class ReCaptchaValidator:
     """Validate Google reCAPTCHA v3 responses"""
@@ -28,6 +100,14 @@ class ReCaptchaValidator:
         """
         Verify reCAPTCHA token with Google
         
+        Google's answer is cached for the token's lifetime under the token,
+        action and client IP, so a resubmitted form does not pay for (or
+        fail on) a second round trip. A cached success is used once and then
+        removed; after that the token goes to Google again, which rejects
+        the duplicate. Upstream
+        errors count towards recaptcha_breaker; while it is open,
+        verification fails at once with 'circuit-open'.
+        
         Args:
             token: reCAPTCHA token from frontend
             action: Expected action name (e.g., 'login', 'signup')
@@ -43,8 +123,11 @@ class ReCaptchaValidator:
                 'error_codes': list
             }
         """
+        enabled = getattr(settings, 'RECAPTCHA_ENABLED', RECAPTCHA_ENABLED)
+        secret_key = getattr(settings, 'RECAPTCHA_SECRET_KEY', RECAPTCHA_SECRET_KEY)
+        
         # Skip verification if CAPTCHA is disabled (for testing)
-        if not RECAPTCHA_ENABLED:
+        if not enabled:
             logger.warning("reCAPTCHA is disabled - skipping verification")
             return {
                 'success': True,
@@ -54,10 +137,10 @@ class ReCaptchaValidator:
             }
         
         # Check if keys are configured
-        if not RECAPTCHA_SECRET_KEY:
+        if not secret_key:
             logger.error("reCAPTCHA SECRET_KEY not configured")
             # If disabled, allow through; otherwise block
-            if not RECAPTCHA_ENABLED:
+            if not enabled:
                 return {
                     'success': True,
                     'score': 1.0,
@@ -78,9 +161,23 @@ class ReCaptchaValidator:
                 'error_codes': ['missing-input-response']
             }
         
+        cache_key = _token_cache_key(token, action, remote_ip)
+        cached = cache.get(cache_key)
+        # A success is only reused by the one caller that removes it
+        if cached is not None and (not cached.get('success') or cache.delete(cache_key)):
+            return cached
+        
+        if recaptcha_breaker.is_open():
+            logger.warning("reCAPTCHA circuit open - skipping verification")
+            return {
+                'success': False,
+                'score': 0.0,
+                'error_codes': ['circuit-open']
+            }
+        
         # Prepare verification request
         payload = {
-            'secret': RECAPTCHA_SECRET_KEY,
+            'secret': secret_key,
             'response': token,
         }
         
@@ -89,13 +186,14 @@ class ReCaptchaValidator:
         
         try:
             # Send verification request to Google
-            response = requests.post(
-                RECAPTCHA_VERIFY_URL,
+            response = get_session().post(
+                getattr(settings, 'RECAPTCHA_VERIFY_URL', RECAPTCHA_VERIFY_URL),
                 data=payload,
-                timeout=5
+                timeout=getattr(settings, 'RECAPTCHA_TIMEOUT', RECAPTCHA_TIMEOUT)
             )
             response.raise_for_status()
             result = response.json()
+            cache.set(cache_key, result, RECAPTCHA_TOKEN_CACHE_TTL)
             
             # Log the verification
             if result.get('success'):
@@ -113,6 +211,7 @@ class ReCaptchaValidator:
             
         except requests.RequestException as e:
             logger.error(f"reCAPTCHA verification request failed: {str(e)}")
+            recaptcha_breaker.record_failure()
             return {
                 'success': False,
                 'score': 0.0,
@@ -227,7 +326,10 @@ def get_recaptcha_context():
     Returns:
         dict: Context with site key and enabled status
     """
+    site_key = getattr(settings, 'RECAPTCHA_SITE_KEY', RECAPTCHA_SITE_KEY)
+    secret_key = getattr(settings, 'RECAPTCHA_SECRET_KEY', RECAPTCHA_SECRET_KEY)
+    enabled = getattr(settings, 'RECAPTCHA_ENABLED', RECAPTCHA_ENABLED)
     return {
-        'RECAPTCHA_SITE_KEY': RECAPTCHA_SITE_KEY,
-        'RECAPTCHA_ENABLED': RECAPTCHA_ENABLED and bool(RECAPTCHA_SITE_KEY) and bool(RECAPTCHA_SECRET_KEY),
+        'RECAPTCHA_SITE_KEY': site_key,
+        'RECAPTCHA_ENABLED': enabled and bool(site_key) and bool(secret_key),
     }
@@ -1,13 +1,15 @@
 from __future__ import annotations
+from collections import defaultdict
 from decimal import Decimal
 from typing import Any, Dict, List, Optional
 from datetime import date, datetime, timedelta
 
 from django.contrib.auth.models import User
-from django.db.models import Count, Sum, Q
-from django.db.models.functions import Coalesce
+from django.db.models import Sum
+from django.utils import timezone
 
-from .models import EmissionRecord, Supplier, MaterialRequest
+from .models import EmissionRecord, EmissionRollup, Supplier, MaterialRequest
+from .rollups import _month_start, aggregate_emissions
 
 
 def _to_decimal(x) -> Decimal:
@@ -34,30 +36,27 @@ def get_dashboard_metrics(
     if country:
         qs = qs.filter(country=country)
     
-    # Calculate totals
-    from django.db import models
-    totals = qs.aggregate(
-        total_t=Coalesce(Sum("emissions_tons", output_field=models.FloatField()), 0.0),
-        total_kg=Coalesce(Sum("emissions_kg", output_field=models.FloatField()), 0.0),
-        records=Coalesce(Count("id"), 0),
-    )
-    
-    total_t = float(totals["total_t"] or 0)
-    
-    # Scope breakdown
-    by_scope = list(
-        qs.values("scope")
-        .annotate(value_t=Coalesce(Sum("emissions_tons", output_field=models.FloatField()), 0.0))
-        .order_by("scope")
-    )
+    # Totals, scope breakdown and monthly trend from one grouped rollup query.
+    # The trend covers whole calendar months, starting with the month that
+    # was 180 days ago (not only the records from that day on).
+    rows = aggregate_emissions(user, ("month", "scope"), date_from=date_from, date_to=date_to, country=country)
+    scope_kg: Dict[str, float] = defaultdict(float)
+    month_kg: Dict[date, float] = defaultdict(float)
+    trend_start = _month_start((timezone.now() - timedelta(days=180)).date())
+    for row in rows:
+        scope_kg[row["scope"]] += row["sum_kg"]
+        if row["month"] >= trend_start:
+            month_kg[row["month"]] += row["sum_kg"]
+    total_t = sum(scope_kg.values()) / 1000
+    total_records = sum(row["count"] for row in rows)
     
     scope_breakdown = []
-    for row in by_scope:
-        value_t = float(row["value_t"] or 0)
+    for scope in sorted(scope_kg):
+        value_t = scope_kg[scope] / 1000
         pct = (value_t / total_t * 100) if total_t > 0 else 0
         scope_breakdown.append(
             {
-                "scope": f"Scope {row['scope']}",
+                "scope": f"Scope {scope}",
                 "value_t": value_t,
                 "percentage": pct,
             }
@@ -82,33 +81,23 @@ def get_dashboard_metrics(
         )[:10]
     )
     
-    # Monthly trend (last 6 months)
-    six_months_ago = datetime.now() - timedelta(days=180)
-    monthly_data = (
-        qs.filter(created_at__gte=six_months_ago)
-        .extra(select={'month': "strftime('%%Y-%%m', created_at)"})
-        .values('month')
-        .annotate(total=Sum('emissions_tons', output_field=models.FloatField()))
-        .order_by('month')
-    )
-    
     # Calculate completion percentage (based on having records in all 3 scopes)
-    scopes_with_data = set(qs.values_list('scope', flat=True))
+    scopes_with_data = set(scope_kg)
     completion_percentage = len(scopes_with_data) * 33.33  # Each scope = ~33%
     
     return {
         "total_emissions_tons": total_t,
-        "total_records": int(totals["records"]),
+        "total_records": int(total_records),
         "suppliers_count": int(suppliers_count),
         "pending_requests": int(pending_requests),
         "scope_breakdown": scope_breakdown,
         "completion_percentage": min(100, completion_percentage),
         "monthly_trends": [
             {
-                "month": m["month"],
-                "emissions_tons": float(m["total"] or 0),
+                "month": month.strftime("%Y-%m"),
+                "emissions_tons": month_kg[month] / 1000,
             }
-            for m in monthly_data
+            for month in sorted(month_kg)
         ],
         "latest_records": [
             {
@@ -122,4 +111,31 @@ def get_dashboard_metrics(
             }
             for r in latest_records
         ],
-    }
\ No newline at end of file
+    }
+
+
+def get_recent_months(user: User, months: int = 6) -> List[Dict[str, Any]]:
+    """
+    Emissions and record counts for the last ``months`` calendar months
+    (oldest first, current month last), from one grouped rollup query.
+    """
+    starts = [_month_start(timezone.localdate())]
+    for _ in range(months - 1):
+        starts.append(_month_start(starts[-1] - timedelta(days=1)))
+    starts.reverse()
+    
+    totals = {
+        row["month"]: row
+        for row in EmissionRollup.objects.filter(user=user, month__gte=starts[0])
+        .values("month")
+        .annotate(total_kg=Sum("sum_kg"), records=Sum("count"))
+        .order_by()
+    }
+    return [
+        {
+            "month": month,
+            "emissions_kg": float(totals.get(month, {}).get("total_kg") or 0),
+            "records": int(totals.get(month, {}).get("records") or 0),
+        }
+        for month in starts
+    ]
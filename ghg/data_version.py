@@ -0,0 +1,144 @@
+"""
+Per-user data versions and a response cache keyed by them.
+
+Every change to a user's EmissionRecord, Supplier, CustomEmissionFactor
+or ReportExtraInfo rows bumps that user's UserDataVersion in the same
+transaction as the change: signals cover single saves and deletes, and
+bulk writers call bump_data_version themselves. Responses cached under
+(view, user, version, params) therefore never go stale. A write moves
+readers to a new key, and old entries simply expire.
+
+The same key doubles as a strong ETag, so browsers revalidating an
+unchanged response get a 304 after a single version lookup.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, time
+from functools import wraps
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.translation import get_language
+
+from .models import GlobalDataVersion, UserDataVersion
+
+
+# Versioned entries are never stale, so this only bounds cache growth
+API_CACHE_TIMEOUT = getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 3600)
+
+
+def bump_data_version(user_ids: Iterable[int], create: bool = True) -> None:
+    """
+    Publish a new data version for each user (inside the caller's transaction).
+
+    With create=False, users without a version row are skipped. Delete
+    signals pass it, since the owner may be deleted in the same cascade.
+    """
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not user_ids:
+        return
+    with transaction.atomic(savepoint=False):
+        if create:
+            UserDataVersion.objects.bulk_create(
+                [UserDataVersion(user_id=user_id) for user_id in user_ids], ignore_conflicts=True
+            )
+        UserDataVersion.objects.filter(user_id__in=user_ids).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+
+
+def get_data_state(user) -> Tuple[int, Optional[datetime]]:
+    """(data version, time of the last change) of ``user``; (0, None) before any change"""
+    state = UserDataVersion.objects.filter(user=user).values_list('version', 'updated_at').first()
+    return state or (0, None)
+
+
+def get_data_version(user) -> int:
+    """Current data version of ``user`` (0 before their first change)"""
+    return get_data_state(user)[0]
+
+
+def bump_global_version(name: str) -> None:
+    """Publish a new version of the shared dataset ``name`` (inside the caller's transaction)"""
+    with transaction.atomic(savepoint=False):
+        GlobalDataVersion.objects.get_or_create(name=name)
+        GlobalDataVersion.objects.filter(name=name).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def get_global_version(name: str) -> int:
+    """Current version of the shared dataset ``name`` (0 before its first change)"""
+    return GlobalDataVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+
+def response_cache_key(request, view_name: str, version: int) -> str:
+    """Cache key for ``view_name`` under the request's user, version and parameters"""
+    params = '&'.join(
+        f'{key}={value}'
+        for key, values in sorted(request.GET.lists())
+        for value in sorted(values)
+    )
+    # Windows such as "last 6 months" move with the date
+    scope = f'{params}|{get_language()}|{timezone.localdate().isoformat()}'
+    digest = hashlib.sha256(scope.encode('utf-8')).hexdigest()[:32]
+    return f'ghg:api:{view_name}:{request.user.pk}:{version}:{digest}'
+
+
+def _last_modified(updated_at: Optional[datetime]) -> datetime:
+    # Responses also change at midnight (date windows), so never earlier than today
+    today = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    return max(updated_at, today) if updated_at else today
+
+
+def _add_validators(response, etag: str, last_modified: datetime):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Revalidate on every use; a 304 costs one version lookup
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def cache_per_data_version(view_func):
+    """
+    Cache a per-user JSON view's successful responses under the user's
+    data version and answer conditional GETs for them. Apply below
+    @login_required.
+    """
+    view_name = view_func.__name__
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+
+        version, updated_at = get_data_state(request.user)
+        key = response_cache_key(request, view_name, version)
+        etag = f'"{hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]}"'
+        last_modified = _last_modified(updated_at)
+
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if not_modified is not None:
+            return _add_validators(not_modified, etag, last_modified)
+
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return _add_validators(HttpResponse(content, content_type=content_type), etag, last_modified)
+
+        response = view_func(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, (response.content, response['Content-Type']), API_CACHE_TIMEOUT)
+            _add_validators(response, etag, last_modified)
+        return response
+
+    return wrapper
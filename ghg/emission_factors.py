@@ -8,7 +8,14 @@ GHG Emission Factors & Calculator
 All factors are in kg CO2e per unit.
 """
 
-from typing import Dict, Any
+from datetime import date
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .gwp import GASES, gas_factors
+from .units import UnitConversionError, conversion_factor, conversion_factors, fuel_for_source
 
 
 # ============================================
@@ -683,53 +690,159 @@ DOWNSTREAM_TRANSPORTATION: Dict[str, Dict[str, Any]] = {
 # 8) EMISSION FACTOR REGISTRY BY COUNTRY
 # ============================================
 
-def _build_emission_factor_registry(country: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+# The registries and the flat index below are built once at import time and
+# are read-only afterwards, so lookups on the calculation hot path never
+# allocate or rebuild anything.
+
+def _read_only(registry: Dict[str, Dict[str, Dict[str, Any]]]) -> Mapping[str, Mapping[str, Dict[str, Any]]]:
+    return MappingProxyType({category: MappingProxyType(factors) for category, factors in registry.items()})
+
+
+_GLOBAL_REGISTRY: Mapping[str, Mapping[str, Dict[str, Any]]] = _read_only({
+    "stationary": STATIONARY_COMBUSTION,
+    "mobile": MOBILE_COMBUSTION,
+    "fugitive": FUGITIVE_EMISSIONS,
+    "electricity": ELECTRICITY,
+    "steam-heat": STEAM_HEAT_COOLING,
+    "travel": BUSINESS_TRAVEL,
+    "waste": WASTE,
+    "water": WATER,
+    "purchased-goods": PURCHASED_GOODS_GLOBAL,
+    "capital-goods": CAPITAL_GOODS,
+    "fuel-energy": FUEL_ENERGY_RELATED,
+    "upstream-transport": UPSTREAM_TRANSPORTATION,
+    "commuting": EMPLOYEE_COMMUTING,
+    "upstream-leased": UPSTREAM_LEASED,
+    "downstream-transport": DOWNSTREAM_TRANSPORTATION,
+    "end-of-life": END_OF_LIFE,
+    "franchises": FRANCHISES,
+    "investments": INVESTMENTS,
+})
+
+_TURKEY_REGISTRY: Mapping[str, Mapping[str, Dict[str, Any]]] = _read_only({
+    "stationary": TURKEY_STATIONARY,
+    "mobile": TURKEY_TRANSPORTATION,
+    "fugitive": FUGITIVE_EMISSIONS,
+    "electricity": TURKEY_ELECTRICITY,
+    "steam-heat": TURKEY_DISTRICT_ENERGY,
+    "travel": TURKEY_TRANSPORTATION,
+    "waste": TURKEY_WASTE,
+    "water": WATER,                 # از Defra 2024
+    "purchased-goods": PURCHASED_GOODS_TURKEY,
+    "capital-goods": CAPITAL_GOODS,
+    "fuel-energy": FUEL_ENERGY_RELATED,
+    "upstream-transport": UPSTREAM_TRANSPORTATION,
+    "commuting": TURKEY_TRANSPORTATION,
+    "upstream-leased": UPSTREAM_LEASED,
+    "downstream-transport": DOWNSTREAM_TRANSPORTATION,
+    "end-of-life": TURKEY_WASTE,   # can be separated if needed
+    "franchises": FRANCHISES,
+    "investments": INVESTMENTS,
+})
+
+COUNTRY_REGISTRIES: Mapping[str, Mapping[str, Mapping[str, Dict[str, Any]]]] = MappingProxyType({
+    "global": _GLOBAL_REGISTRY,
+    "turkey": _TURKEY_REGISTRY,
+})
+
+# Flat (country, category, source) -> factor data index
+EMISSION_FACTOR_INDEX: Mapping[Tuple[str, str, str], Dict[str, Any]] = MappingProxyType({
+    (country_key, category_key, source_key): factor_data
+    for country_key, registry in COUNTRY_REGISTRIES.items()
+    for category_key, factors in registry.items()
+    for source_key, factor_data in factors.items()
+})
+
+# Per-gas factors of the built-in factors that have a breakdown, so plain
+# lookups don't re-derive them on every call
+_INDEX_GAS_FACTORS: Mapping[Tuple[str, str, str], Dict[str, float]] = MappingProxyType({
+    key: gases
+    for key, gases in ((key, gas_factors(factor_data)) for key, factor_data in EMISSION_FACTOR_INDEX.items())
+    if gases is not None
+})
+
+
+_NO_SOURCES: Mapping[str, Dict[str, Any]] = MappingProxyType({})
+
+
+def _case_variants(key: str):
+    return {key, key.lower(), key.upper(), key.title(), key.capitalize()}
+
+
+# Common spellings of country/category keys mapped to their canonical key, so
+# the usual inputs ('Turkey', 'GLOBAL', 'Electricity', ...) skip str.lower().
+_COUNTRY_ALIASES: Mapping[str, str] = MappingProxyType({
+    variant: country_key
+    for country_key in COUNTRY_REGISTRIES
+    for variant in _case_variants(country_key)
+})
+
+_CATEGORY_ALIASES: Mapping[str, str] = MappingProxyType({
+    variant: category_key
+    for category_key in _GLOBAL_REGISTRY
+    for variant in _case_variants(category_key)
+})
+
+
+def _resolve_country(country: str) -> str:
+    """
+    Internal helper: Maps a country name onto its registry key.
+    Anything other than Turkey falls back to the global factor set.
+    """
+    country_key = _COUNTRY_ALIASES.get(country)
+    if country_key is None:
+        country_key = "turkey" if country.lower() == "turkey" else "global"
+    return country_key
+
+
+def _resolve_category(category: str) -> str:
+    """
+    Internal helper: Returns the canonical (lowercase) category key.
+    """
+    category_key = _CATEGORY_ALIASES.get(category)
+    if category_key is None:
+        category_key = category.lower()
+    return category_key
+
+
+# Optional hook returning an override factor dict for
+# (country, category, source, activity date or None for today)
+FactorResolver = Callable[[str, str, str, Optional[date]], Optional[Dict[str, Any]]]
+
+
+def _lookup_factor(
+    country: str,
+    country_key: str,
+    category_key: str,
+    source: str,
+    resolve: Optional[FactorResolver] = None,
+    on_date: Optional[date] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Internal helper: Finds the factor for a source.
+
+    Without a resolver only the built-in tables are used. With one, the
+    precedence is: resolver for the country, built-in country table,
+    resolver for 'global', built-in global table.
+    """
+    if resolve is None:
+        return EMISSION_FACTOR_INDEX.get((country_key, category_key, source))
+
+    factor_data = resolve(country.lower(), category_key, source, on_date)
+    if factor_data is None and country_key != "global":
+        factor_data = EMISSION_FACTOR_INDEX.get((country_key, category_key, source))
+    if factor_data is None:
+        factor_data = resolve("global", category_key, source, on_date)
+    if factor_data is None and country_key == "global":
+        factor_data = EMISSION_FACTOR_INDEX.get((country_key, category_key, source))
+    return factor_data
+
+
+def _build_emission_factor_registry(country: str) -> Mapping[str, Mapping[str, Dict[str, Any]]]:
     """
     Internal helper: Returns categorized emission factors dictionary based on country.
     """
-    if country.lower() == "turkey":
-        return {
-            "stationary": TURKEY_STATIONARY,
-            "mobile": TURKEY_TRANSPORTATION,
-            "fugitive": FUGITIVE_EMISSIONS,
-            "electricity": TURKEY_ELECTRICITY,
-            "steam-heat": TURKEY_DISTRICT_ENERGY,
-            "travel": TURKEY_TRANSPORTATION,
-            "waste": TURKEY_WASTE,
-            "water": WATER,                 # از Defra 2024
-            "purchased-goods": PURCHASED_GOODS_TURKEY,
-            "capital-goods": CAPITAL_GOODS,
-            "fuel-energy": FUEL_ENERGY_RELATED,
-            "upstream-transport": UPSTREAM_TRANSPORTATION,
-            "commuting": TURKEY_TRANSPORTATION,
-            "upstream-leased": UPSTREAM_LEASED,
-            "downstream-transport": DOWNSTREAM_TRANSPORTATION,
-            "end-of-life": TURKEY_WASTE,   # can be separated if needed
-            "franchises": FRANCHISES,
-            "investments": INVESTMENTS,
-        }
-    else:
-        # Global / default
-        return {
-            "stationary": STATIONARY_COMBUSTION,
-            "mobile": MOBILE_COMBUSTION,
-            "fugitive": FUGITIVE_EMISSIONS,
-            "electricity": ELECTRICITY,
-            "steam-heat": STEAM_HEAT_COOLING,
-            "travel": BUSINESS_TRAVEL,
-            "waste": WASTE,
-            "water": WATER,
-            "purchased-goods": PURCHASED_GOODS_GLOBAL,
-            "capital-goods": CAPITAL_GOODS,
-            "fuel-energy": FUEL_ENERGY_RELATED,
-            "upstream-transport": UPSTREAM_TRANSPORTATION,
-            "commuting": EMPLOYEE_COMMUTING,
-            "upstream-leased": UPSTREAM_LEASED,
-            "downstream-transport": DOWNSTREAM_TRANSPORTATION,
-            "end-of-life": END_OF_LIFE,
-            "franchises": FRANCHISES,
-            "investments": INVESTMENTS,
-        }
+    return COUNTRY_REGISTRIES[_resolve_country(country)]
 
 
 # ============================================
@@ -740,7 +853,10 @@ def calculate_emissions(
     category: str,
     source: str,
     activity_data: float,
-    country: str = "global"
+    country: str = "global",
+    resolve: Optional[FactorResolver] = None,
+    on_date: Optional[date] = None,
+    unit: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Calculate CO2e emissions based on category, source, activity data, and country.
@@ -755,8 +871,12 @@ def calculate_emissions(
         source: Source key, such as:
             'coal-industrial', 'natural-gas', 'lpg', 'propane',
             'plastic', 'carton', 'metal-primary', ...
-        activity_data: Activity amount (in the unit defined in the factor)
+        activity_data: Activity amount (in ``unit``, default the factor's unit)
         country: 'global' or 'turkey'
+        resolve: Optional factor override lookup (e.g. factor_resolver.resolve_factor)
+        on_date: Activity date passed to ``resolve`` to pick the factor in force
+        unit: Unit of ``activity_data`` if it differs from the factor's unit
+            (e.g. 'kwh' for a 'gj' factor, 'm3' for a 'liters' factor)
 
     Returns:
         dict containing:
@@ -765,22 +885,35 @@ def calculate_emissions(
             - factor
             - unit
             - source_name
-            - activity_data
+            - activity_data (in the factor's unit)
             - country
             - reference (if available)
+            - input_unit, input_activity_data (if ``unit`` was given)
+            - co2_kg, ch4_kg, n2o_kg (if the factor has a gas breakdown)
     """
-    registry = _build_emission_factor_registry(country)
-    cat = category.lower()
-
-    if cat not in registry:
-        return {"error": f"Invalid category: {category}"}
-
-    factors_for_cat = registry[cat]
-    if source not in factors_for_cat:
+    country_key = _resolve_country(country)
+    cat = _resolve_category(category)
+
+    if resolve is None:
+        # Plain lookup: built-in tables only, per-gas factors precomputed
+        key = (country_key, cat, source)
+        factor_data = EMISSION_FACTOR_INDEX.get(key)
+        gases = _INDEX_GAS_FACTORS.get(key)
+    else:
+        factor_data = _lookup_factor(country, country_key, cat, source, resolve, on_date)
+        gases = gas_factors(factor_data)
+    if factor_data is None:
+        if cat not in COUNTRY_REGISTRIES[country_key]:
+            return {"error": f"Invalid category: {category}"}
         return {"error": f"Invalid source '{source}' for category '{category}' in country '{country}'"}
 
-    factor_data = factors_for_cat[source]
     factor = factor_data["factor"]
+    input_activity_data = activity_data
+    if unit:
+        try:
+            activity_data = activity_data * conversion_factor(unit, factor_data["unit"], fuel_for_source(source))
+        except UnitConversionError as e:
+            return {"error": str(e)}
 
     emissions_kg = activity_data * factor
     emissions_tons = emissions_kg / 1000.0
@@ -799,17 +932,200 @@ def calculate_emissions(
 
     if "source" in factor_data:
         result["reference"] = factor_data["source"]
+    if unit:
+        result["input_unit"] = unit
+        result["input_activity_data"] = input_activity_data
+
+    if gases is not None:
+        for gas in GASES:
+            result[f"{gas}_kg"] = round(activity_data * gases[gas], 6)
 
     return result
 
 
-def get_emission_sources(category: str, country: str = "global") -> Dict[str, Dict[str, Any]]:
+def calculate_emissions_batch(
+    items: Sequence[Sequence[Any]],
+    country: str = "global",
+    resolve: Optional[FactorResolver] = None
+) -> Dict[str, Any]:
+    """
+    Calculate CO2e emissions for many line items in one pass.
+
+    Factors are resolved once per distinct (country, category, source, date),
+    unit conversions once per distinct (fuel, unit, factor unit), and the
+    emissions are computed as NumPy arrays, rounded like calculate_emissions.
+
+    Args:
+        items: Sequence of (category, source, activity_data[, country[, on_date[, unit]]])
+            tuples. Items without a country (or with an empty one) use
+            ``country``; ``on_date`` is passed to ``resolve``; activity data
+            with a ``unit`` is converted to the factor's unit.
+        country: Default country, 'global' or 'turkey'
+        resolve: Optional factor override lookup, as for calculate_emissions
+
+    Returns:
+        dict of parallel per-item values:
+            - emissions_kg (float array, NaN where the item failed)
+            - emissions_tons (float array, NaN where the item failed)
+            - factor (float array, NaN where the item failed)
+            - activity_data (float array in the factor's unit, NaN if it was not numeric)
+            - co2_kg, ch4_kg, n2o_kg (float arrays, NaN without a gas breakdown)
+            - error_mask (bool array, True where the item failed)
+            - errors (list of error messages, None for valid items)
+            - factor_data (list of factor dicts, None for failed items)
+            - categories (list of normalized category keys)
+            - countries (list of lowercased countries)
+    """
+    count = len(items)
+    factors = np.full(count, np.nan)
+    activity = np.full(count, np.nan)
+    errors: List[Optional[str]] = [None] * count
+    factor_data_list: List[Optional[Dict[str, Any]]] = [None] * count
+    categories: List[Optional[str]] = [None] * count
+    countries: List[Optional[str]] = [None] * count
+    input_units: List[Optional[str]] = [None] * count
+    gas_rates = np.full((len(GASES), count), np.nan)
+    fuels: List[Optional[str]] = [None] * count
+
+    resolved: Dict[Tuple[Any, Any, Any, Any], Tuple[Any, ...]] = {}
+
+    for i, item in enumerate(items):
+        category, source, activity_data = item[0], item[1], item[2]
+        item_country = (item[3] if len(item) > 3 else None) or country
+        on_date = item[4] if len(item) > 4 else None
+
+        # Only string keys are cached; anything else (possibly unhashable) just fails validation
+        cacheable = all(isinstance(value, str) for value in (item_country, category, source))
+        key = (item_country, category, source, on_date)
+        lookup = resolved.get(key) if cacheable else None
+        if lookup is None:
+            factor_data, cat, error = _resolve_batch_item(category, source, item_country, resolve, on_date)
+            gases = gas_factors(factor_data)
+            lookup = (factor_data, cat, error, [gases[gas] for gas in GASES] if gases else None)
+            if cacheable:
+                resolved[key] = lookup
+        factor_data, cat, error, gas_rate = lookup
+
+        categories[i] = cat
+        countries[i] = item_country.lower() if isinstance(item_country, str) else None
+
+        if error is None:
+            try:
+                activity[i] = float(activity_data)
+            except (TypeError, ValueError):
+                error = f"Invalid activity data: {activity_data!r}"
+
+        if error is not None:
+            errors[i] = error
+            continue
+
+        factors[i] = factor_data["factor"]
+        factor_data_list[i] = factor_data
+        if gas_rate is not None:
+            gas_rates[:, i] = gas_rate
+        if len(item) > 5 and item[5]:
+            input_units[i] = item[5]
+            fuels[i] = fuel_for_source(source)
+
+    # Convert activity data to the factors' units
+    if any(input_units):
+        factor_units = [data["unit"] if data else None for data in factor_data_list]
+        multipliers, unit_errors = conversion_factors(input_units, factor_units, fuels)
+        activity = activity * multipliers
+        for i, error in enumerate(unit_errors):
+            if error is not None:
+                errors[i] = error
+                factors[i] = np.nan
+                factor_data_list[i] = None
+
+    error_mask = np.fromiter((e is not None for e in errors), dtype=bool, count=count)
+    emissions_kg = activity * factors
+    gas_kg = _round(np.where(error_mask, np.nan, gas_rates * activity), 6)
+
+    return {
+        "emissions_kg": _round(emissions_kg, 4),
+        "emissions_tons": _round(emissions_kg / 1000.0, 6),
+        "factor": factors,
+        "activity_data": activity,
+        **{f"{gas}_kg": gas_kg[row] for row, gas in enumerate(GASES)},
+        "error_mask": error_mask,
+        "errors": errors,
+        "factor_data": factor_data_list,
+        "categories": categories,
+        "countries": countries,
+    }
+
+
+def _round(values: np.ndarray, digits: int) -> np.ndarray:
+    """
+    Internal helper: Rounds element-wise like Python's round(), as calculate_emissions does.
+
+    np.round scales by 10**digits before rounding, which can move a value
+    lying within an ulp of a rounding midpoint to the other side of it. Only
+    those values are re-rounded with round().
+    """
+    with np.errstate(over="ignore", invalid="ignore"):
+        scaled = values * 10.0 ** digits
+        rounded = np.round(values, digits)
+        near_midpoint = np.abs(scaled - np.floor(scaled) - 0.5) <= np.abs(scaled) * (4 * np.finfo(float).eps)
+    for index in np.flatnonzero(near_midpoint):
+        rounded.flat[index] = round(float(values.flat[index]), digits)
+    return rounded
+
+
+def _resolve_batch_item(
+    category: Any,
+    source: Any,
+    country: Any,
+    resolve: Optional[FactorResolver] = None,
+    on_date: Optional[date] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[str]]:
+    """
+    Internal helper: Returns (factor_data, category_key, error) for one batch key.
+    """
+    if not isinstance(category, str) or not isinstance(country, str):
+        return None, None, f"Invalid category: {category}"
+
+    country_key = _resolve_country(country)
+    cat = _resolve_category(category)
+
+    factor_data = None
+    if isinstance(source, str):
+        factor_data = _lookup_factor(country, country_key, cat, source, resolve, on_date)
+    if factor_data is None:
+        if cat not in COUNTRY_REGISTRIES[country_key]:
+            return None, cat, f"Invalid category: {category}"
+        return None, cat, f"Invalid source '{source}' for category '{category}' in country '{country}'"
+
+    return factor_data, cat, None
+
+
+# GHG Protocol scope per category; anything not listed is reported as Scope 1
+SCOPE_2_CATEGORIES = frozenset({"electricity", "steam-heat"})
+SCOPE_3_CATEGORIES = frozenset({
+    "travel", "waste", "water", "purchased-goods", "capital-goods",
+    "fuel-energy", "upstream-transport", "commuting", "upstream-leased",
+    "downstream-transport", "end-of-life", "franchises", "investments",
+})
+
+
+def get_scope_for_category(category: str) -> str:
+    """
+    Returns the EmissionRecord scope ('1', '2' or '3') for a category key.
+    """
+    if category in SCOPE_2_CATEGORIES:
+        return "2"
+    if category in SCOPE_3_CATEGORIES:
+        return "3"
+    return "1"
+
+
+def get_emission_sources(category: str, country: str = "global") -> Mapping[str, Dict[str, Any]]:
     """
     Returns list of all available sources for a category and country.
     """
-    registry = _build_emission_factor_registry(country)
-    cat = category.lower()
-    return registry.get(cat, {})
+    registry = COUNTRY_REGISTRIES[_resolve_country(country)]
+    return registry.get(_resolve_category(category), _NO_SOURCES)
 
 
 def get_available_countries() -> Dict[str, str]:
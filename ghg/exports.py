@@ -0,0 +1,329 @@
+"""
+Streaming CSV and XLSX exports.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` and
+written to the client as they are produced, so the first byte goes out
+after one chunk and memory stays flat however many rows are exported.
+Related names come from joins in the same query, not one query per row.
+XLSX reports are written with openpyxl's write-only mode to a temporary
+file that is then streamed.
+"""
+
+import csv
+import tempfile
+
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Length
+from django.http import FileResponse, StreamingHttpResponse
+
+from .models import EmissionRecord, Supplier
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() returns what it was given"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    """
+    StreamingHttpResponse with a CSV attachment of ``header`` and ``rows``.
+
+    ``rows`` is any iterable of sequences; it is consumed lazily.
+    """
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def iter_values(queryset, *fields):
+    """Rows of ``fields`` from ``queryset``, fetched in chunks"""
+    # Admin querysets carry prefetches that values_list() does not need
+    return queryset.prefetch_related(None).values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def user_records_rows(user):
+    """Rows for the per-user emission data export"""
+    rows = iter_values(
+        EmissionRecord.objects.filter(user=user),
+        'created_at', 'scope', 'category', 'source_name', 'activity_data', 'unit',
+        'emissions_kg', 'emissions_tons', 'country', 'description', 'supplier__name', 'supplier_old',
+    )
+    for (created_at, scope, category, source_name, activity_data, unit, emissions_kg,
+         emissions_tons, country, description, supplier_name, supplier_old) in rows:
+        yield [
+            created_at.strftime('%Y-%m-%d %H:%M'), f"Scope {scope}", category, source_name,
+            activity_data, unit, emissions_kg, emissions_tons, country, description or '',
+            supplier_name or supplier_old or '',
+        ]
+
+
+def records_rows(queryset):
+    """Rows for the admin emission record export"""
+    rows = iter_values(
+        queryset,
+        'user__username', 'created_at', 'scope', 'source_name', 'activity_data', 'unit',
+        'emissions_kg', 'emissions_tons', 'country', 'supplier__name', 'description',
+    )
+    for (username, created_at, scope, source_name, activity_data, unit, emissions_kg,
+         emissions_tons, country, supplier_name, description) in rows:
+        yield [
+            username, created_at.strftime('%Y-%m-%d'), f'Scope {scope}', source_name,
+            activity_data, unit, emissions_kg, emissions_tons, country, supplier_name or '',
+            description or '',
+        ]
+
+
+def suppliers_rows(queryset):
+    """Rows for the admin supplier export, usage counted in the same query"""
+    queryset = queryset.annotate(
+        export_usage_count=Count('emission_records'),
+        export_total_kg=Sum('emission_records__emissions_kg'),
+    )
+    rows = iter_values(
+        queryset,
+        'name', 'supplier_type', 'contact_person', 'email', 'phone', 'country', 'city',
+        'tax_number', 'export_usage_count', 'export_total_kg', 'user__username',
+    )
+    for row in rows:
+        yield [*row[:9], row[9] or 0, row[10]]
+
+
+def factors_rows(queryset):
+    """Rows for the admin custom factor export"""
+    rows = iter_values(
+        queryset,
+        'name', 'category', 'factor_value', 'unit', 'is_verified', 'reference_source',
+        'user__username', 'created_at',
+    )
+    for name, category, factor_value, unit, is_verified, reference_source, username, created_at in rows:
+        yield [
+            name, category, factor_value, unit, 'Yes' if is_verified else 'No',
+            reference_source or '', username, created_at.strftime('%Y-%m-%d'),
+        ]
+
+
+def users_rows(queryset):
+    """Rows for the admin user export; each total is a correlated subquery"""
+    records = EmissionRecord.objects.filter(user=OuterRef('pk')).order_by().values('user')
+    suppliers = Supplier.objects.filter(user=OuterRef('pk')).order_by().values('user')
+    queryset = queryset.annotate(
+        export_total_kg=Subquery(records.annotate(total=Sum('emissions_kg')).values('total')),
+        export_record_count=Coalesce(Subquery(records.annotate(count=Count('pk')).values('count')), Value(0)),
+        export_supplier_count=Coalesce(Subquery(suppliers.annotate(count=Count('pk')).values('count')), Value(0)),
+    )
+    rows = iter_values(
+        queryset,
+        'username', 'email', 'first_name', 'last_name', 'date_joined', 'last_login', 'is_active',
+        'export_total_kg', 'export_record_count', 'export_supplier_count',
+    )
+    for (username, email, first_name, last_name, date_joined, last_login, is_active,
+         total_kg, record_count, supplier_count) in rows:
+        yield [
+            username, email, f'{first_name} {last_name}'.strip(), date_joined, last_login,
+            is_active, total_kg or 0, record_count, supplier_count,
+        ]
+
+
+# ============================================
+# XLSX reports
+# ============================================
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+MAX_COLUMN_WIDTH = 50
+
+SCOPE_FILLS = {'1': 'FEE2E2', '2': 'FEF3C7', '3': 'DBEAFE'}
+
+
+def column_width(length):
+    """Excel column width for text of ``length`` characters"""
+    return min(length + 2, MAX_COLUMN_WIDTH)
+
+
+def _number_length(*values, digits=3):
+    return max((len(str(round(value, digits))) for value in values if value is not None), default=1)
+
+
+class XlsxReport:
+    """
+    One-sheet report on an openpyxl write-only workbook.
+
+    Rows go straight to openpyxl's temporary files instead of a cell grid
+    in memory, and cells share named styles instead of carrying their own
+    Font/Fill/Border objects. A write-only sheet writes its column widths
+    before the first row, so widths are passed in up front (see
+    emission_report_xlsx for computing them in the totals query).
+    """
+
+    def __init__(self, sheet_title, accent, widths):
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+        from openpyxl.utils import get_column_letter
+
+        self.workbook = Workbook(write_only=True)
+        side = Side(style='thin')
+        border = Border(left=side, right=side, top=side, bottom=side)
+        styles = [
+            NamedStyle('report_title', font=Font(bold=True, size=16, color=accent),
+                       alignment=Alignment(horizontal='center', vertical='center')),
+            NamedStyle('report_info', font=Font(size=10, color='666666'), alignment=Alignment(horizontal='center')),
+            NamedStyle('report_summary', font=Font(bold=True, size=12, color=accent),
+                       alignment=Alignment(horizontal='center')),
+            NamedStyle('report_header', font=Font(bold=True, color='FFFFFF'), border=border,
+                       fill=PatternFill(start_color=accent, end_color=accent, fill_type='solid'),
+                       alignment=Alignment(horizontal='center', vertical='center')),
+        ]
+        styles += [
+            NamedStyle(f'report_scope_{scope}', border=border,
+                       fill=PatternFill(start_color=color, end_color=color, fill_type='solid'))
+            for scope, color in SCOPE_FILLS.items()
+        ]
+        for style in styles:
+            self.workbook.add_named_style(style)
+
+        self.sheet = self.workbook.create_sheet(sheet_title)
+        self.columns = len(widths)
+        self.last_column = get_column_letter(self.columns)
+        for index, width in enumerate(widths, 1):
+            self.sheet.column_dimensions[get_column_letter(index)].width = width
+        self.row_count = 0
+
+    def cell(self, value, style):
+        from openpyxl.cell import WriteOnlyCell
+
+        cell = WriteOnlyCell(self.sheet, value)
+        cell.style = style
+        return cell
+
+    def append(self, values):
+        self.sheet.append(values)
+        self.row_count += 1
+
+    def banner(self, value, style):
+        """A line of text merged across all columns"""
+        self.append([self.cell(value, style)])
+        self.sheet.merged_cells.add(f'A{self.row_count}:{self.last_column}{self.row_count}')
+
+    def header(self, headers):
+        self.append([self.cell(header, 'report_header') for header in headers])
+
+    def save(self, output):
+        """Write the workbook to the binary file ``output``"""
+        self.workbook.save(output)
+
+    def response(self, filename):
+        """FileResponse streaming the saved workbook from a temporary file"""
+        output = tempfile.TemporaryFile()
+        self.save(output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def _scope_rows(report, rows, scope_column):
+    """
+    Rows with the scope column as a cell filled by scope. Other values stay
+    plain: a styled cell costs several times a plain one to write.
+    """
+    scope_cells = {
+        scope: report.cell(f'Scope {scope}', f'report_scope_{scope}') for scope in SCOPE_FILLS
+    }
+    for row in rows:
+        scope = row[scope_column]
+        row[scope_column] = scope_cells.get(scope) or f'Scope {scope}'
+        yield row
+
+
+EMISSION_REPORT_HEADERS = [
+    'Date', 'Time', 'Scope', 'Source', 'Activity Data', 'Unit', 'Emissions (kg CO2e)',
+    'Emissions (tons CO2e)', 'Country', 'Description',
+]
+
+
+def emission_report_xlsx(records, sheet_title, heading, info):
+    """
+    The per-scope emission report. Totals and column widths come from one
+    aggregate query; the rows are then read once, in chunks.
+    """
+    stats = records.aggregate(
+        count=Count('pk'),
+        total_kg=Sum('emissions_kg'),
+        source=Max(Length('source_name')),
+        unit=Max(Length('unit')),
+        description=Max(Length('description')),
+        min_activity=Min('activity_data'),
+        max_activity=Max('activity_data'),
+        min_kg=Min('emissions_kg'),
+        max_kg=Max('emissions_kg'),
+        min_tons=Min('emissions_tons'),
+        max_tons=Max('emissions_tons'),
+    )
+    lengths = [
+        10, 8, 7, stats['source'] or 0, _number_length(stats['min_activity'], stats['max_activity'], digits=6),
+        stats['unit'] or 0, _number_length(stats['min_kg'], stats['max_kg']),
+        _number_length(stats['min_tons'], stats['max_tons'], digits=6), 6, stats['description'] or 0,
+    ]
+    widths = [column_width(max(length, len(header))) for length, header in zip(lengths, EMISSION_REPORT_HEADERS)]
+
+    report = XlsxReport(sheet_title, '2D7A5F', widths)
+    total_kg = stats['total_kg'] or 0
+    report.banner(heading, 'report_title')
+    report.banner(info, 'report_info')
+    report.append([])
+    report.banner(
+        f"Summary: {stats['count']} records | Total Emissions: {total_kg:.2f} kg CO2e "
+        f"({total_kg / 1000.0:.3f} tons CO2e)",
+        'report_summary',
+    )
+    report.append([])
+    report.header(EMISSION_REPORT_HEADERS)
+
+    rows = iter_values(
+        records, 'created_at', 'scope', 'source_name', 'activity_data', 'unit', 'emissions_kg',
+        'emissions_tons', 'country', 'description',
+    )
+    values = (
+        [
+            created_at.strftime('%Y-%m-%d'), created_at.strftime('%H:%M:%S'), scope, source_name,
+            activity_data, unit, round(emissions_kg, 3), round(emissions_tons, 6),
+            'Turkey' if country == 'turkey' else 'Global', description or '',
+        ]
+        for (created_at, scope, source_name, activity_data, unit, emissions_kg, emissions_tons,
+             country, description) in rows
+    )
+    for cells in _scope_rows(report, values, 2):
+        report.append(cells)
+    return report
+
+
+EMISSIONS_ANALYSIS_HEADERS = ['Source', 'Scope', 'Activity Data', 'Unit', 'Emissions (kg CO2e)', 'Emissions (tCO2e)']
+
+
+def emissions_analysis_xlsx(records, heading, period):
+    """The analysis page export, largest sources first"""
+    report = XlsxReport('Emissions Analysis', '10B981', [20] * len(EMISSIONS_ANALYSIS_HEADERS))
+    report.banner(heading, 'report_title')
+    report.banner(period, 'report_info')
+    report.append([])
+    report.header(EMISSIONS_ANALYSIS_HEADERS)
+
+    rows = iter_values(
+        records.order_by('-emissions_kg'),
+        'source_name', 'scope', 'activity_data', 'unit', 'emissions_kg', 'emissions_tons',
+    )
+    values = (
+        [source_name, scope, activity_data, unit, round(emissions_kg, 3), round(emissions_tons, 6)]
+        for source_name, scope, activity_data, unit, emissions_kg, emissions_tons in rows
+    )
+    for cells in _scope_rows(report, values, 1):
+        report.append(cells)
+    return report
@@ -0,0 +1,231 @@
+"""
+Database-backed emission factor resolver.
+
+Active EmissionFactorData rows are loaded once per process into an
+in-memory index keyed by (country, category, source), so calculations never
+query the database. A version token in the shared cache is replaced whenever
+factors change (see ghg.signals); each process compares it with the version
+it loaded and rebuilds its index when they differ.
+
+Factors found here take precedence over the built-in tables in
+emission_factors.py (see emission_factors.calculate_emissions).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from .gwp import GASES
+
+logger = logging.getLogger(__name__)
+
+FACTOR_VERSION_CACHE_KEY = 'emission_factors:version'
+
+# How often (seconds) a process checks the shared version token
+VERSION_CHECK_INTERVAL = getattr(settings, 'EMISSION_FACTOR_VERSION_CHECK_SECONDS', 5)
+
+# Country codes stored in EmissionFactorData mapped onto calculator country keys
+COUNTRY_CODE_ALIASES = {
+    'tr': 'turkey',
+    'tur': 'turkey',
+    'türkiye': 'turkey',
+    'turkiye': 'turkey',
+}
+
+FactorKey = Tuple[str, str, str]
+
+
+def _country_key(country_code: str) -> str:
+    code = (country_code or 'global').strip().lower()
+    return COUNTRY_CODE_ALIASES.get(code, code)
+
+
+def _row_priority(row: Dict[str, Any]) -> Tuple:
+    # Where validity windows overlap: default factors first, then the most
+    # recently started window, then the newest reference year
+    return (
+        row['is_default'],
+        row['valid_from'] or date.min,
+        row['reference_year'] or 0,
+        row['factor_data']['factor_id'],
+    )
+
+
+class FactorTimeline:
+    """
+    Validity windows of one (country, category, source) flattened into
+    disjoint segments.
+
+    ``starts[i]`` is the first day of segment i, which lasts until the day
+    before ``starts[i + 1]`` (the last one is open-ended). ``factors[i]`` is
+    the factor in force for the segment, or None for gaps, so the factor for
+    a date is a single bisect.
+    """
+
+    __slots__ = ('starts', 'factors')
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        boundaries = {date.min}
+        for row in rows:
+            boundaries.add(row['valid_from'] or date.min)
+            if row['valid_to'] is not None and row['valid_to'] < date.max:
+                boundaries.add(row['valid_to'] + timedelta(days=1))
+
+        self.starts: List[date] = []
+        self.factors: List[Optional[Dict[str, Any]]] = []
+        for boundary in sorted(boundaries):
+            covering = [
+                row for row in rows
+                if (row['valid_from'] or date.min) <= boundary
+                and (row['valid_to'] is None or row['valid_to'] >= boundary)
+            ]
+            factor = max(covering, key=_row_priority)['factor_data'] if covering else None
+            # Merge with the previous segment when the factor does not change
+            if self.factors and self.factors[-1] is factor:
+                continue
+            self.starts.append(boundary)
+            self.factors.append(factor)
+
+    def at(self, on_date: date) -> Optional[Dict[str, Any]]:
+        """Factor data in force on ``on_date``, or None"""
+        return self.factors[bisect_right(self.starts, on_date) - 1]
+
+
+class FactorSet:
+    """
+    Immutable index of active factors: one FactorTimeline per
+    (country, category, source).
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], version: Optional[str] = None):
+        self.version = version
+        grouped: Dict[FactorKey, List[Dict[str, Any]]] = {}
+        for row in rows:
+            key = (_country_key(row['country_code']), row['category'], row['source'])
+            grouped.setdefault(key, []).append(row)
+
+        self._timelines: Dict[FactorKey, FactorTimeline] = {
+            key: FactorTimeline(key_rows) for key, key_rows in grouped.items()
+        }
+        self._size = len(rows)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def timeline(self, country: str, category: str, source: str) -> Optional[FactorTimeline]:
+        return self._timelines.get((_country_key(country), category, source))
+
+    def lookup(self, country: str, category: str, source: str, on_date: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        """Factor data valid for ``on_date`` (default today), or None"""
+        timeline = self._timelines.get((_country_key(country), category, source))
+        if timeline is None:
+            return None
+        return timeline.at(on_date or date.today())
+
+
+def _load_rows() -> List[Dict[str, Any]]:
+    from .models_emission_sources import EmissionFactorData
+
+    rows = []
+    queryset = EmissionFactorData.objects.filter(
+        is_active=True,
+        source__is_active=True,
+    ).values(
+        'id', 'country_code', 'factor_value', 'unit', 'reference_source', 'reference_year',
+        'valid_from', 'valid_to', 'is_default', 'uncertainty_percentage', 'data_quality_rating',
+        'co2_factor', 'ch4_factor', 'n2o_factor',
+        'source__code', 'source__name_en', 'source__category__code',
+    )
+    for row in queryset.iterator():
+        factor_data = {
+            'factor': row['factor_value'],
+            'unit': row['unit'],
+            'name': row['source__name_en'],
+            'factor_id': row['id'],
+            'uncertainty': row['uncertainty_percentage'],
+            'data_quality': row['data_quality_rating'],
+        }
+        if row['reference_source']:
+            factor_data['source'] = row['reference_source']
+        # Gas breakdown (kg of each gas per unit), see ghg.gwp
+        for gas in GASES:
+            if row[f'{gas}_factor'] is not None:
+                factor_data[gas] = row[f'{gas}_factor']
+        rows.append({
+            'country_code': row['country_code'],
+            'category': row['source__category__code'].lower(),
+            'source': row['source__code'],
+            'valid_from': row['valid_from'],
+            'valid_to': row['valid_to'],
+            'is_default': row['is_default'],
+            'reference_year': row['reference_year'],
+            'factor_data': factor_data,
+        })
+    return rows
+
+
+_lock = threading.Lock()
+_factor_set: Optional[FactorSet] = None
+_checked_at = 0.0
+
+
+def _current_version() -> str:
+    version = cache.get(FACTOR_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(FACTOR_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(FACTOR_VERSION_CACHE_KEY)
+    return version
+
+
+def factor_version() -> str:
+    """Token that changes whenever emission factors change"""
+    return _current_version()
+
+
+def get_factor_set() -> FactorSet:
+    """Return this process's factor index, rebuilding it if it is stale"""
+    global _factor_set, _checked_at
+
+    now = time.monotonic()
+    factor_set = _factor_set
+    if factor_set is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return factor_set
+
+    with _lock:
+        version = _current_version()
+        if _factor_set is None or _factor_set.version != version:
+            try:
+                _factor_set = FactorSet(_load_rows(), version)
+            except DatabaseError as e:
+                # Tables missing (e.g. before migrate): use the built-in tables only
+                logger.warning(f"Could not load emission factors from the database: {e}")
+                _factor_set = FactorSet([], None)
+        _checked_at = now
+        return _factor_set
+
+
+def resolve_factor(country: str, category: str, source: str, on_date: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """
+    Resolver hook for emission_factors.calculate_emissions(_batch).
+
+    Returns the active database factor for (country, category, source) or None.
+    """
+    return get_factor_set().lookup(country, category, source, on_date)
+
+
+def invalidate_factor_cache() -> None:
+    """Publish a new factor version so every process reloads its index"""
+    global _factor_set
+    cache.set(FACTOR_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _factor_set = None
@@ -0,0 +1,114 @@
+"""
+Global warming potentials and per-gas CO2e re-weighting.
+
+Emission factors with a gas breakdown (EmissionFactorData.co2_factor,
+ch4_factor, n2o_factor, in kg of each gas per unit) give every record its
+CO2, CH4 and N2O masses. Stored CO2e totals use GWP_BASIS; any part of a
+total not explained by the three gases (other gases, rounding) is kept as
+is. Re-weighting a whole inventory under another GWP set is then a few
+NumPy array operations over the stored columns.
+"""
+
+from __future__ import annotations
+
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+import numpy as np
+
+
+GASES = ('co2', 'ch4', 'n2o')
+
+# 100-year GWPs from the IPCC Fourth, Fifth and Sixth Assessment Reports
+GWP_SETS: Mapping[str, Mapping[str, float]] = MappingProxyType({
+    'AR4': MappingProxyType({'co2': 1.0, 'ch4': 25.0, 'n2o': 298.0}),
+    'AR5': MappingProxyType({'co2': 1.0, 'ch4': 28.0, 'n2o': 265.0}),
+    'AR6': MappingProxyType({'co2': 1.0, 'ch4': 27.9, 'n2o': 273.0}),
+})
+
+# GWP set of stored emissions_kg values (the built-in factors use AR6)
+GWP_BASIS = 'AR6'
+
+
+def get_gwp_set(name: Optional[str]) -> Mapping[str, float]:
+    """GWP values for ``name`` ('AR4', 'AR5' or 'AR6', case-insensitive)"""
+    key = (name or GWP_BASIS).upper()
+    if key not in GWP_SETS:
+        raise ValueError(f"Unknown GWP set: {name}")
+    return GWP_SETS[key]
+
+
+def gas_factors(factor_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """Per-gas factors (kg gas per unit) of a factor dict, or None without a breakdown"""
+    if not factor_data or all(factor_data.get(gas) is None for gas in GASES):
+        return None
+    return {gas: factor_data.get(gas) or 0.0 for gas in GASES}
+
+
+def reweight_emissions(
+    emissions_kg: np.ndarray,
+    co2_kg: np.ndarray,
+    ch4_kg: np.ndarray,
+    n2o_kg: np.ndarray,
+    gwp_set: str,
+    basis: str = GWP_BASIS,
+) -> np.ndarray:
+    """
+    CO2e totals under ``gwp_set`` for arrays of stored records.
+
+    Gas arrays are NaN for records without a breakdown; those totals are
+    returned unchanged.
+    """
+    target = get_gwp_set(gwp_set)
+    stored = get_gwp_set(basis)
+    gases = np.stack([co2_kg, ch4_kg, n2o_kg]).astype(float)
+    has_breakdown = ~np.isnan(gases).all(axis=0)
+    gases = np.nan_to_num(gases)
+
+    weights = np.array([target[gas] - stored[gas] for gas in GASES])
+    delta = weights @ gases
+    return np.where(has_breakdown, np.asarray(emissions_kg, dtype=float) + delta, emissions_kg)
+
+
+def inventory_gwp_summary(queryset, gwp_set: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Per-gas totals and CO2e per scope and in total for a queryset of
+    EmissionRecords under ``gwp_set`` (default GWP_BASIS).
+
+    Loads the needed columns with one query and re-weights them as arrays.
+    """
+    gwp_name = (gwp_set or GWP_BASIS).upper()
+    get_gwp_set(gwp_name)
+
+    rows = list(queryset.values_list('scope', 'emissions_kg', 'co2_kg', 'ch4_kg', 'n2o_kg'))
+    if not rows:
+        return {
+            'gwp_set': gwp_name,
+            'gwp': dict(GWP_SETS[gwp_name]),
+            'total_t': 0.0,
+            'by_scope': {},
+            'gases_t': {gas: 0.0 for gas in GASES},
+            'records_with_breakdown': 0,
+        }
+
+    scopes = np.array([row[0] for row in rows])
+    columns = np.array([row[1:] for row in rows], dtype=float).T
+    emissions_kg, co2_kg, ch4_kg, n2o_kg = columns
+    totals = reweight_emissions(emissions_kg, co2_kg, ch4_kg, n2o_kg, gwp_name)
+
+    scope_labels, scope_index = np.unique(scopes, return_inverse=True)
+    by_scope = np.bincount(scope_index, weights=totals, minlength=len(scope_labels))
+
+    return {
+        'gwp_set': gwp_name,
+        'gwp': dict(GWP_SETS[gwp_name]),
+        'total_t': float(totals.sum()) / 1000.0,
+        'by_scope': {
+            str(label): float(value) / 1000.0 for label, value in zip(scope_labels, by_scope)
+        },
+        'gases_t': {
+            gas: float(np.nansum(values)) / 1000.0
+            for gas, values in zip(GASES, (co2_kg, ch4_kg, n2o_kg))
+        },
+        'records_with_breakdown': int((~np.isnan(columns[1:]).all(axis=0)).sum()),
+    }
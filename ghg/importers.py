@@ -0,0 +1,294 @@
+"""
+Streaming activity-data import from CSV and XLSX files.
+
+Rows are read one at a time, validated and calculated in fixed-size chunks
+and written with bulk_create, so memory use does not grow with file size.
+Each chunk is committed in its own transaction; invalid rows are skipped
+and reported instead of aborting the whole import.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+from .calculation_services import (
+    apply_activity_limit, batch_result, new_emission_record, parse_activity_data, parse_activity_date,
+)
+from .data_version import bump_data_version
+from .emission_factors import calculate_emissions_batch
+from .factor_resolver import resolve_factor
+from .models import EmissionRecord, Supplier
+from .rollups import add_records
+
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_REPORTED_ERRORS = 100
+IMPORT_PROGRESS_TIMEOUT = 60 * 60  # 1 hour
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx')
+
+REQUIRED_COLUMNS = ('category', 'source', 'activity_data')
+
+# Accepted spellings of column headers, mapped to the item key
+COLUMN_ALIASES = {
+    'category': 'category',
+    'source': 'source',
+    'source_key': 'source',
+    'activity_data': 'activity_data',
+    'activity': 'activity_data',
+    'amount': 'activity_data',
+    'quantity': 'activity_data',
+    'activity_date': 'activity_date',
+    'date': 'activity_date',
+    'country': 'country',
+    'unit': 'unit',
+    'activity_unit': 'unit',
+    'description': 'description',
+    'industry_type': 'industry_type',
+    'fuel_name': 'fuel_name',
+    'supplier': 'supplier',
+    'supplier_name': 'supplier',
+}
+
+
+class ActivityImportError(Exception):
+    """Raised when a file cannot be imported at all (format, headers)"""
+
+
+@dataclass
+class ImportProgress:
+    rows_processed: int = 0
+    rows_imported: int = 0
+    rows_failed: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    finished: bool = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'rows_processed': self.rows_processed,
+            'rows_imported': self.rows_imported,
+            'rows_failed': self.rows_failed,
+            'errors': self.errors,
+            'finished': self.finished,
+        }
+
+
+# ============================================
+# Row readers
+# ============================================
+
+def _normalize_header(header: Any) -> Optional[str]:
+    if header is None:
+        return None
+    key = str(header).strip().lower().replace(' ', '_').replace('-', '_')
+    return COLUMN_ALIASES.get(key)
+
+
+def _map_columns(headers) -> List[Optional[str]]:
+    columns = [_normalize_header(header) for header in headers]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ActivityImportError(f"Missing required column(s): {', '.join(missing)}")
+    return columns
+
+
+def _rows_to_items(rows, columns: List[Optional[str]]) -> Iterator[Dict[str, Any]]:
+    for row in rows:
+        item = {}
+        for key, value in zip(columns, row):
+            if key is None:
+                continue
+            if isinstance(value, str):
+                value = value.strip()
+            if value not in (None, ''):
+                item[key] = value
+        yield item
+
+
+def iter_csv_items(fileobj: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Yield one item per CSV row without reading the whole file"""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        try:
+            headers = next(reader)
+        except StopIteration:
+            raise ActivityImportError('The file is empty')
+        except UnicodeDecodeError:
+            raise ActivityImportError('CSV files must be UTF-8 encoded')
+        try:
+            yield from _rows_to_items(reader, _map_columns(headers))
+        except UnicodeDecodeError:
+            raise ActivityImportError('CSV files must be UTF-8 encoded')
+    finally:
+        # Leave the underlying upload open for the caller
+        text.detach()
+
+
+def iter_xlsx_items(fileobj: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Yield one item per row of the first worksheet in read-only mode"""
+    from openpyxl import load_workbook
+
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except Exception:
+        raise ActivityImportError('Could not read the Excel file')
+
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        try:
+            headers = next(rows)
+        except StopIteration:
+            raise ActivityImportError('The file is empty')
+        yield from _rows_to_items(rows, _map_columns(headers))
+    finally:
+        workbook.close()
+
+
+def iter_activity_items(fileobj: BinaryIO, filename: str) -> Iterator[Dict[str, Any]]:
+    """Pick the row reader from the file extension"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        return iter_csv_items(fileobj)
+    if extension == '.xlsx':
+        return iter_xlsx_items(fileobj)
+    raise ActivityImportError(
+        f"Unsupported file type '{extension}'. Allowed: {', '.join(SUPPORTED_EXTENSIONS)}"
+    )
+
+
+# ============================================
+# Import pipeline
+# ============================================
+
+def _import_chunk(
+    user: User,
+    items: List[Dict[str, Any]],
+    first_row: int,
+    default_country: str,
+    progress: ImportProgress,
+) -> None:
+    batch_items = []
+    errors: Dict[int, str] = {}
+    for index, item in enumerate(items):
+        activity_data = parse_activity_data(item.get('activity_data'))
+        try:
+            activity_date = parse_activity_date(item.get('activity_date'))
+        except ValueError:
+            activity_date = None
+            errors[index] = f"Invalid activity date: {item.get('activity_date')!r}"
+        if activity_data is None:
+            errors[index] = f"Invalid activity data: {item.get('activity_data')!r}"
+        batch_items.append((
+            str(item.get('category', '')),
+            str(item.get('source', '')),
+            activity_data,
+            str(item.get('country') or default_country),
+            activity_date,
+            str(item['unit']) if item.get('unit') else None,
+        ))
+
+    supplier_names = {str(item['supplier']) for item in items if 'supplier' in item}
+    suppliers = {
+        supplier.name: supplier
+        for supplier in Supplier.objects.filter(user=user, name__in=supplier_names)
+    } if supplier_names else {}
+
+    batch = calculate_emissions_batch(batch_items, default_country, resolve=resolve_factor)
+    apply_activity_limit(batch)
+
+    records = []
+    for index, item in enumerate(items):
+        error = errors.get(index) or batch['errors'][index]
+        supplier = None
+        if error is None and 'supplier' in item:
+            supplier = suppliers.get(str(item['supplier']))
+            if supplier is None:
+                error = f"Unknown supplier: {item['supplier']}"
+
+        if error is not None:
+            progress.rows_failed += 1
+            if len(progress.errors) < IMPORT_MAX_REPORTED_ERRORS:
+                progress.errors.append({'row': first_row + index, 'error': error})
+            continue
+
+        result = batch_result(batch, index, batch_items[index][1], batch_items[index][5], batch_items[index][2])
+        records.append(new_emission_record(
+            user, result, batch_items[index][3], item,
+            supplier=supplier, activity_date=batch_items[index][4],
+        ))
+
+    if records:
+        with transaction.atomic():
+            EmissionRecord.objects.bulk_create(records)
+            add_records(records)
+            bump_data_version([user.pk])
+    progress.rows_imported += len(records)
+    progress.rows_processed += len(items)
+
+
+def import_activity_data(
+    user: User,
+    fileobj: BinaryIO,
+    filename: str,
+    default_country: str = 'global',
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    progress_callback: Optional[Callable[[ImportProgress], None]] = None,
+) -> ImportProgress:
+    """
+    Import activity data rows from a CSV or XLSX file as EmissionRecords.
+
+    Args:
+        user: Owner of the created records
+        fileobj: Binary file object (an upload or an open file)
+        filename: Original file name, used to pick the reader
+        default_country: Country for rows without a country column
+        chunk_size: Rows calculated and inserted per chunk
+        progress_callback: Called with the running ImportProgress after each chunk
+
+    Returns:
+        ImportProgress with row counts and the first reported row errors.
+        Row numbers count the header as row 1, as spreadsheets do.
+    """
+    progress = ImportProgress()
+    items = iter_activity_items(fileobj, filename)
+    row_number = 2
+
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            break
+        _import_chunk(user, chunk, row_number, default_country, progress)
+        row_number += len(chunk)
+        if progress_callback:
+            progress_callback(progress)
+
+    progress.finished = True
+    if progress_callback:
+        progress_callback(progress)
+    return progress
+
+
+# ============================================
+# Progress reporting for web uploads
+# ============================================
+
+def _progress_cache_key(user_id: int, import_id: str) -> str:
+    return f"activity_import:{user_id}:{import_id}"
+
+
+def store_import_progress(user_id: int, import_id: str, progress: ImportProgress) -> None:
+    cache.set(_progress_cache_key(user_id, import_id), progress.as_dict(), IMPORT_PROGRESS_TIMEOUT)
+
+
+def get_import_progress(user_id: int, import_id: str) -> Optional[Dict[str, Any]]:
+    return cache.get(_progress_cache_key(user_id, import_id))
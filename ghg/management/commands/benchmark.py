@@ -0,0 +1,38 @@
+"""
+Management command to run the micro-benchmarks in ghg.benchmarks
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ghg.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = 'Run performance micro-benchmarks (see ghg/benchmarks.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='Benchmarks to run (default: all). Available: ' + ', '.join(sorted(BENCHMARKS)),
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=10000,
+            help='Iterations per timing run (default: 10000)',
+        )
+
+    def handle(self, *args, **options):
+        names = options['names'] or sorted(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+        for name in names:
+            self.stdout.write(self.style.SUCCESS(f"\n📊 {name}"))
+            for result in BENCHMARKS[name](options['iterations']):
+                self.stdout.write(
+                    f"   {result.name:<50} {result.seconds:>9.4f}s "
+                    f"({result.per_call_us:>9.2f} µs/iter)"
+                )
@@ -0,0 +1,60 @@
+"""
+Management command to import activity data from a CSV or XLSX file
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from ghg.importers import IMPORT_CHUNK_SIZE, ActivityImportError, import_activity_data
+
+
+class Command(BaseCommand):
+    help = 'Import activity data rows from a CSV or XLSX file as emission records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', type=str, help='Email of the user who owns the records')
+        parser.add_argument('path', type=str, help='Path to the .csv or .xlsx file')
+        parser.add_argument(
+            '--country',
+            default='global',
+            help='Country for rows without a country column (default: global)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help=f'Rows per insert chunk (default: {IMPORT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email__iexact=options['email']).first()
+        if not user:
+            raise CommandError(f"User not found: {options['email']}")
+
+        def report(progress):
+            if not progress.finished:
+                self.stdout.write(
+                    f'   {progress.rows_processed} rows processed '
+                    f'({progress.rows_imported} imported, {progress.rows_failed} skipped)'
+                )
+
+        path = options['path']
+        try:
+            with open(path, 'rb') as fileobj:
+                progress = import_activity_data(
+                    user,
+                    fileobj,
+                    path,
+                    default_country=options['country'],
+                    chunk_size=options['chunk_size'],
+                    progress_callback=report,
+                )
+        except (OSError, ActivityImportError) as e:
+            raise CommandError(str(e))
+
+        for error in progress.errors:
+            self.stdout.write(self.style.WARNING(f"   Row {error['row']}: {error['error']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Imported {progress.rows_imported} of {progress.rows_processed} rows '
+            f'for {user.email}'
+        ))
@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the monthly emission rollups from records
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from ghg.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly emission rollup table from emission records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='', help='Only rebuild rollups of the user with this email')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(email__iexact=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} not found")
+
+        rows = rebuild_rollups(user)
+        target = user.email if user else 'all users'
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {rows} rollup rows for {target}'))
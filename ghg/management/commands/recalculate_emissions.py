@@ -0,0 +1,80 @@
+"""
+Management command to recalculate stored emission records after factor changes
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ghg.models import RecalculationJob
+from ghg.recalculation import RECALC_CHUNK_SIZE, affected_records, run_recalculation_job
+
+
+class Command(BaseCommand):
+    help = 'Recalculate emission records affected by emission factor changes (resumable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', default='', help='Category key, e.g. stationary')
+        parser.add_argument('--source', default='', help='Source key, e.g. natural-gas')
+        parser.add_argument('--country', default='', help='Only records for this country')
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat,
+                            help='First activity date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat,
+                            help='Last activity date (YYYY-MM-DD)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report differences without writing them')
+        parser.add_argument('--job', type=int, help='Resume an existing job by id')
+        parser.add_argument('--pending', action='store_true',
+                            help='Run every pending job (e.g. queued from the admin)')
+        parser.add_argument('--chunk-size', type=int, default=RECALC_CHUNK_SIZE,
+                            help=f'Records per chunk (default: {RECALC_CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        if options['job']:
+            try:
+                jobs = [RecalculationJob.objects.get(pk=options['job'])]
+            except RecalculationJob.DoesNotExist:
+                raise CommandError(f"Recalculation job {options['job']} not found")
+            if jobs[0].status == 'completed':
+                raise CommandError(f"Recalculation job {jobs[0].pk} is already completed")
+        elif options['pending']:
+            jobs = list(RecalculationJob.objects.filter(status='pending').order_by('pk'))
+        else:
+            jobs = [RecalculationJob.objects.create(
+                category=options['category'],
+                source=options['source'],
+                country=options['country'],
+                date_from=options['date_from'],
+                date_to=options['date_to'],
+                dry_run=options['dry_run'],
+            )]
+
+        for job in jobs:
+            self.run_job(job, options['chunk_size'])
+
+    def run_job(self, job, chunk_size):
+        total = affected_records(job).count()
+        self.stdout.write(self.style.SUCCESS(f'🔄 Job {job.pk}: {job} ({total} affected records)'))
+
+        def report(job):
+            self.stdout.write(
+                f'   checked {job.records_checked}/{total}, changed {job.records_changed}, '
+                f'skipped {job.records_skipped} (checkpoint id {job.last_record_id})'
+            )
+
+        run_recalculation_job(job, chunk_size=chunk_size, progress_callback=report)
+
+        if job.dry_run:
+            for entry in job.report:
+                self.stdout.write(
+                    f"   #{entry['record_id']} {entry['category']}/{entry['source']} "
+                    f"{entry['activity_date']}: factor {entry['old_factor']} → {entry['new_factor']}, "
+                    f"{entry['old_emissions_kg']} → {entry['new_emissions_kg']} kg CO2e"
+                )
+            if job.records_changed > len(job.report):
+                self.stdout.write(f'   ... {job.records_changed - len(job.report)} more')
+
+        verb = 'would change' if job.dry_run else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Job {job.pk} {verb} {job.records_changed} records '
+            f'({job.emissions_delta_kg:+.2f} kg CO2e)'
+        ))
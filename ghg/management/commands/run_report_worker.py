@@ -0,0 +1,64 @@
+"""
+Management command that renders queued PDF/Excel reports in the background
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ghg.report_jobs import claim_next_job, purge_expired_jobs, requeue_stale_jobs, run_report_job
+
+# Seconds between stale job and expired file sweeps
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Render queued report jobs (run one or more of these next to the web server)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Render every pending job, then exit')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait when the queue is empty (default: 2)')
+        parser.add_argument('--max-jobs', type=int,
+                            help='Exit after rendering this many jobs')
+
+    def handle(self, *args, **options):
+        rendered = 0
+        last_maintenance = None
+        try:
+            while options['max_jobs'] is None or rendered < options['max_jobs']:
+                close_old_connections()
+                if last_maintenance is None or time.monotonic() - last_maintenance >= MAINTENANCE_INTERVAL:
+                    self.maintain()
+                    last_maintenance = time.monotonic()
+
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f'🔄 Job {job.pk}: {job.get_kind_display()} for {job.created_by.username}')
+                started = time.monotonic()
+                run_report_job(job)
+                rendered += 1
+                if job.status == 'completed':
+                    self.stdout.write(self.style.SUCCESS(
+                        f'✓ Job {job.pk}: {job.filename} ({job.size} bytes, {time.monotonic() - started:.1f}s)'
+                    ))
+                elif job.status == 'running':
+                    self.stdout.write(self.style.WARNING(f'⚠ Job {job.pk} was taken over by another worker'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'✗ Job {job.pk} failed: {job.error}'))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping report worker')
+
+    def maintain(self):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'⚠ {requeued} stalled jobs requeued or failed'))
+        purged = purge_expired_jobs()
+        if purged:
+            self.stdout.write(f'   removed {purged} expired jobs')
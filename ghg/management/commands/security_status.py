@@ -75,10 +75,7 @@ class Command(BaseCommand):
         # 6. Middleware
         self.stdout.write("\n🔧 MIDDLEWARE:")
         security_middleware = [
-            'ghg.arcjet_simulation.ArcjetSimulatorMiddleware',
-            'ghg.middleware.SecurityHeadersMiddleware',
-            'ghg.middleware.RateLimitMiddleware',
-            'ghg.middleware.SecurityLoggingMiddleware',
+            'ghg.middleware.SecurityPipelineMiddleware',
         ]
         
         for mw in security_middleware:
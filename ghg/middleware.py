@@ -1,120 +1,197 @@
 """
 Security middleware for Academia Carbon
+
+SecurityPipelineMiddleware runs every per-request security check from one
+place. The older single-purpose middleware below are kept for projects
+that still list them.
 """
 
 import logging
-from django.http import HttpResponseForbidden
+import math
+
+from django.conf import settings
+from django.http import HttpResponseForbidden, JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import AnonymousUser
-from django.core.cache import cache
-import time
+
+from .arcjet_simulation import SecurityDecision, arcjet_sim
+from .ratelimit import hit
+from .security_context import SecurityContext, allowed_requests, get_client_ip
 
 logger = logging.getLogger('ghg.security')
 
+SUSPICIOUS_PATTERNS = (
+    'admin', 'wp-admin', 'phpmyadmin', '.env', 'config',
+    'backup', 'sql', 'database', 'shell', 'cmd'
+)
+
+CONTENT_SECURITY_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://cdnjs.cloudflare.com; "
+    "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://cdnjs.cloudflare.com; "
+    "img-src 'self' data: https:; "
+    "font-src 'self' https://cdn.jsdelivr.net https://cdnjs.cloudflare.com; "
+    "connect-src 'self'; "
+    "frame-ancestors 'none';"
+)
+
+
+def add_security_headers(response):
+    """Set CSP and the other security headers on ``response``"""
+    # Content Security Policy
+    response['Content-Security-Policy'] = CONTENT_SECURITY_POLICY
+
+    # Additional security headers
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['X-Frame-Options'] = 'DENY'
+    response['X-XSS-Protection'] = '1; mode=block'
+    response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
+
+    # Remove server information
+    if 'Server' in response:
+        del response['Server']
+
+    return response
+
+
+def log_suspicious_path(request, path, ip):
+    """Log requests for paths that scanners commonly probe (``path`` lowercased)"""
+    if path.startswith('/admin/'):
+        return
+    if any(pattern in path for pattern in SUSPICIOUS_PATTERNS):
+        logger.warning(
+            f"Suspicious request: {request.method} {request.path} "
+            f"from {ip} "
+            f"User-Agent: {request.META.get('HTTP_USER_AGENT', 'Unknown')}"
+        )
+
+
+def log_failed_login(request, response, ip):
+    """Log failed login attempts (form errors in response)"""
+    if (request.path.endswith('/login/') and
+        response.status_code == 200 and
+        request.method == 'POST'):
+
+        if hasattr(response, 'context_data') and response.context_data:
+            form = response.context_data.get('form')
+            if form and form.errors:
+                logger.warning(
+                    f"Failed login attempt from {ip} "
+                    f"for user: {request.POST.get('email', 'Unknown')}"
+                )
+
+
+class SecurityPipelineMiddleware:
+    """
+    One middleware for the Arcjet simulation, rate limiting, security
+    logging and security headers.
+
+    The request is parsed once into a SecurityContext (also available to
+    views as ``request.security``). Rules run cheapest first and stop at
+    the first denial: path logging, bot and attack checks (string scans),
+    then the rate limits (one cache operation each). Requests that passed
+    the Arcjet rules carry that decision as ``request.security_decision``,
+    which arcjet_protect uses instead of checking again; when the rules
+    did not run (disabled, skipped path or a failed check) it is not set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.arcjet_enabled = getattr(settings, 'ARCJET_ENABLED', True)
+        self.allowed_log = allowed_requests
+
+    def __call__(self, request):
+        context = SecurityContext.from_request(request)
+        request.security = context
+
+        response = self.check(request, context)
+        if response is None:
+            self.allowed_log.record(context)
+            response = self.get_response(request)
+            log_failed_login(request, response, context.ip)
+        return add_security_headers(response)
+
+    def check(self, request, context):
+        """Run the rules; returns the denial response or None"""
+        path = context.path
+        # Static files skip every check
+        if path.startswith('/static/'):
+            return None
+
+        log_suspicious_path(request, path, context.ip)
+
+        arcjet = self.arcjet_enabled and not path.startswith(('/admin/', '/media/'))
+        try:
+            if arcjet and arcjet_sim.is_bot(context.user_agent, request):
+                logger.warning(f"Bot detected: {request.META.get('HTTP_USER_AGENT', '')}")
+                return JsonResponse({'error': 'Automated requests not allowed'}, status=403)
+
+            if arcjet and arcjet_sim.is_attack(request):
+                logger.warning(f"Request blocked by security filter: {context.ip} {request.path}")
+                return JsonResponse({'error': 'Request blocked by security filter'}, status=403)
+
+            if arcjet:
+                limit = arcjet_sim.rate_limit_for(request.path)
+                result = hit(f"arcjet_rate:{context.ip}:{request.path}", limit['max'], limit['window'])
+                if not result.allowed:
+                    logger.warning(f"Rate limit exceeded for {context.ip} on {request.path}")
+                    return JsonResponse({
+                        'error': 'Rate limit exceeded',
+                        'retry_after': math.ceil(result.reset_after)
+                    }, status=429)
+                request.security_decision = SecurityDecision(allowed=True)
+
+            # Rate limit: 100 requests per minute
+            if not hit(f"rate_limit_{context.ip}", limit=100, window=60).allowed:
+                logger.warning(f"Rate limit exceeded for IP: {context.ip}")
+                return HttpResponseForbidden("Rate limit exceeded. Please try again later.")
+        except Exception as e:
+            # If a check fails (e.g. the cache is down), don't block the user
+            logger.error(f"Security pipeline error: {e}")
+
+        return None
+
+
 class SecurityLoggingMiddleware(MiddlewareMixin):
     """Log security-related events"""
-    
+
     def process_request(self, request):
         # Log suspicious requests
-        suspicious_patterns = [
-            'admin', 'wp-admin', 'phpmyadmin', '.env', 'config',
-            'backup', 'sql', 'database', 'shell', 'cmd'
-        ]
-        
-        path = request.path.lower()
-        for pattern in suspicious_patterns:
-            if pattern in path and not path.startswith('/admin/'):
-                logger.warning(
-                    f"Suspicious request: {request.method} {request.path} "
-                    f"from {self.get_client_ip(request)} "
-                    f"User-Agent: {request.META.get('HTTP_USER_AGENT', 'Unknown')}"
-                )
-                break
-        
+        log_suspicious_path(request, request.path.lower(), get_client_ip(request))
         return None
-    
+
     def process_response(self, request, response):
         # Log failed login attempts
-        if (request.path.endswith('/login/') and 
-            response.status_code == 200 and 
-            request.method == 'POST'):
-            
-            # Check if login failed (form errors in response)
-            if hasattr(response, 'context_data') and response.context_data:
-                form = response.context_data.get('form')
-                if form and form.errors:
-                    logger.warning(
-                        f"Failed login attempt from {self.get_client_ip(request)} "
-                        f"for user: {request.POST.get('email', 'Unknown')}"
-                    )
-        
+        log_failed_login(request, response, get_client_ip(request))
         return response
-    
+
     def get_client_ip(self, request):
         """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_client_ip(request)
 
 class RateLimitMiddleware(MiddlewareMixin):
     """Simple rate limiting middleware"""
-    
+
     def process_request(self, request):
         # Skip rate limiting for static files
         if request.path.startswith('/static/'):
             return None
-        
+
         client_ip = self.get_client_ip(request)
-        cache_key = f"rate_limit_{client_ip}"
-        
-        # Get current request count
-        requests = cache.get(cache_key, 0)
-        
+
         # Rate limit: 100 requests per minute
-        if requests >= 100:
+        if not hit(f"rate_limit_{client_ip}", limit=100, window=60).allowed:
             logger.warning(f"Rate limit exceeded for IP: {client_ip}")
             return HttpResponseForbidden("Rate limit exceeded. Please try again later.")
-        
-        # Increment counter
-        cache.set(cache_key, requests + 1, 60)  # 60 seconds
-        
+
         return None
-    
+
     def get_client_ip(self, request):
         """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_client_ip(request)
 
 class SecurityHeadersMiddleware(MiddlewareMixin):
     """Add additional security headers"""
-    
+
     def process_response(self, request, response):
-        # Content Security Policy
-        response['Content-Security-Policy'] = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://cdnjs.cloudflare.com; "
-            "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://cdnjs.cloudflare.com; "
-            "img-src 'self' data: https:; "
-            "font-src 'self' https://cdn.jsdelivr.net https://cdnjs.cloudflare.com; "
-            "connect-src 'self'; "
-            "frame-ancestors 'none';"
-        )
-        
-        # Additional security headers
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'DENY'
-        response['X-XSS-Protection'] = '1; mode=block'
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        
-        # Remove server information
-        if 'Server' in response:
-            del response['Server']
-        
-        return response
\ No newline at end of file
+        return add_security_headers(response)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ghg', '0016_rename_fa_to_tr_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emissionrecord',
+            name='activity_date',
+            field=models.DateField(blank=True, help_text='Date of the activity (selects the emission factor in force)', null=True),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ghg', '0017_emissionrecord_activity_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecalculationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, help_text='Category key, e.g. stationary', max_length=50)),
+                ('source', models.CharField(blank=True, help_text='Source key, e.g. natural-gas', max_length=100)),
+                ('country', models.CharField(blank=True, help_text='Country of the records', max_length=50)),
+                ('date_from', models.DateField(blank=True, help_text='First activity date to recalculate', null=True)),
+                ('date_to', models.DateField(blank=True, help_text='Last activity date to recalculate', null=True)),
+                ('dry_run', models.BooleanField(default=False, help_text='Only report differences, do not write')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('last_record_id', models.BigIntegerField(default=0, help_text='Last processed EmissionRecord id')),
+                ('records_checked', models.IntegerField(default=0)),
+                ('records_changed', models.IntegerField(default=0)),
+                ('records_skipped', models.IntegerField(default=0, help_text='Records whose factor could not be resolved')),
+                ('emissions_delta_kg', models.FloatField(default=0, help_text='Total change in emissions (kg CO2e)')),
+                ('report', models.JSONField(blank=True, default=list, help_text='Sample of changed records (dry-run diff)')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Recalculation Job',
+                'verbose_name_plural': 'Recalculation Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='emissionrecord',
+            index=models.Index(fields=['category', 'source', 'country'], name='ghg_emissio_categor_ac8c95_idx'),
+        ),
+        migrations.AddField(
+            model_name='recalculationjob',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recalculation_jobs', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
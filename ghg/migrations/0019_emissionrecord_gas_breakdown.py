@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ghg', '0018_recalculationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emissionrecord',
+            name='ch4_kg',
+            field=models.FloatField(blank=True, help_text='CH4 emitted in kg', null=True),
+        ),
+        migrations.AddField(
+            model_name='emissionrecord',
+            name='co2_kg',
+            field=models.FloatField(blank=True, help_text='CO2 emitted in kg', null=True),
+        ),
+        migrations.AddField(
+            model_name='emissionrecord',
+            name='n2o_kg',
+            field=models.FloatField(blank=True, help_text='N2O emitted in kg', null=True),
+        ),
+    ]
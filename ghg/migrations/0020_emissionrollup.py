@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField, FloatField, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    EmissionRecord = apps.get_model('ghg', 'EmissionRecord')
+    EmissionRollup = apps.get_model('ghg', 'EmissionRollup')
+    grouped = (
+        EmissionRecord.objects.annotate(month=TruncMonth('created_at', output_field=DateField()))
+        .values('user_id', 'month', 'scope', 'category', 'source_name', 'country')
+        .annotate(sum_kg=Coalesce(Sum('emissions_kg'), Value(0.0, output_field=FloatField())), count=Count('id'))
+        .order_by()
+    )
+    EmissionRollup.objects.bulk_create((EmissionRollup(**row) for row in grouped.iterator()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ghg', '0019_emissionrecord_gas_breakdown'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmissionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month the records were created in')),
+                ('scope', models.CharField(choices=[('1', 'Scope 1 - Direct Emissions'), ('2', 'Scope 2 - Indirect Emissions (Energy)'), ('3', 'Scope 3 - Other Indirect Emissions')], max_length=1)),
+                ('category', models.CharField(max_length=50)),
+                ('source_name', models.CharField(max_length=200)),
+                ('country', models.CharField(max_length=50)),
+                ('sum_kg', models.FloatField(default=0, help_text='Total emissions in kg CO2e')),
+                ('count', models.IntegerField(default=0, help_text='Number of records')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='emission_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Emission Rollup',
+                'verbose_name_plural': 'Emission Rollups',
+                'indexes': [models.Index(fields=['user', 'month'], name='ghg_emissio_user_id_06aa2c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'scope', 'category', 'source_name', 'country'), name='unique_emission_rollup_key')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:22
+
+import django.db.models.deletion
+import ghg.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ghg', '0021_userdataversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('inventory_pdf', 'ISO 14064-1 Inventory (PDF)'), ('emissions_pdf', 'Emissions Inventory (PDF)'), ('emission_report_xlsx', 'Emission Report (Excel)'), ('emissions_analysis_xlsx', 'Emissions Analysis (Excel)')], max_length=50)),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Report filters (query parameters)')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('progress', models.PositiveSmallIntegerField(default=0, help_text='Percent done')),
+                ('stage', models.CharField(blank=True, help_text='What the worker is doing', max_length=100)),
+                ('attempts', models.PositiveSmallIntegerField(default=0, help_text='Times a worker has started the job')),
+                ('error', models.TextField(blank=True, null=True)),
+                ('download_token', models.CharField(default=ghg.models.report_download_token, max_length=64, unique=True)),
+                ('file_name', models.CharField(blank=True, help_text='Stored file name', max_length=255)),
+                ('filename', models.CharField(blank=True, help_text='Download file name', max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('size', models.BigIntegerField(default=0, help_text='File size in bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Report Job',
+                'verbose_name_plural': 'Report Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='ghg_reportj_status_134284_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_versions(apps, schema_editor):
+    # Delete signals only bump existing versions, so every user needs a row
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserDataVersion = apps.get_model('ghg', 'UserDataVersion')
+    missing = User.objects.filter(data_version__isnull=True).values_list('pk', flat=True)
+    UserDataVersion.objects.bulk_create(
+        (UserDataVersion(user_id=user_id) for user_id in missing.iterator()), batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ghg', '0022_reportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ghg', '0023_backfill_userdataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlobalDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the data last changed')),
+            ],
+            options={
+                'verbose_name': 'Global Data Version',
+                'verbose_name_plural': 'Global Data Versions',
+            },
+        ),
+    ]
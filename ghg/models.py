@@ -4,6 +4,7 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 from .validators import validate_document_file, sanitize_filename
 import os
+import secrets
 
 class Country(models.Model):
     name = models.CharField(max_length=100)
@@ -91,11 +92,18 @@ class EmissionRecord(models.Model):
     
     activity_data = models.FloatField(help_text="Amount of activity")
     unit = models.CharField(max_length=20, help_text="Unit of measurement")
+    activity_date = models.DateField(blank=True, null=True,
+                                     help_text="Date of the activity (selects the emission factor in force)")
     
     emission_factor = models.FloatField(help_text="Emission factor used")
     emissions_kg = models.FloatField(help_text="Total emissions in kg CO2e")
     emissions_tons = models.FloatField(help_text="Total emissions in tons CO2e")
     
+    # Per-gas masses, when the emission factor has a CO2/CH4/N2O breakdown
+    co2_kg = models.FloatField(blank=True, null=True, help_text="CO2 emitted in kg")
+    ch4_kg = models.FloatField(blank=True, null=True, help_text="CH4 emitted in kg")
+    n2o_kg = models.FloatField(blank=True, null=True, help_text="N2O emitted in kg")
+    
     country = models.CharField(max_length=50, default='global', help_text="Country for emission factors")
     reference = models.TextField(blank=True, null=True, help_text="Reference source for emission factor")
     
@@ -126,11 +134,18 @@ class EmissionRecord(models.Model):
         indexes = [
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['user', 'scope']),
+            # Finding records affected by a factor change
+            models.Index(fields=['category', 'source', 'country']),
         ]
     
     def __str__(self):
         return f"{self.user.username} - {self.source_name} - {self.emissions_kg} kg CO2e"
     
+    @property
+    def effective_date(self):
+        """Activity date, or the creation date for records entered without one"""
+        return self.activity_date or self.created_at.date()
+    
     def clean(self):
         """Additional validation"""
         super().clean()
@@ -346,6 +361,170 @@ class IndustryRequest(models.Model):
         return f"{self.industry_name} - {self.get_status_display()}"
 
 
+class RecalculationJob(models.Model):
+    """Recalculation of stored emission records after emission factors change"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    # Which records are affected (blank = any)
+    category = models.CharField(max_length=50, blank=True, help_text="Category key, e.g. stationary")
+    source = models.CharField(max_length=100, blank=True, help_text="Source key, e.g. natural-gas")
+    country = models.CharField(max_length=50, blank=True, help_text="Country of the records")
+    date_from = models.DateField(blank=True, null=True, help_text="First activity date to recalculate")
+    date_to = models.DateField(blank=True, null=True, help_text="Last activity date to recalculate")
+    
+    dry_run = models.BooleanField(default=False, help_text="Only report differences, do not write")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Checkpoint: records are processed in primary key order
+    last_record_id = models.BigIntegerField(default=0, help_text="Last processed EmissionRecord id")
+    records_checked = models.IntegerField(default=0)
+    records_changed = models.IntegerField(default=0)
+    records_skipped = models.IntegerField(default=0, help_text="Records whose factor could not be resolved")
+    emissions_delta_kg = models.FloatField(default=0, help_text="Total change in emissions (kg CO2e)")
+    report = models.JSONField(default=list, blank=True, help_text="Sample of changed records (dry-run diff)")
+    error = models.TextField(blank=True, null=True)
+    
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='recalculation_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        verbose_name = "Recalculation Job"
+        verbose_name_plural = "Recalculation Jobs"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        target = '/'.join(part for part in (self.category, self.source, self.country) if part) or 'all records'
+        return f"Recalculate {target} - {self.get_status_display()}"
+
+
+def report_download_token():
+    return secrets.token_urlsafe(32)
+
+
+class ReportJob(models.Model):
+    """A PDF or Excel report rendered in the background by the report worker"""
+    KIND_CHOICES = [
+        ('inventory_pdf', 'ISO 14064-1 Inventory (PDF)'),
+        ('emissions_pdf', 'Emissions Inventory (PDF)'),
+        ('emission_report_xlsx', 'Emission Report (Excel)'),
+        ('emissions_analysis_xlsx', 'Emissions Analysis (Excel)'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True, help_text="Report filters (query parameters)")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent done")
+    stage = models.CharField(max_length=100, blank=True, help_text="What the worker is doing")
+    attempts = models.PositiveSmallIntegerField(default=0, help_text="Times a worker has started the job")
+    error = models.TextField(blank=True, null=True)
+
+    # The rendered file, under settings.REPORT_JOB_ROOT
+    download_token = models.CharField(max_length=64, unique=True, default=report_download_token)
+    file_name = models.CharField(max_length=255, blank=True, help_text="Stored file name")
+    filename = models.CharField(max_length=255, blank=True, help_text="Download file name")
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField(default=0, help_text="File size in bytes")
+
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Report Job"
+        verbose_name_plural = "Report Jobs"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.created_by.username} - {self.get_status_display()}"
+
+
+class EmissionRollup(models.Model):
+    """
+    Monthly totals of a user's EmissionRecords, maintained incrementally
+    (see ghg.rollups) so dashboards and reports do not scan raw records.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='emission_rollups')
+    month = models.DateField(help_text="First day of the month the records were created in")
+    scope = models.CharField(max_length=1, choices=EmissionRecord.SCOPE_CHOICES)
+    category = models.CharField(max_length=50)
+    source_name = models.CharField(max_length=200)
+    country = models.CharField(max_length=50)
+    
+    sum_kg = models.FloatField(default=0, help_text="Total emissions in kg CO2e")
+    count = models.IntegerField(default=0, help_text="Number of records")
+    
+    class Meta:
+        verbose_name = "Emission Rollup"
+        verbose_name_plural = "Emission Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month', 'scope', 'category', 'source_name', 'country'],
+                name='unique_emission_rollup_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'month']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.month:%Y-%m} - {self.source_name} - {self.sum_kg} kg CO2e"
+
+
+class UserDataVersion(models.Model):
+    """
+    Counter bumped whenever a user's emission data changes (see
+    ghg.data_version); per-user API responses are cached under it.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='data_version')
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now, help_text="When the data last changed")
+    
+    class Meta:
+        verbose_name = "User Data Version"
+        verbose_name_plural = "User Data Versions"
+    
+    def __str__(self):
+        return f"{self.user.username} - v{self.version}"
+
+
+class GlobalDataVersion(models.Model):
+    """
+    Counter bumped whenever a shared dataset (e.g. EmissionData) changes
+    (see ghg.data_version); used as the ETag of views serving it.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now, help_text="When the data last changed")
+    
+    class Meta:
+        verbose_name = "Global Data Version"
+        verbose_name_plural = "Global Data Versions"
+    
+    def __str__(self):
+        return f"{self.name} - v{self.version}"
+
+
 # ============================================
 # Emission Sources Management Models
 # مدل‌های مدیریت منابع انتشار
@@ -0,0 +1,75 @@
+"""
+Atomic rate limiting on the shared cache.
+
+Counters live in per-window buckets: a key includes the window number
+(``now // window``), so a bucket expires on its own and steady clients
+cannot keep a window alive by hitting it. A hit is one atomic
+cache.incr() in the steady state. The first hit of a window falls back
+to cache.add(), and incr() again if another worker created the bucket
+first. Nothing is read and then written back, so concurrent requests
+are never lost.
+
+Fixed windows cost one cache operation per hit. Sliding windows also
+read the previous bucket and weight it by how much of it still
+overlaps the window (one extra operation).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from django.core.cache import cache
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    count: float
+    limit: int
+    reset_after: float
+
+
+def _bucket_key(key: str, window: int, bucket: int) -> str:
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+    return f'ratelimit:{digest}:{window}:{bucket}'
+
+
+def _increment(bucket_key: str, timeout: int) -> int:
+    try:
+        return cache.incr(bucket_key)
+    except ValueError:
+        pass
+    if cache.add(bucket_key, 1, timeout):
+        return 1
+    # Created by a concurrent request in between
+    return cache.incr(bucket_key)
+
+
+def hit(key: str, limit: int, window: int, sliding: bool = False, now: Optional[float] = None) -> RateLimitResult:
+    """
+    Count one request against ``key`` and report whether it is within
+    ``limit`` requests per ``window`` seconds.
+
+    Requests over the limit are counted too, so a client that keeps
+    hammering stays blocked until the window moves on.
+    """
+    now = time.time() if now is None else now
+    bucket, elapsed = divmod(now, window)
+    bucket = int(bucket)
+    # Sliding windows need the previous bucket for one more window
+    timeout = window * 2 if sliding else window
+
+    count = float(_increment(_bucket_key(key, window, bucket), timeout))
+    if sliding:
+        previous = cache.get(_bucket_key(key, window, bucket - 1), 0)
+        count += previous * (1 - elapsed / window)
+
+    return RateLimitResult(
+        allowed=count <= limit,
+        count=count,
+        limit=limit,
+        reset_after=window - elapsed,
+    )
@@ -0,0 +1,199 @@
+"""
+Incremental recalculation of stored emission records.
+
+When emission factors change, a RecalculationJob selects only the affected
+records by (category, source, country, activity date range), walks them in
+primary key order in fixed-size chunks, recomputes them with the vectorized
+batch calculator and writes changed rows back with bulk_update. The last
+processed id is saved with every chunk, so an interrupted job resumes where
+it stopped. Dry-run jobs only collect a diff report.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .calculation_services import recalculate_emission_records
+from .data_version import bump_data_version
+from .factor_resolver import COUNTRY_CODE_ALIASES
+from .gwp import GASES
+from .models import EmissionRecord, RecalculationJob
+from .rollups import RollupKey, apply_rollup_deltas, rollup_key
+
+
+RECALC_CHUNK_SIZE = 2000
+RECALC_UPDATE_BATCH_SIZE = 500
+RECALC_REPORT_LIMIT = 200
+
+RECALC_FIELDS = [
+    'emission_factor', 'emissions_kg', 'emissions_tons', 'co2_kg', 'ch4_kg', 'n2o_kg',
+    'reference', 'updated_at',
+]
+
+# Only the columns needed to recalculate and write back a record
+_RECORD_COLUMNS = [
+    'id', 'user_id', 'scope', 'category', 'source', 'source_name', 'country', 'activity_data', 'activity_date', 'unit',
+    'emission_factor', 'emissions_kg', 'emissions_tons', 'co2_kg', 'ch4_kg', 'n2o_kg',
+    'reference', 'created_at',
+]
+
+
+def affected_records(job: RecalculationJob):
+    """Records matching the job's category, source, country and date range"""
+    qs = EmissionRecord.objects.all()
+    if job.category:
+        qs = qs.filter(category=job.category)
+    if job.source:
+        qs = qs.filter(source=job.source)
+    if job.country:
+        qs = qs.filter(country__iexact=job.country)
+    # Records without an activity date are dated by their creation date
+    if job.date_from:
+        qs = qs.filter(
+            Q(activity_date__gte=job.date_from)
+            | Q(activity_date__isnull=True, created_at__date__gte=job.date_from)
+        )
+    if job.date_to:
+        qs = qs.filter(
+            Q(activity_date__lte=job.date_to)
+            | Q(activity_date__isnull=True, created_at__date__lte=job.date_to)
+        )
+    return qs
+
+
+def job_for_factor(factor, user=None, dry_run: bool = False) -> RecalculationJob:
+    """Create a pending job covering the records an EmissionFactorData row applies to"""
+    country_code = (factor.country_code or 'global').strip().lower()
+    country = COUNTRY_CODE_ALIASES.get(country_code, country_code)
+    return RecalculationJob.objects.create(
+        category=factor.source.category.code.lower(),
+        source=factor.source.code,
+        # A global factor can apply to records of any country
+        country='' if country == 'global' else country,
+        date_from=factor.valid_from,
+        date_to=factor.valid_to,
+        dry_run=dry_run,
+        created_by=user,
+    )
+
+
+def _diff_entry(record: EmissionRecord, result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'record_id': record.id,
+        'user_id': record.user_id,
+        'category': record.category,
+        'source': record.source,
+        'country': record.country,
+        'activity_date': record.effective_date.isoformat(),
+        'old_factor': record.emission_factor,
+        'new_factor': result['factor'],
+        'old_emissions_kg': record.emissions_kg,
+        'new_emissions_kg': result['emissions_kg'],
+    }
+
+
+def _process_chunk(job: RecalculationJob, records: List[EmissionRecord]) -> None:
+    results = recalculate_emission_records(records)
+
+    # A factor whose unit changed cannot be applied to the stored activity data
+    usable = np.array([
+        result is not None and result['unit'] == record.unit
+        for record, result in results
+    ], dtype=bool)
+    old_factor = np.array([record.emission_factor for record in records], dtype=float)
+    old_kg = np.array([record.emissions_kg for record in records], dtype=float)
+    new_factor = np.array([result['factor'] if result else np.nan for _, result in results], dtype=float)
+    new_kg = np.array([result['emissions_kg'] if result else np.nan for _, result in results], dtype=float)
+
+    same_gases = np.ones(len(records), dtype=bool)
+    for gas in GASES:
+        old_gas = np.array([getattr(record, f'{gas}_kg') for record in records], dtype=float)
+        new_gas = np.array([result.get(f'{gas}_kg') if result else None for _, result in results], dtype=float)
+        same_gases &= np.isclose(old_gas, new_gas, equal_nan=True)
+
+    changed = usable & ~(np.isclose(old_factor, new_factor) & np.isclose(old_kg, new_kg) & same_gases)
+    changed_indexes = np.flatnonzero(changed)
+
+    now = timezone.now()
+    updated = []
+    rollup_deltas: Dict[RollupKey, List[float]] = {}
+    for index in changed_indexes:
+        record, result = results[index]
+        if len(job.report) < RECALC_REPORT_LIMIT:
+            job.report.append(_diff_entry(record, result))
+        delta = rollup_deltas.setdefault(rollup_key(record), [0.0, 0])
+        delta[0] += result['emissions_kg'] - (record.emissions_kg or 0.0)
+        record.emission_factor = result['factor']
+        record.emissions_kg = result['emissions_kg']
+        record.emissions_tons = result['emissions_tons']
+        for gas in GASES:
+            setattr(record, f'{gas}_kg', result.get(f'{gas}_kg'))
+        record.reference = result.get('reference', record.reference)
+        # bulk_update() does not apply auto_now
+        record.updated_at = now
+        updated.append(record)
+
+    job.records_checked += len(records)
+    job.records_changed += len(updated)
+    job.records_skipped += int((~usable).sum())
+    job.emissions_delta_kg += float((new_kg - old_kg)[changed].sum())
+    job.last_record_id = records[-1].id
+
+    # Rows and checkpoint are committed together, so a resumed job never
+    # skips or re-applies a chunk
+    with transaction.atomic():
+        if updated and not job.dry_run:
+            EmissionRecord.objects.bulk_update(updated, RECALC_FIELDS, batch_size=RECALC_UPDATE_BATCH_SIZE)
+            apply_rollup_deltas(rollup_deltas)
+            bump_data_version({record.user_id for record in updated})
+        job.save()
+
+
+def run_recalculation_job(
+    job: RecalculationJob,
+    chunk_size: int = RECALC_CHUNK_SIZE,
+    max_chunks: Optional[int] = None,
+    progress_callback: Optional[Callable[[RecalculationJob], None]] = None,
+) -> RecalculationJob:
+    """
+    Run (or resume) a recalculation job from its checkpoint.
+
+    Args:
+        job: The job to run
+        chunk_size: Records loaded, recalculated and written per chunk
+        max_chunks: Stop after this many chunks (the job stays resumable)
+        progress_callback: Called with the job after each chunk
+
+    Returns:
+        The job, 'completed' when every affected record has been processed
+    """
+    job.status = 'running'
+    job.error = None
+    job.save(update_fields=['status', 'error', 'updated_at'])
+
+    queryset = affected_records(job).only(*_RECORD_COLUMNS).order_by('pk')
+    chunks = 0
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            records = list(queryset.filter(pk__gt=job.last_record_id)[:chunk_size])
+            if not records:
+                job.status = 'completed'
+                job.completed_at = timezone.now()
+                job.save(update_fields=['status', 'completed_at', 'updated_at'])
+                break
+            _process_chunk(job, records)
+            chunks += 1
+            if progress_callback:
+                progress_callback(job)
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    return job
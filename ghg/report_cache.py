@@ -0,0 +1,163 @@
+"""
+Disk cache of rendered PDF and Excel reports.
+
+A rendered report is stored under a key made of the report type, its
+filter parameters, the user, the render date and a fingerprint of the
+data it was built from. The fingerprint is the count and latest
+updated_at of the matching records (one aggregate query) plus the
+emission factor version. Any change to those records or factors changes
+the key, so entries never go stale; they are only evicted. Reports print
+their date in the "Generated on" line and the download file name, so
+they are rendered again the next day. Repeat downloads of an unchanged
+report are served from disk without running the report's queries or
+reportlab.
+
+Each entry is a directory named by the key, holding one file named as it
+is downloaded. Serving an entry refreshes its mtime. When the cache grows
+past REPORT_CACHE_MAX_BYTES, the entries with the oldest mtime are
+removed first (least recently used). The cache lives on local disk and
+is shared by every process on the host.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from datetime import date
+from typing import BinaryIO, Mapping, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .factor_resolver import factor_version
+from .reporting.renderers import REPORT_TYPES, Progress, no_progress
+
+# Bump when a renderer's output changes, so old entries are not served
+REPORT_CACHE_VERSION = 1
+
+
+def report_cache_key(kind: str, user, params: Mapping[str, str]) -> str:
+    """Key of the report ``kind`` for ``user`` and ``params`` over the current data"""
+    stats = REPORT_TYPES[kind].records(user, params).aggregate(count=Count('pk'), updated=Max('updated_at'))
+    parts = [
+        REPORT_CACHE_VERSION, kind, user.pk, user.username, user.email, sorted(params.items()),
+        date.today().isoformat(), stats['count'], stats['updated'].isoformat() if stats['updated'] else None, factor_version(),
+    ]
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+
+class ReportCache:
+    """Rendered reports under ``root``, at most ``max_bytes`` in total"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str) -> Optional[Tuple[BinaryIO, str]]:
+        """(open file, download file name) of ``key``, or None"""
+        directory = self._entry_dir(key)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return None
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                report = open(path, 'rb')
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted meanwhile
+                continue
+            return report, name
+        return None
+
+    def put(self, key: str, source: str, filename: str) -> BinaryIO:
+        """Move the file ``source`` into the cache under ``key`` and return it opened"""
+        directory = self._entry_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, os.path.basename(filename))
+        os.replace(source, path)
+        # Opened before evicting, so the caller can serve it even if it goes first
+        report = open(path, 'rb')
+        self.evict()
+        return report
+
+    def entries(self):
+        """(mtime, size, path) of every cached file"""
+        entries = []
+        for prefix in _scandir(self.root):
+            for entry_dir in _scandir(prefix.path):
+                for entry in _scandir(entry_dir.path):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self) -> int:
+        """Remove least recently used files until the cache fits its budget"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                # Removed by another process, or a second file in the entry
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def _scandir(path):
+    try:
+        with os.scandir(path) as entries:
+            return [entry for entry in entries if entry.is_dir() or entry.is_file()]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def get_report_cache() -> ReportCache:
+    return ReportCache(settings.REPORT_CACHE_ROOT, settings.REPORT_CACHE_MAX_BYTES)
+
+
+def cached_report(kind: str, user, params: Mapping[str, str]) -> Optional[Tuple[BinaryIO, str]]:
+    """The cached rendering of a report, or None"""
+    return get_report_cache().get(report_cache_key(kind, user, params))
+
+
+def render_report(
+    kind: str, user, params: Mapping[str, str], progress: Progress = no_progress,
+) -> Tuple[BinaryIO, str]:
+    """
+    (open file, download file name) of a report, from the cache or freshly
+    rendered into it. The caller closes the file.
+    """
+    cache = get_report_cache()
+    key = report_cache_key(kind, user, params)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    os.makedirs(cache.root, exist_ok=True)
+    output = tempfile.NamedTemporaryFile(dir=cache.root, suffix='.part', delete=False)
+    try:
+        with output:
+            filename = REPORT_TYPES[kind].render(user, params, output, progress)
+        return cache.put(key, output.name, filename), filename
+    finally:
+        if os.path.exists(output.name):
+            os.remove(output.name)
@@ -0,0 +1,283 @@
+"""
+Background rendering of PDF and Excel reports.
+
+The web tier only inserts a pending ReportJob and answers; a worker
+process (``manage.py run_report_worker``) claims jobs one at a time,
+renders them with the renderers in ghg.reporting.renderers and stores the
+file under settings.REPORT_JOB_ROOT, named by the job's download token.
+The browser polls the job's status and then downloads the file by token.
+Reports found in the report cache (ghg.report_cache) complete as soon as
+they are queued.
+
+A job is claimed with a conditional UPDATE (pending -> running), so any
+number of workers can share the queue. While it renders, a heartbeat
+thread refreshes the job's updated_at every HEARTBEAT_INTERVAL seconds
+for as long as the worker's claim (the job's attempt number) holds. A job
+whose worker died stops beating and is put back in the queue after
+REPORT_JOB_STALE_SECONDS, up to REPORT_JOB_MAX_ATTEMPTS times. Every write
+to a claimed job is conditional on that claim, so a worker that lost its
+job (it was requeued and claimed again) cannot complete or fail it; its
+file is named by attempt and discarded. Files and jobs older than
+REPORT_JOB_RETENTION_HOURS are removed by the worker.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from typing import BinaryIO, Dict, Mapping, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ReportJob
+from .report_cache import cached_report, render_report
+from .reporting.renderers import REPORT_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress writes while a report renders
+PROGRESS_INTERVAL = 1.0
+
+# Seconds between heartbeats of a running job; well under REPORT_JOB_STALE_SECONDS
+HEARTBEAT_INTERVAL = 60.0
+
+
+class ReportQueueFull(Exception):
+    """The user already has the maximum number of unfinished report jobs"""
+
+
+def report_root() -> str:
+    return str(settings.REPORT_JOB_ROOT)
+
+
+def job_file_path(job: ReportJob) -> str:
+    return os.path.join(report_root(), job.file_name)
+
+
+def active_jobs(user):
+    return ReportJob.objects.filter(created_by=user, status__in=['pending', 'running'])
+
+
+def enqueue_report(user, kind: str, params: Mapping[str, str]) -> ReportJob:
+    """
+    Queue a report for ``user``. An identical unfinished job is returned
+    instead of queueing the same report twice.
+
+    Raises:
+        ValueError: Unknown report kind, or parameters the report cannot use
+        ReportQueueFull: Too many unfinished jobs for this user
+    """
+    if kind not in REPORT_TYPES:
+        raise ValueError(f"Unknown report type: {kind}")
+    params = dict(params)
+
+    active = active_jobs(user)
+    for job in active.filter(kind=kind):
+        if job.params == params:
+            return job
+    if active.count() >= settings.REPORT_JOB_MAX_ACTIVE_PER_USER:
+        raise ReportQueueFull(
+            f"{settings.REPORT_JOB_MAX_ACTIVE_PER_USER} reports are already being prepared"
+        )
+
+    # An unchanged report is ready at once, without waiting for the worker
+    cached = cached_report(kind, user, params)
+    job = ReportJob.objects.create(created_by=user, kind=kind, params=params)
+    if cached is not None:
+        report, filename = cached
+        with report:
+            _complete_job(job, report, filename)
+    return job
+
+
+def claim_next_job() -> Optional[ReportJob]:
+    """Mark the oldest pending job as running and return it, or None if the queue is empty"""
+    while True:
+        pk = (
+            ReportJob.objects.filter(status='pending')
+            .order_by('created_at', 'pk')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if pk is None:
+            return None
+        # Another worker may claim the same job between the two queries
+        claimed = ReportJob.objects.filter(pk=pk, status='pending').update(
+            status='running', progress=0, stage='Starting', attempts=F('attempts') + 1,
+            started_at=timezone.now(), updated_at=timezone.now(),
+        )
+        if claimed:
+            return ReportJob.objects.select_related('created_by').get(pk=pk)
+
+
+def _claimed(job: ReportJob):
+    """The job's row while it is still in the state (and attempt) this process holds it in"""
+    return ReportJob.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts)
+
+
+def _progress_writer(job: ReportJob):
+    """Progress callback that writes to the job at most every PROGRESS_INTERVAL seconds"""
+    last = [0.0]
+
+    def progress(percent: int, stage: str) -> None:
+        now = time.monotonic()
+        if now - last[0] < PROGRESS_INTERVAL:
+            return
+        last[0] = now
+        job.progress, job.stage = percent, stage
+        _claimed(job).update(progress=percent, stage=stage, updated_at=timezone.now())
+
+    return progress
+
+
+def touch_job(job: ReportJob) -> bool:
+    """Refresh a running job's updated_at while this worker's claim holds; False once it is lost"""
+    return _claimed(job).update(updated_at=timezone.now()) == 1
+
+
+class _Heartbeat(threading.Thread):
+    """Touches a job every HEARTBEAT_INTERVAL seconds until stopped"""
+
+    def __init__(self, job: ReportJob):
+        super().__init__(name=f'report-job-{job.pk}-heartbeat', daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(HEARTBEAT_INTERVAL):
+                if not touch_job(self.job):
+                    logger.warning("Report job %s is no longer claimed by this worker", self.job.pk)
+                    return
+        except Exception:
+            logger.exception("Report job %s heartbeat failed", self.job.pk)
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stopped.set()
+        self.join()
+        return False
+
+
+def _complete_job(job: ReportJob, report: BinaryIO, filename: str) -> bool:
+    """
+    Place the rendered ``report`` at the job's download path and mark the
+    job completed. False (and the file is removed) if the job is no longer
+    held by this process.
+    """
+    report_type = REPORT_TYPES[job.kind]
+    os.makedirs(report_root(), exist_ok=True)
+    # Per attempt, so a worker that lost the job never replaces the file of the one that has it
+    file_name = f'{job.download_token}-{job.attempts}.{report_type.extension}'
+    path = os.path.join(report_root(), file_name)
+    try:
+        # Shares the report cache's file; evicting it there leaves this name
+        os.link(report.name, path)
+    except OSError:
+        with tempfile.NamedTemporaryFile(dir=report_root(), suffix='.part', delete=False) as output:
+            shutil.copyfileobj(report, output)
+        os.replace(output.name, path)
+
+    completed = {
+        'status': 'completed',
+        'progress': 100,
+        'stage': 'Ready',
+        'file_name': file_name,
+        'filename': filename,
+        'content_type': report_type.content_type,
+        'size': os.path.getsize(path),
+        'completed_at': timezone.now(),
+    }
+    if not _claimed(job).update(updated_at=timezone.now(), **completed):
+        os.remove(path)
+        logger.warning("Report job %s is no longer claimed by this worker; discarding its file", job.pk)
+        return False
+    for field, value in completed.items():
+        setattr(job, field, value)
+    return True
+
+
+def run_report_job(job: ReportJob) -> ReportJob:
+    """
+    Render a claimed job (or take it from the report cache) and store it
+    for download. Files are moved into place complete, so a download never
+    sees a partial file. A job this worker no longer holds is returned
+    still 'running', unchanged.
+    """
+    try:
+        with _Heartbeat(job):
+            report, filename = render_report(job.kind, job.created_by, job.params, _progress_writer(job))
+        with report:
+            _complete_job(job, report, filename)
+    except Exception as e:
+        logger.exception("Report job %s (%s) failed", job.pk, job.kind)
+        error = str(e) or e.__class__.__name__
+        completed_at = timezone.now()
+        if _claimed(job).update(status='failed', error=error, completed_at=completed_at, updated_at=completed_at):
+            job.status, job.error, job.completed_at = 'failed', error, completed_at
+    return job
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Return running jobs without a heartbeat for REPORT_JOB_STALE_SECONDS
+    (their worker died) to the queue, or fail them after REPORT_JOB_MAX_ATTEMPTS.
+    """
+    stale = ReportJob.objects.filter(
+        status='running',
+        updated_at__lt=timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_SECONDS),
+    )
+    failed = stale.filter(attempts__gte=settings.REPORT_JOB_MAX_ATTEMPTS).update(
+        status='failed', error='The report worker stopped while rendering this report',
+        completed_at=timezone.now(), updated_at=timezone.now(),
+    )
+    requeued = stale.update(status='pending', stage='', updated_at=timezone.now())
+    return failed + requeued
+
+
+def purge_expired_jobs() -> int:
+    """Delete finished jobs and stored files older than REPORT_JOB_RETENTION_HOURS"""
+    cutoff = timezone.now() - timedelta(hours=settings.REPORT_JOB_RETENTION_HOURS)
+    expired = ReportJob.objects.filter(status__in=['completed', 'failed'], completed_at__lt=cutoff)
+    for job in expired.exclude(file_name=''):
+        try:
+            os.remove(job_file_path(job))
+        except FileNotFoundError:
+            pass
+    deleted, _ = expired.delete()
+
+    # Files of deleted users' jobs and leftovers of interrupted renders
+    if os.path.isdir(report_root()):
+        with os.scandir(report_root()) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff.timestamp():
+                    os.remove(entry.path)
+    return deleted
+
+
+def job_status(job: ReportJob) -> Dict[str, object]:
+    """The job's state as returned by the status endpoint"""
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'stage': job.stage,
+        # Details are in the admin; users get a generic message
+        'error': 'The report could not be generated' if job.status == 'failed' else None,
+        'filename': job.filename or None,
+        'size': job.size if job.status == 'completed' else None,
+    }
@@ -0,0 +1,508 @@
+"""
+Report renderers shared by the download views and the background report
+worker (see ghg.report_jobs).
+
+Each renderer takes the user, the report's filter parameters (the query
+string of the download view, as a dict of strings) and a binary file to
+write to, and returns the file name to download it as. ``progress`` is
+called with a percentage and a short stage description as it goes.
+reportlab and openpyxl are imported when a report is rendered, so a
+missing library only breaks its own report type.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Mapping, Optional
+
+from django.contrib.auth.models import User
+from django.utils.timezone import now
+
+from ghg import exports
+from ghg.gwp import GWP_SETS
+from ghg.models import EmissionRecord
+
+from .services import InventoryFilters, compute_inventory_summary, get_inventory_queryset, inventory_snapshot
+
+Params = Mapping[str, str]
+Progress = Callable[[int, str], None]
+
+
+def no_progress(percent: int, stage: str) -> None:
+    pass
+
+
+def parse_date(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def parse_gwp_set(value: Optional[str]) -> Optional[str]:
+    value = (value or "").upper()
+    return value if value in GWP_SETS else None
+
+
+def _filter_value(value: Optional[str]) -> Optional[str]:
+    return None if value in (None, "", "all") else value
+
+
+def inventory_filters(user: User, params: Params) -> InventoryFilters:
+    """InventoryFilters from the inventory page's query parameters ('all' is no filter)"""
+    return InventoryFilters(
+        user=user,
+        date_from=parse_date(params.get("from")),
+        date_to=parse_date(params.get("to")),
+        scope=_filter_value(params.get("scope")),
+        country=_filter_value(params.get("country")),
+        gwp_set=parse_gwp_set(params.get("gwp")),
+    )
+
+
+def inventory_pdf(user: User, params: Params, output: BinaryIO, progress: Progress = no_progress) -> str:
+    """The ISO 14064-1 inventory report (reporting app)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+    filters = inventory_filters(user, params)
+    date_from, date_to, scope, country = filters.date_from, filters.date_to, filters.scope, filters.country
+
+    progress(10, "Calculating inventory")
+    summary = compute_inventory_summary(filters)
+
+    progress(60, "Rendering PDF")
+    doc = SimpleDocTemplate(output, pagesize=A4, topMargin=1*inch, bottomMargin=1*inch)
+
+    # Get styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=1,  # Center
+        textColor=colors.HexColor('#2c5530')
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        textColor=colors.HexColor('#2c5530')
+    )
+
+    # Build PDF content
+    story = []
+
+    # Title
+    story.append(Paragraph("ISO 14064-1 Emissions Inventory Report", title_style))
+    story.append(Paragraph(f"Generated on {now().strftime('%B %d, %Y at %H:%M')}", styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    # Filters
+    if any([date_from, date_to, scope, country]):
+        filter_text = "Filters Applied: "
+        filters_list = []
+        if date_from:
+            filters_list.append(f"From: {date_from}")
+        if date_to:
+            filters_list.append(f"To: {date_to}")
+        if scope:
+            filters_list.append(f"Scope: {scope}")
+        if country:
+            filters_list.append(f"Country: {country}")
+        filter_text += ", ".join(filters_list)
+        story.append(Paragraph(filter_text, styles['Normal']))
+        story.append(Spacer(1, 12))
+
+    # Executive Summary
+    story.append(Paragraph("Executive Summary", heading_style))
+    summary_data = [
+        ['Metric', 'Value'],
+        ['Total Emissions (tCO₂e)', f"{summary['totals']['total_t']:.3f}"],
+        ['Total Emissions (kgCO₂e)', f"{summary['totals']['total_kg']:.0f}"],
+        ['95% Confidence Interval (tCO₂e)',
+         f"{summary['uncertainty']['lower_t']:.3f} – {summary['uncertainty']['upper_t']:.3f}"],
+        ['Uncertainty (±%)', f"{summary['uncertainty']['uncertainty_percent']:.1f}%"],
+        [f"Total Emissions, {summary['gwp']['gwp_set']} GWP (tCO₂e)", f"{summary['gwp']['total_t']:.3f}"],
+        ['CO₂ / CH₄ / N₂O (t)', " / ".join(
+            f"{summary['gwp']['gases_t'][gas]:.3f}" for gas in ('co2', 'ch4', 'n2o')
+        )],
+        ['Total Records', str(summary['totals']['records'])],
+        ['Custom Factor Records', str(summary['flags']['custom_factor_records'])],
+        ['Standard', 'ISO 14064-1'],
+    ]
+
+    summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c5530')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    story.append(summary_table)
+    story.append(Spacer(1, 20))
+
+    # Emissions by Scope
+    if summary['by_scope']:
+        story.append(Paragraph("Emissions by Scope", heading_style))
+        scope_data = [['Scope', 'Emissions (tCO₂e)', '95% CI (tCO₂e)', 'Percentage']]
+        for item in summary['by_scope']:
+            scope_data.append([
+                item['scope'],
+                f"{item['value_t']:.3f}",
+                f"{item['lower_t']:.3f} – {item['upper_t']:.3f}",
+                f"{item['percentage']:.1f}%"
+            ])
+
+        scope_table = Table(scope_data, colWidths=[1.3*inch, 1.6*inch, 2*inch, 1.1*inch])
+        scope_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c5530')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+
+        story.append(scope_table)
+        story.append(Spacer(1, 20))
+
+    # Top Sources
+    if summary['top_sources']:
+        story.append(Paragraph("Top Emission Sources", heading_style))
+        sources_data = [['Scope', 'Category', 'Source', 'tCO₂e', '%']]
+        for item in summary['top_sources'][:10]:  # Limit to top 10
+            sources_data.append([
+                item['scope'],
+                item['category'][:15] + '...' if len(item['category']) > 15 else item['category'],
+                item['source_name'][:20] + '...' if len(item['source_name']) > 20 else item['source_name'],
+                f"{item['value_t']:.3f}",
+                f"{item['percentage']:.1f}%"
+            ])
+
+        sources_table = Table(sources_data, colWidths=[1*inch, 1.5*inch, 2*inch, 1*inch, 0.8*inch])
+        sources_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c5530')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+
+        story.append(sources_table)
+        story.append(Spacer(1, 20))
+
+    # Methodology
+    story.append(Paragraph("Methodology & Notes", heading_style))
+    methodology_text = """
+    <b>Calculation Formula:</b> Emissions (kgCO2e) = Activity Data × Emission Factor<br/><br/>
+    <b>Notes:</b><br/>
+    • All calculations are stored in kgCO2e and presented in tCO2e where applicable<br/>
+    • tCO2e = kgCO2e / 1000<br/>
+    • Emission factors may be sourced from DEFRA/IPCC/Turkey Inventory or company-provided references<br/>
+    • Supplier-provided or user-provided factors should be documented in the reference field<br/>
+    • Per-gas quantities are re-weighted with IPCC AR4/AR5/AR6 100-year GWPs; records without a
+    gas breakdown keep their stored CO2e<br/>
+    • 95% confidence intervals are estimated by Monte Carlo simulation (IPCC Approach 2) from
+    emission factor and activity data uncertainties
+    """
+    story.append(Paragraph(methodology_text, styles['Normal']))
+
+    # Build PDF
+    doc.build(story)
+    return "inventory_report.pdf"
+
+
+def emissions_pdf(user: User, params: Params, output: BinaryIO, progress: Progress = no_progress) -> str:
+    """The GHG emissions inventory report (reporting page's PDF button)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+
+    filters = inventory_filters(user, params)
+    # Unparseable dates are not applied and reported as open-ended
+    date_from = params.get('from') if filters.date_from else None
+    date_to = params.get('to') if filters.date_to else None
+
+    # Calculate data
+    progress(10, "Calculating inventory")
+    snapshot = inventory_snapshot(filters)
+    total_emissions_tons = snapshot.total_t
+    uncertainty = snapshot.uncertainty
+
+    # Create PDF
+    progress(60, "Rendering PDF")
+    doc = SimpleDocTemplate(output, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+
+    # Container for the 'Flowable' objects
+    elements = []
+
+    # Define styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        textColor=colors.HexColor('#1e293b')
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        textColor=colors.HexColor('#374151')
+    )
+
+    # Title
+    title = Paragraph("GHG Emissions Inventory Report", title_style)
+    elements.append(title)
+
+    # Organization info
+    org_info = f"""
+    <b>Organization:</b> {user.username.title()}<br/>
+    <b>Report Generated:</b> {datetime.now().strftime('%B %d, %Y at %I:%M %p')}<br/>
+    <b>Reporting Standard:</b> ISO 14064-1<br/>
+    <b>Report Period:</b> {date_from or 'All time'} to {date_to or 'Present'}
+    """
+    elements.append(Paragraph(org_info, styles['Normal']))
+    elements.append(Spacer(1, 20))
+
+    # Executive Summary
+    elements.append(Paragraph("Executive Summary", heading_style))
+    summary_text = f"""
+    This report presents the greenhouse gas (GHG) emissions inventory for {user.username.title()}
+    in accordance with ISO 14064-1 standards. The total emissions for the reporting period are
+    <b>{total_emissions_tons:.3f} tCO₂e</b> across {snapshot.records} emission sources
+    (95% confidence interval: {uncertainty['total']['lower_t']:.3f} – {uncertainty['total']['upper_t']:.3f} tCO₂e,
+    ±{uncertainty['total']['uncertainty_percent']:.1f}%).
+    """
+    if filters.gwp_set:
+        gwp = snapshot.gwp
+        summary_text += f"""
+        Re-weighted with IPCC {gwp['gwp_set']} GWP values the total is <b>{gwp['total_t']:.3f} tCO₂e</b>
+        (CO₂ {gwp['gases_t']['co2']:.3f} t, CH₄ {gwp['gases_t']['ch4']:.3f} t, N₂O {gwp['gases_t']['n2o']:.3f} t).
+        """
+    elements.append(Paragraph(summary_text, styles['Normal']))
+    elements.append(Spacer(1, 20))
+
+    # Scope breakdown table
+    elements.append(Paragraph("Emissions by Scope", heading_style))
+
+    scope_data = [['Scope', 'Description', 'Emissions (tCO₂e)', '95% CI (tCO₂e)', 'Percentage']]
+    for scope in [1, 2, 3]:
+        scope_kg = snapshot.by_scope.get(str(scope), {}).get('sum_kg', 0)
+        scope_tons = scope_kg / 1000
+        percentage = snapshot.percentage(scope_kg)
+
+        descriptions = {
+            1: 'Direct emissions from owned sources',
+            2: 'Indirect emissions from purchased energy',
+            3: 'Other indirect emissions in value chain'
+        }
+
+        interval = uncertainty['groups'].get(str(scope))
+
+        scope_data.append([
+            f'Scope {scope}',
+            descriptions[scope],
+            f'{scope_tons:.3f}',
+            f"{interval['lower_t']:.3f} – {interval['upper_t']:.3f}" if interval else '-',
+            f'{percentage:.1f}%'
+        ])
+
+    scope_table = Table(scope_data)
+    scope_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f1f5f9')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#1e293b')),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb'))
+    ]))
+
+    elements.append(scope_table)
+    elements.append(Spacer(1, 20))
+
+    # Top sources
+    elements.append(Paragraph("Top Emission Sources", heading_style))
+
+    sources_data = [['Source', 'Scope', 'Category', 'Emissions (tCO₂e)', 'Percentage']]
+    for source in snapshot.sources[:10]:
+        source_tons = source['sum_kg'] / 1000
+        percentage = snapshot.percentage(source['sum_kg'])
+
+        sources_data.append([
+            source['source_name'],
+            f"Scope {source['scope']}",
+            source['category'].replace('-', ' ').title(),
+            f'{source_tons:.3f}',
+            f'{percentage:.1f}%'
+        ])
+
+    sources_table = Table(sources_data)
+    sources_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f1f5f9')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#1e293b')),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb'))
+    ]))
+
+    elements.append(sources_table)
+    elements.append(Spacer(1, 20))
+
+    # Methodology
+    elements.append(Paragraph("Methodology", heading_style))
+    methodology_text = """
+    This inventory was prepared following ISO 14064-1:2018 guidelines for greenhouse gas inventories.
+    Emission factors were sourced from internationally recognized databases including IPCC, Defra, EPA,
+    and country-specific sources. All calculations follow the operational control approach for
+    organizational boundary definition.
+    """
+    elements.append(Paragraph(methodology_text, styles['Normal']))
+
+    # Build PDF
+    doc.build(elements)
+    return f"emissions_inventory_{datetime.now().strftime('%Y%m%d')}.pdf"
+
+
+# Worksheet titles (max 31 chars for Excel) and file names per scope
+EMISSION_REPORT_TITLES = {
+    'all': 'All Scopes Report',
+    'scope1': 'Scope 1 Direct',
+    'scope2': 'Scope 2 Electricity',
+    'scope3': 'Scope 3 Indirect',
+}
+
+EMISSION_REPORT_NAMES = {
+    'all': 'All_Scopes',
+    'scope1': 'Scope_1_Direct_Emissions',
+    'scope2': 'Scope_2_Electricity',
+    'scope3': 'Scope_3_Indirect_Emissions',
+}
+
+
+def emission_report_records(user: User, params: Params):
+    """Records of the per-scope Excel report"""
+    records = EmissionRecord.objects.filter(user=user)
+    scope = params.get('scope', 'all')
+    if scope != 'all':
+        records = records.filter(scope=int(scope.replace('scope', '')))
+    return records
+
+
+def emission_report_xlsx(user: User, params: Params, output: BinaryIO, progress: Progress = no_progress) -> str:
+    """The per-scope Excel report of the history page; ``params['scope']`` is e.g. 'scope1'"""
+    scope = params.get('scope', 'all')
+    records = emission_report_records(user, params).order_by('-created_at')
+    title = EMISSION_REPORT_TITLES.get(scope, 'Emission Report')
+    progress(10, "Writing rows")
+    report = exports.emission_report_xlsx(
+        records,
+        sheet_title=title,
+        heading=f"SustIndex - {title}",
+        info=f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | User: {user.email}",
+    )
+    progress(80, "Saving workbook")
+    report.save(output)
+    today = datetime.now().strftime('%Y-%m-%d')
+    return f"{EMISSION_REPORT_NAMES.get(scope, 'Emission')}_Report_{today}.xlsx"
+
+
+def emissions_analysis_records(user: User, params: Params):
+    """Records of the emissions analysis export"""
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+    scopes = params.get('scopes', '1,2,3').split(',')
+
+    records = EmissionRecord.objects.filter(user=user)
+    if date_from:
+        records = records.filter(created_at__gte=datetime.strptime(date_from, '%Y-%m-%d'))
+    if date_to:
+        records = records.filter(created_at__lte=datetime.strptime(date_to, '%Y-%m-%d'))
+    if scopes:
+        scope_numbers = [int(s) for s in scopes if s.isdigit()]
+        records = records.filter(scope__in=scope_numbers)
+    return records
+
+
+def emissions_analysis_xlsx(user: User, params: Params, output: BinaryIO, progress: Progress = no_progress) -> str:
+    """The emissions analysis page's Excel export"""
+    method = params.get('method', 'ghg')
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+    records = emissions_analysis_records(user, params)
+
+    progress(10, "Writing rows")
+    report = exports.emissions_analysis_xlsx(
+        records,
+        heading=f"Emissions Analysis Report - {method.upper()} Method",
+        period=f"Period: {date_from} to {date_to}",
+    )
+    progress(80, "Saving workbook")
+    report.save(output)
+    today = datetime.now().strftime('%Y-%m-%d')
+    return f"Emissions_Analysis_{method.upper()}_{today}.xlsx"
+
+
+def inventory_records(user: User, params: Params):
+    """Records of the ISO 14064-1 inventory report"""
+    return get_inventory_queryset(inventory_filters(user, params))
+
+
+@dataclass(frozen=True)
+class ReportType:
+    render: Callable[..., str]
+    # The records the report is built from (fingerprinted by ghg.report_cache)
+    records: Callable[[User, Params], Any]
+    content_type: str
+    extension: str
+
+
+PDF_CONTENT_TYPE = 'application/pdf'
+
+REPORT_TYPES: Dict[str, ReportType] = {
+    'inventory_pdf': ReportType(inventory_pdf, inventory_records, PDF_CONTENT_TYPE, 'pdf'),
+    'emissions_pdf': ReportType(emissions_pdf, inventory_records, PDF_CONTENT_TYPE, 'pdf'),
+    'emission_report_xlsx': ReportType(
+        emission_report_xlsx, emission_report_records, exports.XLSX_CONTENT_TYPE, 'xlsx'
+    ),
+    'emissions_analysis_xlsx': ReportType(
+        emissions_analysis_xlsx, emissions_analysis_records, exports.XLSX_CONTENT_TYPE, 'xlsx'
+    ),
+}
+
+
+def report_params(query: Mapping[str, Any]) -> Dict[str, str]:
+    """Filter parameters of a request's query string or form, one value per name"""
+    return {key: str(query.get(key)) for key in query if key not in ('kind', 'csrfmiddlewaretoken')}
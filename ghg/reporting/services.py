@@ -3,14 +3,16 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import date
 from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
 
 from django.contrib.auth.models import User
-from django.db.models import Count, Sum, FloatField
-from django.db.models.functions import Coalesce
-from django.db.models import Q, Value
+from django.db.models import Q
 
 from ghg.models import EmissionRecord, MaterialRequest
+from ghg.gwp import inventory_gwp_summary
+from ghg.rollups import aggregate_emissions
+from ghg.uncertainty import cached_inventory_uncertainty
 
 
 @dataclass(frozen=True)
@@ -20,6 +22,7 @@ class InventoryFilters:
     date_to: Optional[date] = None
     scope: Optional[str] = None
     country: Optional[str] = None
+    gwp_set: Optional[str] = None
 
 
 def _to_tonnes(kg: float) -> float:
@@ -43,71 +46,151 @@ def get_inventory_queryset(filters: InventoryFilters):
     return qs
 
 
-def compute_inventory_summary(filters: InventoryFilters) -> Dict[str, Any]:
-    qs = get_inventory_queryset(filters)
+@dataclass(frozen=True)
+class InventorySnapshot:
+    """
+    Aggregated inventory for one set of filters, shared by the inventory
+    page and the PDF renderers.
     
-    totals = qs.aggregate(
-        total_kg=Coalesce(Sum("emissions_kg"), Value(0.0, output_field=FloatField())),
-        records=Coalesce(Count("id"), Value(0)),
-    )
-    total_t = _to_tonnes(totals["total_kg"])
+    Totals per scope, category, source and country all come from one
+    grouped read of the monthly rollups (plus one over raw records for
+    partial months at either end of the date range). Uncertainty, GWP and
+    custom factor figures load their rows on first use, one query each, so
+    a report issues the same few queries whatever its filters.
+    """
+    filters: InventoryFilters
+    # sum_kg and count per (scope, category, source_name, country)
+    rows: Tuple[Dict[str, Any], ...]
     
-    by_scope = list(
-        qs.values("scope")
-        .annotate(value_kg=Coalesce(Sum("emissions_kg"), Value(0.0, output_field=FloatField())))
-        .order_by("scope")
-    )
-    by_scope_out = []
-    for row in by_scope:
-        value_t = _to_tonnes(row["value_kg"])
-        pct = (value_t / total_t * 100) if total_t > 0 else 0.0
-        by_scope_out.append(
-            {"scope": f"Scope {row['scope']}", "value_t": value_t, "percentage": pct}
+    @cached_property
+    def queryset(self):
+        return get_inventory_queryset(self.filters)
+    
+    @cached_property
+    def total_kg(self) -> float:
+        return sum(row["sum_kg"] for row in self.rows)
+    
+    @property
+    def total_t(self) -> float:
+        return _to_tonnes(self.total_kg)
+    
+    @cached_property
+    def records(self) -> int:
+        return sum(row["count"] for row in self.rows)
+    
+    def percentage(self, kg: float) -> float:
+        """Share of the inventory total, in percent"""
+        return (kg / self.total_kg * 100) if self.total_kg > 0 else 0.0
+    
+    def _group(self, fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        for row in self.rows:
+            key = tuple(row[field] for field in fields)
+            group = groups.setdefault(key, {**dict(zip(fields, key)), "sum_kg": 0.0, "count": 0})
+            group["sum_kg"] += row["sum_kg"]
+            group["count"] += row["count"]
+        return [groups[key] for key in sorted(groups)]
+    
+    @cached_property
+    def by_scope(self) -> Dict[str, Dict[str, Any]]:
+        """Totals per scope ('1', '2', '3'), scopes without records left out"""
+        return {group["scope"]: group for group in self._group(("scope",))}
+    
+    @cached_property
+    def by_category(self) -> List[Dict[str, Any]]:
+        return self._group(("scope", "category"))
+    
+    @cached_property
+    def sources(self) -> List[Dict[str, Any]]:
+        """Totals per source, largest first"""
+        return sorted(
+            self._group(("scope", "category", "source_name")),
+            key=lambda row: (-row["sum_kg"], row["scope"], row["category"], row["source_name"]),
         )
     
-    by_category = list(
-        qs.values("scope", "category")
-        .annotate(value_kg=Coalesce(Sum("emissions_kg"), Value(0.0, output_field=FloatField())))
-        .order_by("scope", "category")
-    )
-    by_category_out = []
-    for row in by_category:
-        value_t = _to_tonnes(row["value_kg"])
-        pct = (value_t / total_t * 100) if total_t > 0 else 0.0
-        by_category_out.append(
-            {
-                "scope": f"Scope {row['scope']}",
-                "category": row["category"],
-                "value_t": value_t,
-                "percentage": pct,
-            }
+    @cached_property
+    def countries(self) -> List[str]:
+        return [group["country"] for group in self._group(("country",))]
+    
+    @cached_property
+    def uncertainty(self) -> Dict[str, Any]:
+        # 95% confidence intervals from Monte Carlo sampling of factor and activity uncertainty,
+        # sampled once per data version
+        filters = self.filters
+        return cached_inventory_uncertainty(
+            filters.user, self.queryset, (filters.date_from, filters.date_to, filters.scope, filters.country)
         )
     
-    top_sources = list(
-        qs.values("scope", "category", "source_name")
-        .annotate(value_kg=Coalesce(Sum("emissions_kg"), Value(0.0, output_field=FloatField())))
-        .order_by("-value_kg")[:10]
+    @cached_property
+    def gwp(self) -> Dict[str, Any]:
+        # Per-gas totals and CO2e re-weighted under the requested GWP set
+        return inventory_gwp_summary(self.queryset, self.filters.gwp_set)
+    
+    @cached_property
+    def custom_factor_records(self) -> int:
+        return self.queryset.filter(
+            Q(reference__icontains="custom")
+            | Q(reference__icontains="supplier")
+            | Q(reference__icontains="certificate")
+            | Q(supplier__isnull=False)
+        ).count()
+
+
+def inventory_snapshot(filters: InventoryFilters) -> InventorySnapshot:
+    rows = aggregate_emissions(
+        filters.user,
+        ("scope", "category", "source_name", "country"),
+        date_from=filters.date_from,
+        date_to=filters.date_to,
+        scopes=[filters.scope] if filters.scope else None,
+        country=filters.country,
     )
-    top_sources_out = []
-    for row in top_sources:
-        value_t = _to_tonnes(row["value_kg"])
-        pct = (value_t / total_t * 100) if total_t > 0 else 0.0
-        top_sources_out.append(
+    return InventorySnapshot(filters=filters, rows=tuple(rows))
+
+
+def compute_inventory_summary(
+    filters: InventoryFilters, snapshot: Optional[InventorySnapshot] = None
+) -> Dict[str, Any]:
+    if snapshot is None:
+        snapshot = inventory_snapshot(filters)
+    
+    uncertainty = snapshot.uncertainty
+    
+    by_scope_out = []
+    for scope, row in snapshot.by_scope.items():
+        value_t = _to_tonnes(row["sum_kg"])
+        interval = uncertainty["groups"].get(scope, {})
+        by_scope_out.append(
             {
-                "scope": f"Scope {row['scope']}",
-                "category": row["category"],
-                "source_name": row["source_name"],
+                "scope": f"Scope {scope}",
                 "value_t": value_t,
-                "percentage": pct,
+                "percentage": snapshot.percentage(row["sum_kg"]),
+                "lower_t": interval.get("lower_t", value_t),
+                "upper_t": interval.get("upper_t", value_t),
+                "uncertainty_percent": interval.get("uncertainty_percent", 0.0),
             }
         )
     
-    custom_factor_records = qs.filter(
-        Q(reference__icontains="custom")
-        | Q(reference__icontains="supplier")
-        | Q(reference__icontains="certificate")
-        | Q(supplier__isnull=False)
-    ).count()
+    by_category_out = [
+        {
+            "scope": f"Scope {row['scope']}",
+            "category": row["category"],
+            "value_t": _to_tonnes(row["sum_kg"]),
+            "percentage": snapshot.percentage(row["sum_kg"]),
+        }
+        for row in snapshot.by_category
+    ]
+    
+    top_sources_out = [
+        {
+            "scope": f"Scope {row['scope']}",
+            "category": row["category"],
+            "source_name": row["source_name"],
+            "value_t": _to_tonnes(row["sum_kg"]),
+            "percentage": snapshot.percentage(row["sum_kg"]),
+        }
+        for row in snapshot.sources[:10]
+    ]
     
     pending_other_items = MaterialRequest.objects.filter(user=filters.user, status="pending").count()
     
@@ -117,17 +200,26 @@ def compute_inventory_summary(filters: InventoryFilters) -> Dict[str, Any]:
             "date_to": filters.date_to.isoformat() if filters.date_to else None,
             "scope": filters.scope,
             "country": filters.country,
+            "gwp_set": filters.gwp_set,
         },
         "totals": {
-            "total_kg": totals["total_kg"],
-            "total_t": total_t,
-            "records": totals["records"],
+            "total_kg": snapshot.total_kg,
+            "total_t": snapshot.total_t,
+            "records": snapshot.records,
+        },
+        "uncertainty": {
+            "samples": uncertainty["samples"],
+            "confidence": 95,
+            "lower_t": uncertainty["total"]["lower_t"],
+            "upper_t": uncertainty["total"]["upper_t"],
+            "uncertainty_percent": uncertainty["total"]["uncertainty_percent"],
         },
+        "gwp": snapshot.gwp,
         "by_scope": by_scope_out,
         "by_category": by_category_out,
         "top_sources": top_sources_out,
         "flags": {
-            "custom_factor_records": custom_factor_records,
+            "custom_factor_records": snapshot.custom_factor_records,
             "pending_other_items": pending_other_items,
         },
     }
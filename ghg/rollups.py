@@ -0,0 +1,225 @@
+"""
+Incrementally maintained monthly emission rollups.
+
+EmissionRollup holds sum_kg and count per (user, month, scope, category,
+source_name, country), where month is the month a record was created in.
+Single saves and deletes update it through signals (see ghg.signals);
+bulk writers (bulk calculation, imports, recalculation) apply their deltas
+with add_records / apply_rollup_deltas inside their own transaction.
+``manage.py rebuild_emission_rollups`` recomputes it from scratch.
+
+aggregate_emissions answers grouped totals for a date range from whole
+months of rollup rows, and aggregates raw records only for the partial
+months at either end of the range.
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import EmissionRecord, EmissionRollup
+
+
+ROLLUP_DIMENSIONS = ('month', 'scope', 'category', 'source_name', 'country')
+
+# (user_id, month, scope, category, source_name, country)
+RollupKey = Tuple[int, date, str, str, str, str]
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def record_month(created_at) -> date:
+    """Rollup month of a record created at ``created_at``"""
+    return _month_start(timezone.localtime(created_at).date())
+
+
+def rollup_key(record: EmissionRecord) -> RollupKey:
+    return (
+        record.user_id,
+        record_month(record.created_at),
+        record.scope,
+        record.category,
+        record.source_name,
+        record.country,
+    )
+
+
+# ============================================
+# Maintenance
+# ============================================
+
+def apply_rollup_deltas(deltas: Dict[RollupKey, List[float]]) -> None:
+    """
+    Add [kg, count] deltas to rollup rows, creating and removing rows as
+    needed. Runs in the caller's transaction (or its own).
+    """
+    with transaction.atomic(savepoint=False):
+        emptied = []
+        for key, (delta_kg, delta_count) in deltas.items():
+            if not delta_kg and not delta_count:
+                continue
+            user_id, month, scope, category, source_name, country = key
+            rows = EmissionRollup.objects.filter(
+                user_id=user_id, month=month, scope=scope, category=category,
+                source_name=source_name, country=country,
+            )
+            if rows.update(sum_kg=F('sum_kg') + delta_kg, count=F('count') + delta_count):
+                if delta_count < 0:
+                    emptied.append(rows)
+                continue
+            if delta_count <= 0:
+                # Nothing to subtract from (e.g. the user is being deleted)
+                continue
+            try:
+                with transaction.atomic():
+                    rows.create(
+                        user_id=user_id, month=month, scope=scope, category=category,
+                        source_name=source_name, country=country,
+                        sum_kg=delta_kg, count=delta_count,
+                    )
+            except IntegrityError:
+                # Created concurrently by another writer
+                rows.update(sum_kg=F('sum_kg') + delta_kg, count=F('count') + delta_count)
+
+        for rows in emptied:
+            rows.filter(count__lte=0).delete()
+
+
+def add_records(records: Iterable[EmissionRecord], sign: int = 1) -> None:
+    """Add (sign=1) or remove (sign=-1) saved records from the rollups"""
+    deltas: Dict[RollupKey, List[float]] = {}
+    for record in records:
+        delta = deltas.setdefault(rollup_key(record), [0.0, 0])
+        delta[0] += sign * (record.emissions_kg or 0.0)
+        delta[1] += sign
+    apply_rollup_deltas(deltas)
+
+
+def rebuild_rollups(user: Optional[User] = None) -> int:
+    """Recompute rollups from EmissionRecords (for one user or everyone)"""
+    records = EmissionRecord.objects.all()
+    rollups = EmissionRollup.objects.all()
+    if user is not None:
+        records = records.filter(user=user)
+        rollups = rollups.filter(user=user)
+
+    grouped = (
+        records.annotate(month=TruncMonth('created_at', output_field=DateField()))
+        .values('user_id', 'month', 'scope', 'category', 'source_name', 'country')
+        .annotate(sum_kg=Coalesce(Sum('emissions_kg'), Value(0.0, output_field=FloatField())), count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        created = EmissionRollup.objects.bulk_create(
+            (EmissionRollup(**row) for row in grouped.iterator()), batch_size=500
+        )
+    return len(created)
+
+
+# ============================================
+# Reads
+# ============================================
+
+def _split_range(date_from: Optional[date], date_to: Optional[date]):
+    """
+    Split [date_from, date_to] into whole months [start, end) served by
+    rollups and partial-month date ranges served by raw records.
+    """
+    start = end = None
+    if date_from is not None:
+        start = date_from if date_from.day == 1 else _next_month(date_from)
+    if date_to is not None:
+        end = _next_month(date_to) if (date_to + timedelta(days=1)).day == 1 else _month_start(date_to)
+
+    if start is not None and end is not None and start >= end:
+        return None, [(date_from, date_to)]
+
+    partial = []
+    if date_from is not None and date_from < start:
+        partial.append((date_from, start - timedelta(days=1)))
+    if date_to is not None and end <= date_to:
+        partial.append((end, date_to))
+    return (start, end), partial
+
+
+def aggregate_emissions(
+    user: User,
+    group_by: Sequence[str] = (),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    scopes: Optional[Sequence[str]] = None,
+    country: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Total emissions of ``user``'s records created between ``date_from`` and
+    ``date_to`` (inclusive), grouped by any of ROLLUP_DIMENSIONS.
+
+    Returns:
+        One dict per group with the group_by fields, 'sum_kg' and 'count'
+        (in no particular order)
+    """
+    fields = list(group_by)
+    unknown = set(fields) - set(ROLLUP_DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Cannot group emissions by: {', '.join(sorted(unknown))}")
+
+    months, partial = _split_range(date_from, date_to)
+    results: Dict[Tuple, Dict[str, Any]] = {}
+
+    def merge(queryset, sum_kg, count):
+        if fields:
+            rows = queryset.values(*fields).annotate(sum_kg=sum_kg, count=count).order_by()
+        else:
+            rows = [queryset.aggregate(sum_kg=sum_kg, count=count)]
+        for row in rows:
+            key = tuple(row[field] for field in fields)
+            entry = results.setdefault(key, {**{field: row[field] for field in fields}, 'sum_kg': 0.0, 'count': 0})
+            entry['sum_kg'] += row['sum_kg'] or 0.0
+            entry['count'] += row['count'] or 0
+
+    if months is not None:
+        rollups = EmissionRollup.objects.filter(user=user)
+        if months[0] is not None:
+            rollups = rollups.filter(month__gte=months[0])
+        if months[1] is not None:
+            rollups = rollups.filter(month__lt=months[1])
+        if scopes:
+            rollups = rollups.filter(scope__in=scopes)
+        if country:
+            rollups = rollups.filter(country=country)
+        merge(rollups, Sum('sum_kg'), Sum('count'))
+
+    if partial:
+        in_range = Q()
+        for first, last in partial:
+            in_range |= Q(created_at__date__gte=first, created_at__date__lte=last)
+        records = EmissionRecord.objects.filter(in_range, user=user)
+        if scopes:
+            records = records.filter(scope__in=scopes)
+        if country:
+            records = records.filter(country=country)
+        if 'month' in fields:
+            records = records.annotate(month=TruncMonth('created_at', output_field=DateField()))
+        merge(records, Sum('emissions_kg'), Count('id'))
+
+    return [row for row in results.values() if row['count']]
+
+
+def emissions_total(user: User, **filters) -> Tuple[float, int]:
+    """(total kg CO2e, record count) for aggregate_emissions filters"""
+    rows = aggregate_emissions(user, **filters)
+    return (rows[0]['sum_kg'], rows[0]['count']) if rows else (0.0, 0)
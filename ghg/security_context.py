@@ -0,0 +1,67 @@
+"""
+Per-request security context and the sampled log of allowed requests.
+
+Shared by SecurityPipelineMiddleware and the Arcjet simulator, which
+both import it at module level.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+logger = logging.getLogger('ghg.security')
+
+# Allowed requests are logged as one INFO summary per this many requests
+ALLOWED_LOG_EVERY = getattr(settings, 'SECURITY_ALLOWED_LOG_EVERY', 1000)
+
+
+def get_client_ip(request):
+    """Get client IP address"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+@dataclass(frozen=True)
+class SecurityContext:
+    """What the security checks need from a request, parsed once"""
+    ip: str
+    path: str
+    user_agent: str
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(
+            ip=get_client_ip(request) or '',
+            path=request.path.lower(),
+            user_agent=request.META.get('HTTP_USER_AGENT', '').lower(),
+        )
+
+
+class _AllowedRequestLog:
+    """Counts allowed requests and logs a summary instead of a line per request"""
+
+    def __init__(self, every):
+        self.every = every
+        self.count = 0
+        self.since = time.monotonic()
+        self.lock = threading.Lock()
+
+    def record(self, context):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Allowed: {context.ip} | {context.user_agent[:50]} | {context.path}")
+        with self.lock:
+            self.count += 1
+            if self.count < self.every:
+                return
+            count, elapsed = self.count, time.monotonic() - self.since
+            self.count, self.since = 0, time.monotonic()
+        logger.info(f"Security pipeline: {count} requests allowed in {elapsed:.0f}s")
+
+
+# Shared by the pipeline and arcjet_protect's fallback checks
+allowed_requests = _AllowedRequestLog(ALLOWED_LOG_EVERY)
@@ -0,0 +1,196 @@
+"""
+Reader for the security log (logs/security.log) shown in the admin panel.
+
+The log is written by a WatchedFileHandler in every worker and rotated by
+logrotate, so it is a current file plus numbered backups (security.log.1
+is the newest backup). Each file gets a
+byte-offset index of its lines, grouped by level and security event type.
+Indexes are kept per process and keyed by inode, so a backup keeps its
+index after it is renamed. The current file's index is extended by
+reading only the bytes appended since the last request. A page is served
+by seeking to the offsets of the lines on that page, so the admin page
+costs the same however long the log is.
+
+Lines look like the 'security' formatter's output::
+
+    SECURITY WARNING 2026-01-01 12:00:00,000 middleware Rate limit exceeded ...
+    SECURITY INFO 2026-01-01 12:00:00,000 security SECURITY EVENT: login_failed | ...
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from array import array
+from collections import defaultdict
+
+BLOCK_SIZE = 64 * 1024
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+_LINE_RE = re.compile(rb'^SECURITY (\w+) ')
+_EVENT_RE = re.compile(rb'SECURITY EVENT: (\w+)')
+
+# Per log path: {inode: _FileIndex}
+_indexes = defaultdict(dict)
+_lock = threading.Lock()
+
+
+def parse_line(line: bytes):
+    """(level, event type) of a log line; either may be ''"""
+    match = _LINE_RE.match(line)
+    if not match:
+        return '', ''
+    event = _EVENT_RE.search(line, match.end())
+    return match.group(1).decode('ascii'), event.group(1).decode('ascii') if event else ''
+
+
+class _FileIndex:
+    """Line start offsets of one log file, by (level, event) filter"""
+
+    def __init__(self, inode):
+        self.inode = inode
+        self.size = 0
+        self.positions = defaultdict(lambda: array('Q'))
+
+    def update(self, f, size):
+        """Index complete lines of open file ``f`` up to byte ``size``"""
+        if size <= self.size:
+            return
+        f.seek(self.size)
+        base, pending = self.size, b''
+        remaining = size - self.size
+        while remaining > 0:
+            chunk = f.read(min(BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            data = pending + chunk
+            start = 0
+            while True:
+                end = data.find(b'\n', start)
+                if end == -1:
+                    break
+                self._add(base + start, data[start:end])
+                start = end + 1
+            # A trailing partial line is indexed once it is complete
+            base, pending = base + start, data[start:]
+        self.size = base
+
+    def _add(self, offset, line):
+        if not line.strip():
+            return
+        level, event = parse_line(line)
+        self.positions[('', '')].append(offset)
+        if level:
+            self.positions[(level, '')].append(offset)
+        if event:
+            self.positions[('', event)].append(offset)
+            self.positions[(level, event)].append(offset)
+
+
+def _file_index(path, indexes):
+    """Up-to-date index of ``path`` from ``indexes``, or None if it does not exist"""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        # fstat, not stat: the name may be rotated to another file meanwhile
+        stat = os.fstat(f.fileno())
+        index = indexes.get(stat.st_ino)
+        if index is None or stat.st_size < index.size:
+            # New file, or truncated in place
+            index = indexes[stat.st_ino] = _FileIndex(stat.st_ino)
+        index.update(f, stat.st_size)
+    return index
+
+
+def log_files(path):
+    """The current log file and its existing backups, newest first"""
+    files = [path] if os.path.exists(path) else []
+    number = 1
+    while os.path.exists(f'{path}.{number}'):
+        files.append(f'{path}.{number}')
+        number += 1
+    return files
+
+
+class LogLines:
+    """
+    Lines of a rotated log matching a filter, newest first.
+
+    Supports len() and slicing, so it can be handed to Django's Paginator;
+    a slice reads only the lines in it.
+    """
+
+    def __init__(self, segments):
+        # (path, offsets) per file, newest file first, offsets oldest first.
+        # Offsets are only ever appended, so the counts taken here keep
+        # pages stable while the log grows.
+        self.segments = [(path, offsets, len(offsets)) for path, offsets in segments]
+
+    def __len__(self):
+        return sum(count for _, _, count in self.segments)
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            lines = self[item:item + 1] if item >= 0 else self[len(self) + item:len(self) + item + 1]
+            if not lines:
+                raise IndexError(item)
+            return lines[0]
+        start, stop, _ = item.indices(len(self))
+        lines = []
+        for path, offsets, count in self.segments:
+            if start >= stop:
+                break
+            if start >= count:
+                start, stop = start - count, stop - count
+                continue
+            wanted = [offsets[count - 1 - i] for i in range(start, min(stop, count))]
+            with open(path, 'rb') as f:
+                for offset in wanted:
+                    f.seek(offset)
+                    lines.append(f.readline().decode('utf-8', errors='replace').rstrip())
+            start, stop = 0, stop - count
+        return lines
+
+
+class SecurityLog:
+    """The security log and its backups"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _indexed_files(self):
+        with _lock:
+            indexes = _indexes[self.path]
+            files = [(path, _file_index(path, indexes)) for path in log_files(self.path)]
+            files = [(path, index) for path, index in files if index is not None]
+            # Forget files that were rotated away
+            live = {index.inode for _, index in files}
+            for inode in list(indexes):
+                if inode not in live:
+                    del indexes[inode]
+        return files
+
+    def lines(self, level='', event=''):
+        """LogLines matching ``level`` and ``event`` ('' matches any)"""
+        key = (level or '', event or '')
+        return LogLines([
+            (path, index.positions[key] if key in index.positions else array('Q'))
+            for path, index in self._indexed_files()
+        ])
+
+    def event_types(self):
+        """Security event types present in the log"""
+        return sorted({
+            event
+            for _, index in self._indexed_files()
+            for level, event in index.positions
+            if event and not level
+        })
@@ -0,0 +1,91 @@
+"""
+Model signal handlers for the ghg app
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .factor_resolver import invalidate_factor_cache
+from .data_version import bump_data_version, bump_global_version
+from .models import CustomEmissionFactor, EmissionData, EmissionRecord, ReportExtraInfo, Supplier
+from .models_emission_sources import EmissionCategory, EmissionFactorData, EmissionSource
+from .rollups import add_records, apply_rollup_deltas, record_month, rollup_key
+
+
+@receiver(post_save, sender=EmissionFactorData)
+@receiver(post_delete, sender=EmissionFactorData)
+@receiver(post_save, sender=EmissionSource)
+@receiver(post_delete, sender=EmissionSource)
+@receiver(post_save, sender=EmissionCategory)
+@receiver(post_delete, sender=EmissionCategory)
+def emission_factors_changed(sender, **kwargs):
+    """Reload the factor resolver in every process once the change is committed"""
+    transaction.on_commit(invalidate_factor_cache)
+
+
+@receiver(pre_save, sender=EmissionRecord)
+def remember_rollup_key(sender, instance, raw=False, **kwargs):
+    """Keep the stored rollup key and emissions of a record about to be updated"""
+    instance._rollup_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    previous = (
+        EmissionRecord.objects.filter(pk=instance.pk)
+        .values('user_id', 'created_at', 'scope', 'category', 'source_name', 'country', 'emissions_kg')
+        .first()
+    )
+    if previous is not None:
+        instance._rollup_previous = (
+            (
+                previous['user_id'], record_month(previous['created_at']), previous['scope'],
+                previous['category'], previous['source_name'], previous['country'],
+            ),
+            previous['emissions_kg'] or 0.0,
+        )
+
+
+@receiver(post_save, sender=EmissionRecord)
+def emission_record_saved(sender, instance, created, raw=False, **kwargs):
+    """Move a created or updated record's emissions into its rollup row"""
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    instance._rollup_previous = None
+    if created or previous is None:
+        add_records([instance])
+        return
+
+    old_key, old_kg = previous
+    new_key = rollup_key(instance)
+    new_kg = instance.emissions_kg or 0.0
+    if old_key == new_key:
+        apply_rollup_deltas({new_key: [new_kg - old_kg, 0]})
+    else:
+        apply_rollup_deltas({old_key: [-old_kg, -1], new_key: [new_kg, 1]})
+
+
+@receiver(post_delete, sender=EmissionRecord)
+def emission_record_deleted(sender, instance, **kwargs):
+    add_records([instance], sign=-1)
+
+
+@receiver(post_save, sender=EmissionRecord)
+@receiver(post_delete, sender=EmissionRecord)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_save, sender=CustomEmissionFactor)
+@receiver(post_delete, sender=CustomEmissionFactor)
+@receiver(post_save, sender=ReportExtraInfo)
+@receiver(post_delete, sender=ReportExtraInfo)
+def user_data_changed(sender, instance, signal, raw=False, **kwargs):
+    """Invalidate the owner's cached API responses with the change"""
+    if not raw:
+        # Deleting the owner cascades here too; don't recreate their version row
+        bump_data_version([instance.user_id], create=signal is post_save)
+
+
+@receiver(post_save, sender=EmissionData)
+@receiver(post_delete, sender=EmissionData)
+def global_emission_data_changed(sender, **kwargs):
+    """Move /api/global/ to a new ETag with the change"""
+    bump_global_version('emission_data')
@@ -0,0 +1,118 @@
+"""
+Tests for the bulk emission calculation endpoint
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ghg.emission_factors import calculate_emissions, get_scope_for_category
+from ghg.factor_resolver import get_factor_set
+from ghg.models import EmissionRecord, Supplier
+
+
+class BulkCalculationTest(TestCase):
+    """Test /api/calculate/bulk/"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='bulk@example.com', email='bulk@example.com', password='TestPass123!'
+        )
+        self.other_user = User.objects.create_user(
+            username='other@example.com', email='other@example.com', password='TestPass123!'
+        )
+        self.supplier = Supplier.objects.create(user=self.user, name='Grid Co')
+        self.foreign_supplier = Supplier.objects.create(user=self.other_user, name='Foreign Co')
+        self.client.force_login(self.user)
+        self.url = reverse('ghg:calculate_emission_bulk')
+
+    def tearDown(self):
+        cache.clear()
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_bulk_create_returns_results_and_record_ids(self):
+        """Every item is calculated and saved in order"""
+        items = [
+            {'category': 'electricity', 'source': 'turkey-grid', 'activity_data': 1000,
+             'country': 'turkey', 'supplier_id': self.supplier.id},
+            {'category': 'stationary', 'source': 'coal', 'activity_data': 12.5},
+            {'category': 'waste', 'source': 'general-landfill', 'activity_data': 3, 'description': 'Bins'},
+        ]
+        response = self.post({'items': items})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(EmissionRecord.objects.filter(user=self.user).count(), 3)
+
+        for item, result in zip(items, data['results']):
+            expected = calculate_emissions(
+                item['category'], item['source'], item['activity_data'], item.get('country', 'global')
+            )
+            self.assertAlmostEqual(result['emissions_kg'], expected['emissions_kg'])
+            record = EmissionRecord.objects.get(id=result['record_id'])
+            self.assertEqual(record.scope, get_scope_for_category(item['category']))
+            self.assertAlmostEqual(record.emissions_kg, expected['emissions_kg'])
+
+        self.assertEqual(
+            EmissionRecord.objects.get(id=data['results'][0]['record_id']).supplier, self.supplier
+        )
+
+    def test_invalid_item_rejects_whole_batch(self):
+        """Nothing is saved when any item fails validation"""
+        response = self.post({'items': [
+            {'category': 'stationary', 'source': 'coal', 'activity_data': 1},
+            {'category': 'stationary', 'source': 'no-such-source', 'activity_data': 1},
+            {'category': 'stationary', 'source': 'coal', 'activity_data': -5},
+        ]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2])
+        self.assertFalse(EmissionRecord.objects.exists())
+
+    def test_other_users_supplier_is_rejected(self):
+        """Suppliers must belong to the requesting user"""
+        response = self.post({'items': [
+            {'category': 'stationary', 'source': 'coal', 'activity_data': 1,
+             'supplier_id': self.foreign_supplier.id},
+        ]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(EmissionRecord.objects.exists())
+
+    def test_supplier_lookup_is_a_single_query(self):
+        """Supplier IDs are resolved with one query regardless of item count"""
+        items = [
+            {'category': 'stationary', 'source': 'coal', 'activity_data': i,
+             'supplier_id': self.supplier.id}
+            for i in range(20)
+        ]
+        # The factor index is loaded once per process, not per request
+        get_factor_set()
+        # session + user, one supplier lookup, savepoint + one INSERT + release,
+        # then the rollup row: UPDATE, savepoint + INSERT + release, and the
+        # data version: INSERT (ignored if present) + UPDATE
+        with self.assertNumQueries(12):
+            response = self.post({'items': items})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(EmissionRecord.objects.filter(supplier=self.supplier).count(), 20)
+
+    def test_save_false_does_not_persist(self):
+        """save=false only returns the calculations"""
+        response = self.post({'save': False, 'items': [
+            {'category': 'stationary', 'source': 'coal', 'activity_data': 1},
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('record_id', response.json()['results'][0])
+        self.assertFalse(EmissionRecord.objects.exists())
+
+    def test_requires_item_list(self):
+        """A payload without an item list is rejected"""
+        response = self.post({'items': 'nope'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,90 @@
+"""
+Tests for the shared SQLite cache backend
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ghg.cache_backends import SQLiteCache
+
+
+def _increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('hits')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    """Test SQLiteCache semantics, eviction and cross-process atomicity"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {'TIMEOUT': 60})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_basic_operations_and_expiry(self):
+        """get/set/add/incr/touch/delete follow Django's cache API"""
+        self.cache.set('dict', {'a': 1})
+        self.assertEqual(self.cache.get('dict'), {'a': 1})
+        self.assertTrue(self.cache.add('count', 1))
+        self.assertFalse(self.cache.add('count', 5))
+        self.assertEqual(self.cache.incr('count', 2), 3)
+        self.assertEqual(self.cache.decr('count'), 2)
+        self.assertEqual(self.cache.get_many(['dict', 'count', 'missing']), {'dict': {'a': 1}, 'count': 2})
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+        self.cache.set('short', 'value', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 'again'))
+        self.assertTrue(self.cache.touch('short', None))
+        self.assertTrue(self.cache.delete('short'))
+        self.assertFalse(self.cache.has_key('short'))
+
+    def test_culls_least_recently_used_entries(self):
+        """Entries over MAX_ENTRIES are evicted oldest-access first"""
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2, 'CULL_EVERY': 1}})
+        for index in range(11):
+            cache.set(f'key{index}', index)
+        self.assertFalse(cache.has_key('key0'))
+        self.assertTrue(cache.has_key('key10'))
+        self.assertLessEqual(sum(cache.has_key(f'key{index}') for index in range(11)), 10)
+
+    def test_running_size_matches_table(self):
+        """The trigger-maintained entry count and bytes follow every kind of write"""
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_BYTES': 400, 'CULL_EVERY': 1}})
+        cache.set('a', 'x' * 100)
+        cache.set('a', 'y' * 50)
+        cache.add('b', 1)
+        cache.incr('b', 1000)
+        cache.set_many({'c': [1, 2, 3], 'd': 'z' * 10})
+        cache.set('e', 'expired', timeout=0.01)
+        time.sleep(0.02)
+        cache.add('e', 'again')
+        cache.delete('c')
+        for index in range(10):
+            cache.set(f'big{index}', 'w' * 100)
+
+        actual = cache._db.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache').fetchone()
+        self.assertEqual(cache._stats(), actual)
+        self.assertLessEqual(actual[1], 400)
+        cache.clear()
+        self.assertEqual(cache._stats(), (0, 0))
+
+    def test_incr_is_atomic_across_processes(self):
+        """Workers incrementing one counter never lose updates"""
+        self.cache.set('hits', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_increment, args=(self.path, 200)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('hits'), 800)
@@ -3,11 +3,18 @@ Tests for Google reCAPTCHA v3 Integration
 Tests the captcha validation system for login and signup forms
 """
 
-from django.test import TestCase, Client, override_settings
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from django.test import TestCase, SimpleTestCase, Client, override_settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from unittest.mock import patch, MagicMock
-from ghg.captcha import ReCaptchaValidator, get_recaptcha_context
+from ghg.captcha import RECAPTCHA_BREAKER_FAILURES, ReCaptchaValidator, get_recaptcha_context
 
 User = get_user_model()
 
@@ -15,6 +22,10 @@ User = get_user_model()
 class ReCaptchaValidatorTests(TestCase):
     """Test ReCaptchaValidator class"""
     
+    def setUp(self):
+        # Verified tokens and circuit breaker state live in the cache
+        cache.clear()
+    
     @override_settings(RECAPTCHA_ENABLED=False)
     def test_captcha_disabled(self):
         """Test that validation passes when CAPTCHA is disabled"""
@@ -43,7 +54,7 @@ class ReCaptchaValidatorTests(TestCase):
         self.assertIn('missing-input-response', result['error_codes'])
     
     @override_settings(RECAPTCHA_ENABLED=True, RECAPTCHA_SECRET_KEY='test_secret')
-    @patch('ghg.captcha.requests.post')
+    @patch('ghg.captcha.requests.Session.post')
     def test_successful_verification(self, mock_post):
         """Test successful reCAPTCHA verification"""
         # Mock Google's response
@@ -72,7 +83,7 @@ class ReCaptchaValidatorTests(TestCase):
         self.assertEqual(call_args[1]['data']['remoteip'], '127.0.0.1')
     
     @override_settings(RECAPTCHA_ENABLED=True, RECAPTCHA_SECRET_KEY='test_secret')
-    @patch('ghg.captcha.requests.post')
+    @patch('ghg.captcha.requests.Session.post')
     def test_failed_verification(self, mock_post):
         """Test failed reCAPTCHA verification"""
         # Mock Google's error response
@@ -90,7 +101,7 @@ class ReCaptchaValidatorTests(TestCase):
         self.assertIn('error-codes', result)
     
     @override_settings(RECAPTCHA_ENABLED=True, RECAPTCHA_SECRET_KEY='test_secret')
-    @patch('ghg.captcha.requests.post')
+    @patch('ghg.captcha.requests.Session.post')
     def test_network_error(self, mock_post):
         """Test handling of network errors"""
         mock_post.side_effect = Exception('Network error')
@@ -102,7 +113,7 @@ class ReCaptchaValidatorTests(TestCase):
         self.assertIn('unknown-error', result['error_codes'])
     
     @override_settings(RECAPTCHA_ENABLED=True, RECAPTCHA_SECRET_KEY='test_secret')
-    @patch('ghg.captcha.requests.post')
+    @patch('ghg.captcha.requests.Session.post')
     def test_is_human_with_good_score(self, mock_post):
         """Test is_human returns True for good score"""
         mock_response = MagicMock()
@@ -119,7 +130,7 @@ class ReCaptchaValidatorTests(TestCase):
         self.assertTrue(is_human)
     
     @override_settings(RECAPTCHA_ENABLED=True, RECAPTCHA_SECRET_KEY='test_secret')
-    @patch('ghg.captcha.requests.post')
+    @patch('ghg.captcha.requests.Session.post')
     def test_is_human_with_low_score(self, mock_post):
         """Test is_human returns False for low score"""
         mock_response = MagicMock()
@@ -136,7 +147,7 @@ class ReCaptchaValidatorTests(TestCase):
         self.assertFalse(is_human)
     
     @override_settings(RECAPTCHA_ENABLED=True, RECAPTCHA_SECRET_KEY='test_secret')
-    @patch('ghg.captcha.requests.post')
+    @patch('ghg.captcha.requests.Session.post')
     def test_action_mismatch(self, mock_post):
         """Test that action mismatch is detected"""
         mock_response = MagicMock()
@@ -153,7 +164,7 @@ class ReCaptchaValidatorTests(TestCase):
         self.assertFalse(is_human)
     
     @override_settings(RECAPTCHA_ENABLED=True, RECAPTCHA_SECRET_KEY='test_secret')
-    @patch('ghg.captcha.requests.post')
+    @patch('ghg.captcha.requests.Session.post')
     def test_get_score(self, mock_post):
         """Test get_score method"""
         mock_response = MagicMock()
@@ -170,6 +181,97 @@ class ReCaptchaValidatorTests(TestCase):
         self.assertEqual(score, 0.75)
 
 
+class _StubSiteverifyHandler(BaseHTTPRequestHandler):
+    """Answers like Google's siteverify endpoint; scored by the token's suffix"""
+    protocol_version = 'HTTP/1.1'
+    
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+    
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        self.server.requests += 1
+        time.sleep(self.server.delay)
+        body = json.dumps({
+            'success': True,
+            'score': 0.9,
+            'action': 'login',
+            'hostname': 'localhost',
+            'token': form['response'][0],
+        }).encode()
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+class ReCaptchaUpstreamTests(SimpleTestCase):
+    """Test pooling, token caching and the circuit breaker against a local stub"""
+    
+    def setUp(self):
+        cache.clear()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubSiteverifyHandler)
+        self.server.connections = self.server.requests = 0
+        self.server.status, self.server.delay = 200, 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        settings = override_settings(
+            RECAPTCHA_ENABLED=True,
+            RECAPTCHA_SECRET_KEY='test_secret',
+            RECAPTCHA_VERIFY_URL=f'http://127.0.0.1:{self.server.server_port}/siteverify',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        cache.clear()
+    
+    def test_connection_is_reused_and_tokens_cached(self):
+        """Verifications share one kept-alive connection; a repeated token is not re-sent"""
+        for token in ('token-1', 'token-2', 'token-3', 'token-1'):
+            self.assertTrue(ReCaptchaValidator.is_human(token, 'login'))
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.server.connections, 1)
+    
+    def test_cached_success_is_used_once_by_the_same_client(self):
+        """A verified token is replayed once, only for the same action and IP"""
+        ReCaptchaValidator.verify_token('token-1', 'login', '203.0.113.7')
+        ReCaptchaValidator.verify_token('token-1', 'login', '198.51.100.9')
+        ReCaptchaValidator.verify_token('token-1', 'signup', '203.0.113.7')
+        self.assertEqual(self.server.requests, 3)
+        
+        ReCaptchaValidator.verify_token('token-1', 'login', '203.0.113.7')
+        self.assertEqual(self.server.requests, 3)
+        # Used up: the next resubmission goes to Google, which would reject it
+        ReCaptchaValidator.verify_token('token-1', 'login', '203.0.113.7')
+        self.assertEqual(self.server.requests, 4)
+    
+    @override_settings(RECAPTCHA_TIMEOUT=(0.5, 0.2))
+    def test_slow_upstream_fails_within_budget(self):
+        """A slow upstream is abandoned at the read timeout"""
+        self.server.delay = 1.0
+        started = time.monotonic()
+        result = ReCaptchaValidator.verify_token('slow', 'login')
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(result['error_codes'], ['network-error'])
+    
+    def test_circuit_opens_after_repeated_failures(self):
+        """Once open, verification fails fast without calling upstream"""
+        self.server.status = 503
+        for index in range(RECAPTCHA_BREAKER_FAILURES):
+            result = ReCaptchaValidator.verify_token(f'token-{index}', 'login')
+            self.assertEqual(result['error_codes'], ['network-error'])
+        result = ReCaptchaValidator.verify_token('token-next', 'login')
+        self.assertEqual(result['error_codes'], ['circuit-open'])
+        self.assertEqual(self.server.requests, RECAPTCHA_BREAKER_FAILURES)
+
+
 class ReCaptchaContextTests(TestCase):
     """Test reCAPTCHA context helper"""
     
@@ -0,0 +1,122 @@
+"""
+Tests for per-user data versions, the versioned API response cache and conditional GETs
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from ghg.data_version import get_data_version
+from ghg.models import Country, EmissionData, EmissionRecord, EmissionRollup, Supplier, UserDataVersion
+
+
+class VersionedResponseCacheTest(TestCase):
+    """Test that cached analytics responses follow the user's writes"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='version@example.com', email='version@example.com', password='TestPass123!'
+        )
+        self.other_user = User.objects.create_user(
+            username='other@example.com', email='other@example.com', password='TestPass123!'
+        )
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def create_record(self, user, kg=1000.0):
+        return EmissionRecord.objects.create(
+            user=user, scope='1', category='stationary', source='coal', source_name='Coal',
+            activity_data=1, unit='kg', emission_factor=kg, emissions_kg=kg, emissions_tons=kg / 1000,
+        )
+
+    def test_writes_bump_the_owners_version(self):
+        """Saves, deletes and bulk writes bump only the owner's version"""
+        self.assertEqual(get_data_version(self.user), 0)
+        record = self.create_record(self.user)
+        Supplier.objects.create(user=self.user, name='Grid Co')
+        self.assertEqual(get_data_version(self.user), 2)
+
+        record.delete()
+        self.client.post(
+            reverse('ghg:calculate_emission_bulk'),
+            json.dumps({'items': [{'category': 'stationary', 'source': 'coal', 'activity_data': 1}]}),
+            content_type='application/json',
+        )
+        self.assertEqual(get_data_version(self.user), 4)
+        self.assertEqual(get_data_version(self.other_user), 0)
+
+    def test_repeated_loads_skip_aggregation_until_data_changes(self):
+        """Cached responses cost one version lookup and are never stale"""
+        self.create_record(self.user)
+        url = reverse('ghg:dashboard_api')
+        first = self.client.get(url).json()
+
+        # session + user + data version
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url).json(), first)
+        self.assertNotEqual(self.client.get(url, {'country': 'turkey'}).json(), first)
+
+        self.create_record(self.other_user)
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+        self.create_record(self.user, kg=500.0)
+        self.assertEqual(self.client.get(url).json()['total_records'], 2)
+        self.assertEqual(self.client.get(reverse('ghg:emissions_summary_api')).json()['records'], 2)
+
+    def test_conditional_get_returns_not_modified(self):
+        """A matching If-None-Match gets a 304 until the user's data changes"""
+        url = reverse('ghg:analysis_top_sources')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        # session + user + data version
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.create_record(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['sources'][0]['name'], 'Coal')
+
+        global_url = reverse('ghg:global_data')
+        global_etag = self.client.get(global_url)['ETag']
+        # session + user + dataset version, without aggregating the dataset
+        with self.assertNumQueries(3):
+            response = self.client.get(global_url, HTTP_IF_NONE_MATCH=global_etag)
+        self.assertEqual(response.status_code, 304)
+
+        country = Country.objects.create(name='Testland', code='TL')
+        EmissionData.objects.create(country=country, year=2020, co2_emissions=1.0, total_ghg=1.5)
+        response = self.client.get(global_url, HTTP_IF_NONE_MATCH=global_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['emissions'], [1.5])
+
+
+class UserDeletionTest(TransactionTestCase):
+    """Test that deleting a user doesn't recreate their data version mid-cascade"""
+
+    def test_user_with_data_can_be_deleted(self):
+        user = User.objects.create_user(username='leaving@example.com', password='TestPass123!')
+        EmissionRecord.objects.create(
+            user=user, scope='1', category='stationary', source='coal', source_name='Coal',
+            activity_data=1, unit='kg', emission_factor=10.0, emissions_kg=10.0, emissions_tons=0.01,
+        )
+        Supplier.objects.create(user=user, name='Supplier')
+        self.assertEqual(get_data_version(user), 2)
+
+        user.delete()
+
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertFalse(UserDataVersion.objects.exists())
+        self.assertFalse(EmissionRollup.objects.exists())
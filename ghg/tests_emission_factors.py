@@ -0,0 +1,131 @@
+"""
+Tests for the emission factor registry and calculator
+"""
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ghg import emission_factors
+from ghg.benchmarks import _legacy_calculate_emissions
+from ghg.emission_factors import (
+    EMISSION_FACTOR_INDEX,
+    calculate_emissions,
+    calculate_emissions_batch,
+    get_emission_sources,
+)
+
+
+class EmissionFactorIndexTests(SimpleTestCase):
+    """Test the precompiled emission factor index"""
+
+    def test_index_matches_per_call_registry(self):
+        """Every indexed lookup gives the same result as the old per-call registry"""
+        for (country, category, source) in EMISSION_FACTOR_INDEX:
+            with self.subTest(country=country, category=category, source=source):
+                self.assertEqual(
+                    calculate_emissions(category, source, 123.45, country),
+                    _legacy_calculate_emissions(category, source, 123.45, country),
+                )
+
+    def test_case_variants_resolve_to_same_factor(self):
+        """Country and category case variants hit the same factor"""
+        expected = calculate_emissions('stationary', 'coal', 10, 'turkey')
+        for country in ('Turkey', 'TURKEY', 'tUrKeY'):
+            for category in ('Stationary', 'STATIONARY'):
+                result = calculate_emissions(category, 'coal', 10, country)
+                self.assertEqual(result['factor'], expected['factor'])
+                self.assertEqual(result['category'], 'stationary')
+                self.assertEqual(result['country'], country.lower())
+
+    def test_unknown_country_uses_global_factors(self):
+        """Countries without a specific factor set use the global one"""
+        result = calculate_emissions('stationary', 'coal', 10, 'germany')
+        self.assertEqual(result['factor'], emission_factors.STATIONARY_COMBUSTION['coal']['factor'])
+
+    def test_invalid_category_and_source(self):
+        """Invalid inputs keep returning the error dicts"""
+        self.assertEqual(
+            calculate_emissions('nope', 'coal', 1),
+            {'error': 'Invalid category: nope'},
+        )
+        self.assertIn('Invalid source', calculate_emissions('stationary', 'nope', 1)['error'])
+
+    def test_registry_is_read_only(self):
+        """The precompiled index cannot be mutated at runtime"""
+        with self.assertRaises(TypeError):
+            EMISSION_FACTOR_INDEX[('global', 'stationary', 'new')] = {}
+        with self.assertRaises(TypeError):
+            get_emission_sources('stationary')['new'] = {}
+
+    def test_get_emission_sources(self):
+        """Sources are returned per category and country"""
+        self.assertIn('plastic', get_emission_sources('Purchased-Goods', 'Turkey'))
+        self.assertNotIn('plastic', get_emission_sources('purchased-goods', 'global'))
+        self.assertEqual(len(get_emission_sources('unknown')), 0)
+
+
+class EmissionBatchCalculationTests(SimpleTestCase):
+    """Test calculate_emissions_batch"""
+
+    def test_batch_matches_single_calculations(self):
+        """Batch results equal calculate_emissions item by item"""
+        items = [
+            (category, source, 1234.5678 + i, country)
+            for i, (country, category, source) in enumerate(EMISSION_FACTOR_INDEX)
+        ]
+        batch = calculate_emissions_batch(items)
+
+        self.assertFalse(batch['error_mask'].any())
+        for i, item in enumerate(items):
+            single = calculate_emissions(*item)
+            self.assertEqual(batch['factor'][i], single['factor'])
+            self.assertEqual(batch['emissions_kg'][i], single['emissions_kg'])
+            self.assertEqual(batch['emissions_tons'][i], single['emissions_tons'])
+            for gas in ('co2', 'ch4', 'n2o'):
+                if f'{gas}_kg' in single:
+                    self.assertEqual(batch[f'{gas}_kg'][i], single[f'{gas}_kg'])
+            self.assertEqual(batch['factor_data'][i]['unit'], single['unit'])
+            self.assertEqual(batch['categories'][i], single['category'])
+            self.assertEqual(batch['countries'][i], single['country'])
+
+    def test_errors_are_reported_in_parallel_mask(self):
+        """Invalid items are flagged without affecting valid ones"""
+        batch = calculate_emissions_batch([
+            ('electricity', 'turkey-grid', 100, 'turkey'),
+            ('electricity', 'no-such-source', 100, 'turkey'),
+            ('no-such-category', 'coal', 100),
+            ('stationary', 'coal', 'abc'),
+            ('stationary', 'coal', 10),
+            ('stationary', ['coal'], 10),
+        ])
+
+        self.assertEqual(batch['error_mask'].tolist(), [False, True, True, True, False, True])
+        self.assertIn("Invalid source '['coal']'", batch['errors'][5])
+        self.assertIsNone(batch['errors'][0])
+        self.assertIn('Invalid source', batch['errors'][1])
+        self.assertEqual(batch['errors'][2], 'Invalid category: no-such-category')
+        self.assertIn('Invalid activity data', batch['errors'][3])
+        self.assertTrue(np.isnan(batch['emissions_kg'][1:4]).all())
+        self.assertAlmostEqual(batch['emissions_kg'][0], 45.2)
+        self.assertAlmostEqual(batch['emissions_kg'][4], 24.2)
+
+    def test_rounding_matches_python_round_at_midpoints(self):
+        """Values next to a rounding midpoint round as round() does, where np.round may not"""
+        midpoints = (np.arange(1, 20001) + 0.5) / 10 ** 4
+        values = np.concatenate([midpoints, np.nextafter(midpoints, 0), np.nextafter(midpoints, 1), [np.nan]])
+
+        rounded = emission_factors._round(values, 4)
+
+        self.assertEqual(rounded[:-1].tolist(), [round(value, 4) for value in values[:-1].tolist()])
+        self.assertTrue(np.isnan(rounded[-1]))
+
+    def test_default_country(self):
+        """Items without a country use the batch default"""
+        batch = calculate_emissions_batch([('stationary', 'coal', 1)], country='turkey')
+        self.assertEqual(batch['factor'][0], emission_factors.TURKEY_STATIONARY['coal']['factor'])
+
+    def test_empty_batch(self):
+        """An empty batch returns empty arrays"""
+        batch = calculate_emissions_batch([])
+        self.assertEqual(len(batch['emissions_kg']), 0)
+        self.assertEqual(batch['errors'], [])
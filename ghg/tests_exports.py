@@ -0,0 +1,119 @@
+"""
+Tests for the streaming CSV and XLSX exports
+"""
+import csv
+from io import BytesIO, StringIO
+
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import FileResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from openpyxl import load_workbook
+
+from ghg.models import CustomEmissionFactor, EmissionRecord, Supplier
+
+
+def read_csv(response):
+    return list(csv.reader(StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+
+
+class StreamingExportTest(TestCase):
+    """Test that exports stream and use a fixed number of queries"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            'admin@example.com', 'admin@example.com', 'AdminPass123!', is_staff=True, is_superuser=True
+        )
+        self.user = User.objects.create_user('export@example.com', 'export@example.com', 'TestPass123!')
+        self.supplier = Supplier.objects.create(user=self.user, name='Gas Co')
+        for index in range(5):
+            EmissionRecord.objects.create(
+                user=self.user, scope='1', category='stationary', source='natural-gas',
+                source_name='Natural Gas', activity_data=index, unit='m3', emission_factor=2.0,
+                emissions_kg=2.0 * index, emissions_tons=0.002 * index,
+                supplier=self.supplier if index % 2 else None, supplier_old='Legacy Gas',
+            )
+        self.request = RequestFactory().get('/admin/')
+        self.request.user = self.admin
+
+    def tearDown(self):
+        cache.clear()
+
+    def assertRowsInQueries(self, response, expected_rows, queries):
+        self.assertIsInstance(response, StreamingHttpResponse)
+        with CaptureQueriesContext(connection) as captured:
+            rows = read_csv(response)
+        self.assertEqual(len(rows), expected_rows + 1)
+        self.assertEqual(len(captured), queries)
+        return rows
+
+    def test_user_data_export(self):
+        """Supplier names come from the same query as the records"""
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('ghg:admin_export_user_data', args=[self.user.id]))
+        self.assertIn('attachment; filename="user_export@example.com_data.csv"', response['Content-Disposition'])
+        rows = self.assertRowsInQueries(response, 5, 1)
+        self.assertEqual(rows[0][0], 'Date')
+        self.assertEqual({row[10] for row in rows[1:]}, {'Gas Co', 'Legacy Gas'})
+
+    def test_admin_actions(self):
+        """Each admin export action reads its rows in one query"""
+        CustomEmissionFactor.objects.create(
+            user=self.user, name='Boiler', category='stationary', factor_value=1.5, unit='kg CO2e/kWh'
+        )
+        records = site._registry[EmissionRecord]
+        rows = self.assertRowsInQueries(
+            records.export_records_csv(self.request, records.get_queryset(self.request)), 5, 1
+        )
+        self.assertEqual(rows[1][0], 'export@example.com')
+
+        suppliers = site._registry[Supplier]
+        rows = self.assertRowsInQueries(
+            suppliers.export_suppliers_csv(self.request, suppliers.get_queryset(self.request)), 1, 1
+        )
+        self.assertEqual(rows[1][8:], ['2', '8.0', 'export@example.com'])
+
+        factors = site._registry[CustomEmissionFactor]
+        self.assertRowsInQueries(factors.export_factors_csv(self.request, factors.get_queryset(self.request)), 1, 1)
+
+        users = site._registry[User]
+        rows = self.assertRowsInQueries(users.export_users_csv(self.request, User.objects.filter(pk=self.user.pk)), 1, 1)
+        self.assertEqual(rows[1][6:], ['20.0', '5', '1'])
+
+    def get_report(self, url, params=None):
+        """The report at ``url`` once the worker has rendered the job the first request queued"""
+        self.assertEqual(self.client.get(url, params).status_code, 202)
+        call_command('run_report_worker', '--once', stdout=StringIO())
+        return self.client.get(url, params)
+
+    def test_emission_report_xlsx(self):
+        """Totals and widths come from one aggregate; scope cells use named styles"""
+        self.client.force_login(self.user)
+        response = self.get_report(reverse('ghg:export_report', args=['scope1']))
+        self.assertIsInstance(response, FileResponse)
+        self.assertIn('Scope_1_Direct_Emissions_Report_', response['Content-Disposition'])
+
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(sheet.title, 'Scope 1 Direct')
+        self.assertIn('Summary: 5 records | Total Emissions: 20.00 kg CO2e', sheet['A4'].value)
+        self.assertIn('A1:J1', {str(cells) for cells in sheet.merged_cells.ranges})
+        self.assertEqual([cell.value for cell in sheet[6]][:3], ['Date', 'Time', 'Scope'])
+        self.assertEqual(sheet.max_row, 11)
+        self.assertEqual(sheet['C7'].value, 'Scope 1')
+        self.assertEqual(sheet['C7'].style, 'report_scope_1')
+        self.assertEqual(sheet['C7'].fill.start_color.rgb, '00FEE2E2')
+        self.assertEqual(sheet.column_dimensions['D'].width, len('Natural Gas') + 2)
+
+    def test_emissions_analysis_xlsx(self):
+        """Rows are ordered by emissions, largest first"""
+        self.client.force_login(self.user)
+        response = self.get_report(reverse('ghg:emissions_export_api'), {'scopes': '1'})
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(sheet['A4'].value, 'Source')
+        self.assertEqual([sheet.cell(row=row, column=5).value for row in range(5, 10)], [8.0, 6.0, 4.0, 2.0, 0.0])
@@ -0,0 +1,202 @@
+"""
+Tests for the database-backed emission factor resolver
+"""
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from ghg import factor_resolver
+from ghg.calculation_services import recalculate_emission_records
+from ghg.emission_factors import calculate_emissions
+from ghg.factor_resolver import (
+    FACTOR_VERSION_CACHE_KEY,
+    FactorTimeline,
+    get_factor_set,
+    invalidate_factor_cache,
+    resolve_factor,
+)
+from ghg.models import EmissionRecord
+from ghg.models_emission_sources import (
+    EmissionCategory, EmissionFactorData, EmissionScope, EmissionSource,
+)
+
+
+def timeline_row(factor_id, valid_from=None, valid_to=None, is_default=False, reference_year=None):
+    return {
+        'valid_from': valid_from,
+        'valid_to': valid_to,
+        'is_default': is_default,
+        'reference_year': reference_year,
+        'factor_data': {'factor': float(factor_id), 'factor_id': factor_id},
+    }
+
+
+class FactorTimelineTest(SimpleTestCase):
+    """Test the disjoint-segment interval index"""
+
+    def factor_at(self, timeline, on_date):
+        factor = timeline.at(on_date)
+        return factor and factor['factor_id']
+
+    def test_gaps_and_open_ends(self):
+        """Dates outside every window have no factor"""
+        timeline = FactorTimeline([
+            timeline_row(1, date(2022, 1, 1), date(2022, 12, 31)),
+            timeline_row(2, date(2024, 1, 1)),
+        ])
+
+        self.assertIsNone(self.factor_at(timeline, date(2021, 12, 31)))
+        self.assertEqual(self.factor_at(timeline, date(2022, 1, 1)), 1)
+        self.assertEqual(self.factor_at(timeline, date(2022, 12, 31)), 1)
+        self.assertIsNone(self.factor_at(timeline, date(2023, 6, 1)))
+        self.assertEqual(self.factor_at(timeline, date(2099, 1, 1)), 2)
+
+    def test_overlapping_windows(self):
+        """Defaults win overlaps, then the most recently started window"""
+        timeline = FactorTimeline([
+            timeline_row(1),                                          # open-ended fallback
+            timeline_row(2, date(2023, 1, 1), date(2023, 12, 31)),
+            timeline_row(3, date(2023, 6, 1), date(2023, 6, 30)),
+            timeline_row(4, date(2025, 1, 1), date(2025, 12, 31), is_default=True),
+            timeline_row(5, date(2025, 3, 1)),
+        ])
+
+        self.assertEqual(self.factor_at(timeline, date(2020, 1, 1)), 1)
+        self.assertEqual(self.factor_at(timeline, date(2023, 5, 31)), 2)
+        self.assertEqual(self.factor_at(timeline, date(2023, 6, 15)), 3)
+        self.assertEqual(self.factor_at(timeline, date(2023, 7, 1)), 2)
+        self.assertEqual(self.factor_at(timeline, date(2024, 1, 1)), 1)
+        self.assertEqual(self.factor_at(timeline, date(2025, 6, 1)), 4)
+        self.assertEqual(self.factor_at(timeline, date(2026, 1, 1)), 5)
+        # The 2025-03-01 boundary falls inside the default window and is merged away
+        self.assertEqual(len(timeline.starts), 7)
+
+
+class FactorResolverTest(TestCase):
+    """Test factor_resolver and its cache invalidation"""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_factor_cache()
+        scope = EmissionScope.objects.create(scope_number='1', name_en='Direct Emissions')
+        category = EmissionCategory.objects.create(scope=scope, code='stationary', name_en='Stationary')
+        self.source = EmissionSource.objects.create(
+            category=category, code='coal', name_en='Coal (admin)', default_unit='kg'
+        )
+
+    def tearDown(self):
+        cache.clear()
+        invalidate_factor_cache()
+
+    def add_factor(self, **kwargs):
+        values = {'source': self.source, 'country_code': 'global', 'factor_value': 3.0, 'unit': 'kg'}
+        values.update(kwargs)
+        with self.captureOnCommitCallbacks(execute=True):
+            return EmissionFactorData.objects.create(**values)
+
+    def test_builtin_factors_used_without_database_rows(self):
+        """Without database factors the built-in tables are used"""
+        self.assertEqual(
+            calculate_emissions('stationary', 'coal', 10, resolve=resolve_factor),
+            calculate_emissions('stationary', 'coal', 10),
+        )
+
+    def test_database_factor_overrides_builtin(self):
+        """Active database factors take precedence and edits apply immediately"""
+        factor = self.add_factor(reference_source='Admin 2025')
+
+        result = calculate_emissions('stationary', 'coal', 10, resolve=resolve_factor)
+        self.assertEqual(result['factor'], 3.0)
+        self.assertEqual(result['reference'], 'Admin 2025')
+
+        factor.factor_value = 4.0
+        with self.captureOnCommitCallbacks(execute=True):
+            factor.save()
+        self.assertEqual(calculate_emissions('stationary', 'coal', 10, resolve=resolve_factor)['factor'], 4.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            factor.delete()
+        self.assertEqual(
+            calculate_emissions('stationary', 'coal', 10, resolve=resolve_factor)['factor'],
+            calculate_emissions('stationary', 'coal', 10)['factor'],
+        )
+
+    def test_country_precedence(self):
+        """Country rows win over built-in country tables, which win over global rows"""
+        self.add_factor(country_code='global', factor_value=3.0)
+        builtin_turkey = calculate_emissions('stationary', 'coal', 1, 'turkey')['factor']
+
+        self.assertEqual(calculate_emissions('stationary', 'coal', 1, 'turkey', resolve=resolve_factor)['factor'], builtin_turkey)
+        self.assertEqual(calculate_emissions('stationary', 'coal', 1, 'germany', resolve=resolve_factor)['factor'], 3.0)
+
+        self.add_factor(country_code='TR', factor_value=5.0)
+        self.assertEqual(calculate_emissions('stationary', 'coal', 1, 'turkey', resolve=resolve_factor)['factor'], 5.0)
+
+    def test_validity_window(self):
+        """The factor valid on the requested date is returned"""
+        self.add_factor(factor_value=1.0, valid_from=date(2023, 1, 1), valid_to=date(2023, 12, 31))
+        self.add_factor(factor_value=2.0, valid_from=date(2024, 1, 1))
+
+        self.assertIsNone(resolve_factor('global', 'stationary', 'coal', date(2022, 6, 1)))
+        self.assertEqual(resolve_factor('global', 'stationary', 'coal', date(2023, 6, 1))['factor'], 1.0)
+        self.assertEqual(resolve_factor('global', 'stationary', 'coal', date(2025, 6, 1))['factor'], 2.0)
+
+    def test_bulk_update_requires_explicit_invalidation(self):
+        """queryset.update() changes show up after invalidate_factor_cache"""
+        self.add_factor()
+        EmissionFactorData.objects.update(is_active=False)
+        invalidate_factor_cache()
+        self.assertIsNone(resolve_factor('global', 'stationary', 'coal'))
+
+    def test_lookups_do_not_query_database(self):
+        """Once loaded, lookups are served from memory"""
+        self.add_factor()
+        get_factor_set()
+        with self.assertNumQueries(0):
+            for _ in range(100):
+                calculate_emissions('stationary', 'coal', 1, resolve=resolve_factor)
+
+    def test_version_change_from_other_process_reloads(self):
+        """A new version token in the shared cache triggers a reload"""
+        self.add_factor()
+        self.assertEqual(resolve_factor('global', 'stationary', 'coal')['factor'], 3.0)
+        EmissionFactorData.objects.update(factor_value=7.0)
+        self.assertEqual(resolve_factor('global', 'stationary', 'coal')['factor'], 3.0)
+        # Simulate another worker publishing a new version
+        cache.set(FACTOR_VERSION_CACHE_KEY, 'other-worker', None)
+
+        with mock.patch.object(factor_resolver, 'VERSION_CHECK_INTERVAL', 0):
+            self.assertEqual(resolve_factor('global', 'stationary', 'coal')['factor'], 7.0)
+
+    def test_dated_calculations_and_recalculation(self):
+        """Single and batch calculations use the factor in force on the activity date"""
+        self.add_factor(factor_value=1.0, valid_from=date(2022, 1, 1), valid_to=date(2022, 12, 31))
+        self.add_factor(factor_value=2.0, valid_from=date(2023, 1, 1))
+
+        self.assertEqual(
+            calculate_emissions('stationary', 'coal', 10, resolve=resolve_factor, on_date=date(2022, 5, 1))['factor'],
+            1.0,
+        )
+
+        user = User.objects.create_user(username='recalc@example.com', password='TestPass123!')
+        records = [
+            EmissionRecord.objects.create(
+                user=user, scope='1', category='stationary', source='coal', source_name='Coal',
+                activity_data=10, unit='kg', emission_factor=9.0, emissions_kg=90.0, emissions_tons=0.09,
+                activity_date=activity_date,
+            )
+            for activity_date in (date(2022, 6, 1), date(2023, 6, 1), None)
+        ]
+        records.append(EmissionRecord.objects.create(
+            user=user, scope='3', category='custom', source='My factor', source_name='Custom',
+            activity_data=1, unit='kg', emission_factor=1.0, emissions_kg=1.0, emissions_tons=0.001,
+        ))
+
+        results = recalculate_emission_records(records)
+
+        self.assertEqual([r and r['factor'] for _, r in results], [1.0, 2.0, 2.0, None])
+        self.assertEqual(results[0][1]['emissions_kg'], 10.0)
+        self.assertEqual(records[0].emissions_kg, 90.0)
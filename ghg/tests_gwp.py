@@ -0,0 +1,98 @@
+"""
+Tests for per-gas emissions and GWP re-weighting
+"""
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from ghg.calculation_services import build_emission_records
+from ghg.emission_factors import calculate_emissions
+from ghg.factor_resolver import invalidate_factor_cache, resolve_factor
+from ghg.gwp import GWP_SETS, get_gwp_set, reweight_emissions
+from ghg.models import EmissionRecord
+from ghg.models_emission_sources import (
+    EmissionCategory, EmissionFactorData, EmissionScope, EmissionSource,
+)
+from ghg.reporting.services import InventoryFilters, compute_inventory_summary
+
+
+class ReweightEmissionsTest(SimpleTestCase):
+    """Test the array re-weighting"""
+
+    def test_reweighting_between_gwp_sets(self):
+        """Gas masses are re-weighted; totals without a breakdown are unchanged"""
+        ar6 = GWP_SETS['AR6']
+        emissions = np.array([1000 + 2 * ar6['ch4'] + 1 * ar6['n2o'] + 5, 750.0])
+        totals = reweight_emissions(
+            emissions,
+            np.array([1000.0, np.nan]),
+            np.array([2.0, np.nan]),
+            np.array([1.0, np.nan]),
+            'ar4',
+        )
+
+        # The 5 kg not explained by the three gases is kept
+        self.assertAlmostEqual(totals[0], 1000 + 2 * 25 + 298 + 5)
+        self.assertEqual(totals[1], 750.0)
+        np.testing.assert_allclose(
+            reweight_emissions(emissions, [1000.0, np.nan], [2.0, np.nan], [1.0, np.nan], 'AR6'),
+            emissions,
+        )
+        with self.assertRaises(ValueError):
+            get_gwp_set('AR3')
+
+
+class GasBreakdownTest(TestCase):
+    """Test per-gas quantities from factors through to reports"""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_factor_cache()
+        self.user = User.objects.create_user(username='gases@example.com', password='TestPass123!')
+        scope = EmissionScope.objects.create(scope_number='1', name_en='Direct Emissions')
+        category = EmissionCategory.objects.create(scope=scope, code='stationary', name_en='Stationary')
+        source = EmissionSource.objects.create(category=category, code='natural-gas', name_en='Gas', default_unit='gj')
+        with self.captureOnCommitCallbacks(execute=True):
+            EmissionFactorData.objects.create(
+                source=source, country_code='global', unit='gj',
+                factor_value=56.1 + 0.001 * 27.9 + 0.0001 * 273,
+                co2_factor=56.1, ch4_factor=0.001, n2o_factor=0.0001,
+            )
+
+    def tearDown(self):
+        cache.clear()
+        invalidate_factor_cache()
+
+    def test_single_and_bulk_calculations_store_gases(self):
+        """Per-gas masses follow the activity data; built-in factors have none"""
+        result = calculate_emissions('stationary', 'natural-gas', 100, resolve=resolve_factor)
+        self.assertAlmostEqual(result['co2_kg'], 5610.0)
+        self.assertAlmostEqual(result['ch4_kg'], 0.1)
+        self.assertNotIn('co2_kg', calculate_emissions('stationary', 'coal', 100))
+
+        records, _ = build_emission_records(self.user, [
+            {'category': 'stationary', 'source': 'natural-gas', 'activity_data': 100},
+            {'category': 'stationary', 'source': 'coal', 'activity_data': 100},
+        ])
+        self.assertAlmostEqual(records[0].n2o_kg, 0.01)
+        self.assertIsNone(records[1].co2_kg)
+
+    def test_inventory_summary_switches_gwp_set(self):
+        """Reports re-weight stored gas quantities under the requested GWP set"""
+        records, _ = build_emission_records(self.user, [
+            {'category': 'stationary', 'source': 'natural-gas', 'activity_data': 1000},
+            {'category': 'stationary', 'source': 'coal', 'activity_data': 1000},
+        ])
+        EmissionRecord.objects.bulk_create(records)
+        stored_t = sum(record.emissions_kg for record in records) / 1000
+
+        ar6 = compute_inventory_summary(InventoryFilters(user=self.user))['gwp']
+        ar4 = compute_inventory_summary(InventoryFilters(user=self.user, gwp_set='AR4'))['gwp']
+
+        self.assertEqual(ar6['gwp_set'], 'AR6')
+        self.assertAlmostEqual(ar6['total_t'], stored_t)
+        self.assertEqual(ar4['records_with_breakdown'], 1)
+        self.assertAlmostEqual(ar4['gases_t']['ch4'], 0.001)
+        self.assertAlmostEqual(ar4['total_t'] - stored_t, (0.001 * (25 - 27.9) + 0.0001 * (298 - 273)))
+        self.assertAlmostEqual(ar4['by_scope']['1'], ar4['total_t'])
@@ -0,0 +1,121 @@
+"""
+Tests for the streaming activity data importer
+"""
+import io
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from openpyxl import Workbook
+
+from ghg.emission_factors import calculate_emissions
+from ghg.importers import ActivityImportError, import_activity_data
+from ghg.models import EmissionRecord, Supplier
+
+
+CSV_HEADER = 'Category,Source,Amount,Country,Supplier,Description\n'
+
+
+def make_csv(rows):
+    return io.BytesIO((CSV_HEADER + ''.join(rows)).encode('utf-8'))
+
+
+def make_xlsx(rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['category', 'source', 'activity_data', 'country'])
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class ActivityImportTest(TestCase):
+    """Test import_activity_data"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='import@example.com', email='import@example.com', password='TestPass123!'
+        )
+        self.supplier = Supplier.objects.create(user=self.user, name='Grid Co')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_csv_rows_are_imported_in_chunks(self):
+        """Valid rows are saved and progress is reported per chunk"""
+        rows = [f'stationary,coal,{i},global,,Row {i}\n' for i in range(25)]
+        updates = []
+
+        progress = import_activity_data(
+            self.user, make_csv(rows), 'meters.csv', chunk_size=10,
+            progress_callback=lambda p: updates.append(p.rows_processed),
+        )
+
+        self.assertEqual(progress.rows_imported, 25)
+        self.assertEqual(updates, [10, 20, 25, 25])
+        self.assertTrue(progress.finished)
+        record = EmissionRecord.objects.get(description='Row 7')
+        self.assertAlmostEqual(
+            record.emissions_kg, calculate_emissions('stationary', 'coal', 7)['emissions_kg']
+        )
+        self.assertEqual(record.scope, '1')
+
+    def test_invalid_rows_are_skipped_and_reported(self):
+        """Bad rows are reported with their spreadsheet row number"""
+        rows = [
+            'electricity,turkey-grid,1000,turkey,Grid Co,\n',
+            'electricity,no-such-source,10,turkey,,\n',
+            'stationary,coal,abc,,,\n',
+            'stationary,coal,5,,Unknown Co,\n',
+        ]
+
+        progress = import_activity_data(self.user, make_csv(rows), 'invoices.csv')
+
+        self.assertEqual(progress.rows_imported, 1)
+        self.assertEqual(progress.rows_failed, 3)
+        self.assertEqual([error['row'] for error in progress.errors], [3, 4, 5])
+        record = EmissionRecord.objects.get(user=self.user)
+        self.assertEqual(record.supplier, self.supplier)
+        self.assertEqual(record.scope, '2')
+
+    def test_xlsx_import(self):
+        """XLSX files are read from the first worksheet"""
+        progress = import_activity_data(
+            self.user,
+            make_xlsx([['mobile', 'on-road-diesel-desnz', 120.5, 'global'], ['waste', 'recyclable', 8, None]]),
+            'export.xlsx',
+        )
+
+        self.assertEqual(progress.rows_imported, 2)
+        self.assertEqual(EmissionRecord.objects.filter(user=self.user, scope='3').count(), 1)
+
+    def test_missing_columns_and_unsupported_files(self):
+        """Files without the required columns or with other extensions are rejected"""
+        with self.assertRaises(ActivityImportError):
+            import_activity_data(self.user, io.BytesIO(b'category,source\nstationary,coal\n'), 'a.csv')
+        with self.assertRaises(ActivityImportError):
+            import_activity_data(self.user, io.BytesIO(b''), 'a.txt')
+        self.assertFalse(EmissionRecord.objects.exists())
+
+    def test_upload_view_and_progress(self):
+        """Uploads are imported and their progress can be fetched"""
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile(
+            'meters.csv', (CSV_HEADER + 'stationary,coal,10,,,\n').encode('utf-8'), content_type='text/csv'
+        )
+
+        response = self.client.post(
+            reverse('ghg:import_activity_data'), {'file': upload, 'import_id': 'abc123'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rows_imported'], 1)
+        progress = self.client.get(reverse('ghg:import_progress', args=['abc123'])).json()
+        self.assertTrue(progress['finished'])
+        self.assertEqual(progress['rows_imported'], 1)
@@ -0,0 +1,113 @@
+"""
+Tests for the inventory snapshot shared by the reporting page and PDF reports
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ghg.models import EmissionRecord
+from ghg.reporting.renderers import emissions_pdf, inventory_filters
+from ghg.reporting.services import InventoryFilters, compute_inventory_summary, inventory_snapshot
+
+
+class InventorySnapshotTest(TestCase):
+    """Test that every inventory report is built from the same totals"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('snapshot@example.com', 'snapshot@example.com', 'TestPass123!')
+        sources = [
+            ('1', 'stationary', 'natural-gas', 'Natural Gas', 'turkey', 30.0),
+            ('1', 'stationary', 'natural-gas', 'Natural Gas', 'global', 10.0),
+            ('1', 'mobile', 'diesel', 'Diesel', 'turkey', 5.0),
+            ('2', 'electricity', 'grid', 'Grid Electricity', 'turkey', 50.0),
+            ('3', 'waste', 'landfill', 'Landfill', 'global', 5.0),
+        ]
+        for scope, category, source, source_name, country, emissions_kg in sources:
+            EmissionRecord.objects.create(
+                user=self.user, scope=scope, category=category, source=source, source_name=source_name,
+                activity_data=1, unit='unit', emission_factor=emissions_kg, country=country,
+                emissions_kg=emissions_kg, emissions_tons=emissions_kg / 1000,
+            )
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_snapshot_matches_records(self):
+        snapshot = inventory_snapshot(InventoryFilters(user=self.user))
+        records = EmissionRecord.objects.filter(user=self.user)
+
+        self.assertAlmostEqual(snapshot.total_kg, 100.0)
+        self.assertEqual(snapshot.records, 5)
+        by_scope = records.values('scope').annotate(kg=Sum('emissions_kg'), n=Count('id'))
+        self.assertEqual(
+            {scope: (row['sum_kg'], row['count']) for scope, row in snapshot.by_scope.items()},
+            {row['scope']: (row['kg'], row['n']) for row in by_scope},
+        )
+        # Sources are summed across countries, largest first
+        self.assertEqual(
+            [(row['source_name'], row['sum_kg'], row['count']) for row in snapshot.sources],
+            [('Grid Electricity', 50.0, 1), ('Natural Gas', 40.0, 2), ('Diesel', 5.0, 1), ('Landfill', 5.0, 1)],
+        )
+        self.assertEqual(snapshot.countries, ['global', 'turkey'])
+        self.assertEqual(snapshot.percentage(40.0), 40.0)
+
+        filtered = inventory_snapshot(inventory_filters(self.user, {'scope': '1', 'country': 'turkey'}))
+        self.assertEqual((filtered.total_kg, filtered.records), (35.0, 2))
+        self.assertEqual(inventory_filters(self.user, {'scope': 'all', 'country': 'all'}).scope, None)
+
+        summary = compute_inventory_summary(filtered.filters, filtered)
+        self.assertEqual(summary['totals']['total_kg'], 35.0)
+        self.assertEqual([row['source_name'] for row in summary['top_sources']], ['Natural Gas', 'Diesel'])
+
+    def test_reporting_page_queries_do_not_depend_on_filters(self):
+        url = reverse('ghg:inventory_report')
+        this_year = timezone.localdate().year
+        counts = []
+        for params in (
+            {},
+            {'scope': '1'},
+            {'scope': '2', 'country': 'turkey'},
+            {'from': f'{this_year - 1}-01-01', 'to': f'{this_year}-12-31'},
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, counts)
+
+        response = self.client.get(url)
+        self.assertEqual(response.context['total_records'], 5)
+        self.assertEqual(
+            [(row['scope'], row['records_count'], row['percentage']) for row in response.context['scope_breakdown']],
+            [(1, 3, 45.0), (2, 1, 50.0), (3, 1, 5.0)],
+        )
+        self.assertEqual(response.context['top_sources'][1]['total_kg'], 40.0)
+
+    def test_pdf_queries_do_not_depend_on_filters(self):
+        """The totals, uncertainty and GWP of the PDF report take a fixed number of queries"""
+        from io import BytesIO
+
+        today = timezone.localdate()
+        counts = []
+        for params in (
+            {},
+            {'scope': '1', 'gwp': 'AR5'},
+            {'from': (today - timedelta(days=400)).isoformat(), 'to': today.isoformat(), 'gwp': 'AR4'},
+        ):
+            output = BytesIO()
+            with CaptureQueriesContext(connection) as queries:
+                emissions_pdf(self.user, params, output)
+            self.assertTrue(output.getvalue().startswith(b'%PDF'))
+            counts.append(len(queries))
+        # Partial months at the ends of a date range add one query over raw records
+        self.assertLessEqual(max(counts), counts[1] + 1)
+        self.assertLessEqual(counts[1], 4)
@@ -0,0 +1,58 @@
+"""
+Tests for the atomic rate limiter
+"""
+import threading
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ghg.ratelimit import hit
+
+
+class RateLimitTest(SimpleTestCase):
+    """Test fixed and sliding windows on the shared cache"""
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_fixed_window_blocks_and_resets(self):
+        """Hits over the limit are denied until the next window"""
+        results = [hit('client', limit=3, window=60, now=1200.0 + i) for i in range(4)]
+        self.assertEqual([result.allowed for result in results], [True, True, True, False])
+        self.assertEqual(results[-1].reset_after, 57.0)
+        self.assertTrue(hit('client', limit=3, window=60, now=1260.0).allowed)
+        self.assertTrue(hit('other-client', limit=3, window=60, now=1203.0).allowed)
+
+    def test_sliding_window_weights_previous_bucket(self):
+        """The previous window counts in proportion to its overlap"""
+        for _ in range(10):
+            hit('client', limit=10, window=60, sliding=True, now=1200.0)
+
+        self.assertEqual(hit('client', limit=10, window=60, sliding=True, now=1275.0).count, 1 + 10 * 0.75)
+        self.assertTrue(hit('client', limit=10, window=60, sliding=True, now=1275.0).allowed)
+        self.assertFalse(hit('client', limit=10, window=60, sliding=True, now=1275.0).allowed)
+        # By the end of the window the previous bucket has almost no weight
+        self.assertTrue(hit('client', limit=10, window=60, sliding=True, now=1319.0).allowed)
+
+    def test_concurrent_hits_are_not_lost(self):
+        """Exactly ``limit`` of many concurrent hits are allowed"""
+        allowed = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(25):
+                result = hit('burst', limit=100, window=60, now=1200.0)
+                with lock:
+                    allowed.append(result.allowed)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(allowed), 200)
+        self.assertEqual(sum(allowed), 100)
@@ -0,0 +1,122 @@
+"""
+Tests for the incremental recalculation engine
+"""
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from ghg.factor_resolver import invalidate_factor_cache
+from ghg.models import EmissionRecord, RecalculationJob
+from ghg.models_emission_sources import (
+    EmissionCategory, EmissionFactorData, EmissionScope, EmissionSource,
+)
+from ghg.recalculation import affected_records, job_for_factor, run_recalculation_job
+
+
+class RecalculationJobTest(TestCase):
+    """Test run_recalculation_job"""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_factor_cache()
+        self.user = User.objects.create_user(username='recalc@example.com', password='TestPass123!')
+        scope = EmissionScope.objects.create(scope_number='1', name_en='Direct Emissions')
+        category = EmissionCategory.objects.create(scope=scope, code='stationary', name_en='Stationary')
+        source = EmissionSource.objects.create(category=category, code='coal', name_en='Coal', default_unit='kg')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.factor = EmissionFactorData.objects.create(
+                source=source, country_code='global', factor_value=3.0, unit='kg',
+                valid_from=date(2024, 1, 1), reference_source='Admin 2024',
+            )
+
+        # Stored with the old built-in factor (2.42 kg CO2e/kg)
+        self.records = [
+            self.make_record('coal', activity_date=date(2024, 1, 1) if i % 2 else date(2023, 6, 1))
+            for i in range(10)
+        ]
+        self.other = self.make_record('natural-gas', activity_date=date(2024, 6, 1), unit='bbl', factor=2.0)
+
+    def tearDown(self):
+        cache.clear()
+        invalidate_factor_cache()
+
+    def make_record(self, source, activity_date, unit='kg', factor=2.42):
+        return EmissionRecord.objects.create(
+            user=self.user, scope='1', category='stationary', source=source, source_name=source,
+            activity_data=100, unit=unit, emission_factor=factor, emissions_kg=100 * factor,
+            emissions_tons=100 * factor / 1000, activity_date=activity_date,
+        )
+
+    def test_only_affected_records_are_selected(self):
+        """Records are filtered by source and activity date range"""
+        job = job_for_factor(self.factor)
+        self.assertEqual(job.country, '')
+        self.assertEqual(affected_records(job).count(), 5)
+
+    def test_recalculation_updates_changed_records(self):
+        """Records in the factor's validity window get the new factor"""
+        job = run_recalculation_job(job_for_factor(self.factor), chunk_size=3)
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.records_checked, 5)
+        self.assertEqual(job.records_changed, 5)
+        self.assertAlmostEqual(job.emissions_delta_kg, 5 * 100 * (3.0 - 2.42))
+
+        updated = EmissionRecord.objects.filter(activity_date=date(2024, 1, 1))
+        self.assertEqual({r.emission_factor for r in updated}, {3.0})
+        self.assertEqual({r.emissions_kg for r in updated}, {300.0})
+        self.assertEqual({r.reference for r in updated}, {'Admin 2024'})
+        untouched = EmissionRecord.objects.filter(activity_date=date(2023, 6, 1))
+        self.assertEqual({r.emission_factor for r in untouched}, {2.42})
+
+        # A second run finds nothing left to change
+        rerun = run_recalculation_job(job_for_factor(self.factor))
+        self.assertEqual(rerun.records_changed, 0)
+
+    def test_dry_run_reports_without_writing(self):
+        """Dry runs only collect the diff"""
+        job = run_recalculation_job(job_for_factor(self.factor, dry_run=True))
+
+        self.assertEqual(job.records_changed, 5)
+        self.assertEqual(len(job.report), 5)
+        self.assertEqual(job.report[0]['new_factor'], 3.0)
+        self.assertFalse(EmissionRecord.objects.filter(emission_factor=3.0).exists())
+
+    def test_resume_from_checkpoint(self):
+        """An interrupted job continues after its last processed record"""
+        job = run_recalculation_job(job_for_factor(self.factor), chunk_size=2, max_chunks=1)
+        self.assertEqual(job.status, 'running')
+        self.assertEqual(job.records_checked, 2)
+        checkpoint = job.last_record_id
+
+        job = RecalculationJob.objects.get(pk=job.pk)
+        run_recalculation_job(job, chunk_size=2)
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.records_checked, 5)
+        self.assertGreater(job.last_record_id, checkpoint)
+        self.assertEqual(EmissionRecord.objects.filter(emission_factor=3.0).count(), 5)
+
+    def test_unresolvable_records_are_skipped(self):
+        """Records whose source is unknown or whose unit changed are left alone"""
+        job = run_recalculation_job(RecalculationJob.objects.create(category='stationary'))
+
+        self.assertEqual(job.records_checked, 11)
+        self.assertEqual(job.records_skipped, 1)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.emission_factor, 2.0)
+
+    def test_management_command(self):
+        """The command creates and runs a job"""
+        out = StringIO()
+        call_command(
+            'recalculate_emissions', '--category', 'stationary', '--source', 'coal',
+            '--from', '2024-01-01', '--dry-run', stdout=out,
+        )
+
+        self.assertIn('would change 5 records', out.getvalue())
+        self.assertEqual(RecalculationJob.objects.get().status, 'completed')
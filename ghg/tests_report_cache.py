@@ -0,0 +1,158 @@
+"""
+Tests for the rendered report cache
+"""
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ghg.factor_resolver import invalidate_factor_cache
+from ghg.models import EmissionRecord, ReportJob
+from ghg.report_cache import ReportCache, render_report
+from ghg.report_jobs import claim_next_job, enqueue_report, run_report_job
+
+
+class ReportCacheEvictionTest(SimpleTestCase):
+    """Test the byte budget and least-recently-used eviction"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ReportCache(self.directory.name, max_bytes=250)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def put(self, key, mtime):
+        with tempfile.NamedTemporaryFile(dir=self.directory.name, delete=False) as source:
+            source.write(b'x' * 100)
+        with self.cache.put(key, source.name, f'{key}.pdf') as report:
+            os.utime(report.name, (mtime, mtime))
+
+    def test_least_recently_used_is_evicted(self):
+        self.put('aa1', 1000)
+        self.put('bb2', 2000)
+        self.assertEqual(self.cache.size(), 200)
+
+        # Reading an entry makes it the most recently used
+        report, filename = self.cache.get('aa1')
+        report.close()
+        self.assertEqual(filename, 'aa1.pdf')
+
+        self.put('cc3', 3000)
+        self.assertIsNotNone(self.cache.get('aa1'))
+        self.assertIsNone(self.cache.get('bb2'))
+        self.assertEqual(self.cache.size(), 200)
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'bb', 'bb2')))
+
+    def test_oversized_report_is_still_served(self):
+        """A report over the whole budget is served once and not kept"""
+        self.cache.max_bytes = 4
+        with tempfile.NamedTemporaryFile(dir=self.directory.name, delete=False) as source:
+            source.write(b'%PDF-1.4')
+        with self.cache.put('dd4', source.name, 'big.pdf') as report:
+            self.assertEqual(report.read(), b'%PDF-1.4')
+        self.assertEqual(self.cache.size(), 0)
+        self.assertIsNone(self.cache.get('dd4'))
+
+
+class RenderReportTest(TestCase):
+    """Test that reports are rendered once per data fingerprint"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cache@example.com', 'cache@example.com', 'TestPass123!')
+        self.record(scope='1')
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            REPORT_CACHE_ROOT=os.path.join(self.directory.name, 'cache'),
+            REPORT_JOB_ROOT=os.path.join(self.directory.name, 'reports'),
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.directory.cleanup()
+        cache.clear()
+
+    def record(self, scope):
+        return EmissionRecord.objects.create(
+            user=self.user, scope=scope, category='stationary', source='natural-gas',
+            source_name='Natural Gas', activity_data=10, unit='m3', emission_factor=2.0,
+            emissions_kg=20.0, emissions_tons=0.02,
+        )
+
+    def render(self, params):
+        """(report bytes, number of queries it took)"""
+        with CaptureQueriesContext(connection) as queries:
+            report, filename = render_report('emissions_pdf', self.user, params)
+        with report:
+            return report.read(), len(queries)
+
+    def test_repeat_downloads_come_from_disk(self):
+        """A hit costs one aggregate query; only changes inside the filters render again"""
+        first, queries = self.render({'scope': '1'})
+        self.assertTrue(first.startswith(b'%PDF'))
+        self.assertGreater(queries, 1)
+        self.assertEqual(self.render({'scope': '1'}), (first, 1))
+
+        # Records outside the report's filters keep it cached
+        self.record(scope='2')
+        self.assertEqual(self.render({'scope': '1'})[1], 1)
+
+        # New, edited or deleted records in the report render it again
+        record = self.record(scope='1')
+        self.assertGreater(self.render({'scope': '1'})[1], 1)
+        record.activity_data = 20
+        record.save()
+        self.assertGreater(self.render({'scope': '1'})[1], 1)
+        EmissionRecord.objects.filter(scope='1').order_by('pk').first().delete()
+        self.assertGreater(self.render({'scope': '1'})[1], 1)
+        self.assertEqual(self.render({'scope': '1'})[1], 1)
+
+        # Other filters are other reports
+        self.assertGreater(self.render({'scope': '2'})[1], 1)
+
+    def test_factor_changes_render_again(self):
+        self.render({})
+        self.assertEqual(self.render({})[1], 1)
+        invalidate_factor_cache()
+        self.assertGreater(self.render({})[1], 1)
+
+    def test_next_day_renders_again(self):
+        """Reports carry their render date, so a cached one is only served on that day"""
+        self.render({})
+        self.assertEqual(self.render({})[1], 1)
+        with mock.patch('ghg.report_cache.date') as today:
+            today.today.return_value = date.today() + timedelta(days=1)
+            self.assertGreater(self.render({})[1], 1)
+            self.assertEqual(self.render({})[1], 1)
+
+    def test_report_views_serve_only_cached_reports(self):
+        """A miss queues a report job (202); once rendered, the view serves it from the cache"""
+        self.client.force_login(self.user)
+        url = reverse('ghg:generate_pdf_report')
+        response = self.client.get(url, {'scope': '1'})
+        self.assertEqual(response.status_code, 202)
+        job = ReportJob.objects.get(pk=response.json()['id'])
+        self.assertEqual(self.client.get(url, {'scope': '1'}).json()['id'], job.pk)
+
+        run_report_job(claim_next_job())
+        response = self.client.get(url, {'scope': '1'})
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_cached_report_jobs_complete_when_queued(self):
+        self.client.force_login(self.user)
+        self.render({'scope': '1'})
+
+        job = enqueue_report(self.user, 'emissions_pdf', {'scope': '1'})
+        self.assertEqual(job.status, 'completed')
+        response = self.client.get(reverse('ghg:report_job_download', args=[job.download_token]))
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
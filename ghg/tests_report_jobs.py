@@ -0,0 +1,204 @@
+"""
+Tests for background report jobs
+"""
+import os
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from ghg.models import EmissionRecord, ReportJob
+from ghg import report_jobs
+from ghg.report_jobs import (
+    ReportQueueFull, claim_next_job, enqueue_report, job_file_path, purge_expired_jobs, requeue_stale_jobs,
+    run_report_job, touch_job,
+)
+
+
+class ReportJobTest(TestCase):
+    """Test queueing, rendering and downloading reports"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reports@example.com', 'reports@example.com', 'TestPass123!')
+        for index in range(3):
+            EmissionRecord.objects.create(
+                user=self.user, scope='1', category='stationary', source='natural-gas',
+                source_name='Natural Gas', activity_data=index + 1, unit='m3', emission_factor=2.0,
+                emissions_kg=2.0 * (index + 1), emissions_tons=0.002 * (index + 1),
+            )
+        self.client.force_login(self.user)
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = override_settings(
+            REPORT_JOB_ROOT=os.path.join(self.directory.name, 'reports'),
+            REPORT_CACHE_ROOT=os.path.join(self.directory.name, 'cache'),
+        )
+        self.root.enable()
+
+    def tearDown(self):
+        self.root.disable()
+        self.directory.cleanup()
+        cache.clear()
+
+    def run_worker(self):
+        call_command('run_report_worker', '--once', stdout=StringIO())
+
+    def test_queue_render_and_download(self):
+        """The web tier only queues; the worker renders; the file is served by token"""
+        with self.assertNumQueries(6):
+            response = self.client.post(reverse('ghg:report_job_create'), {'kind': 'emissions_pdf', 'scope': '1'})
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        self.assertEqual((data['status'], data['download_url']), ('pending', None))
+        job = ReportJob.objects.get(pk=data['id'])
+        self.assertEqual(job.params, {'scope': '1'})
+
+        # The same report is not queued twice
+        response = self.client.post(reverse('ghg:report_job_create'), {'kind': 'emissions_pdf', 'scope': '1'})
+        self.assertEqual(response.json()['id'], job.pk)
+
+        self.run_worker()
+        data = self.client.get(data['status_url']).json()
+        self.assertEqual((data['status'], data['progress']), ('completed', 100))
+        self.assertTrue(data['filename'].startswith('emissions_inventory_'))
+
+        response = self.client.get(data['download_url'])
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+        # Neither the status nor the file is visible to other users
+        other = User.objects.create_user('other@example.com', 'other@example.com', 'TestPass123!')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(data['status_url']).status_code, 404)
+        self.assertEqual(self.client.get(data['download_url']).status_code, 404)
+
+    def test_xlsx_job_matches_direct_export(self):
+        job = enqueue_report(self.user, 'emission_report_xlsx', {'scope': 'scope1'})
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertTrue(job.filename.startswith('Scope_1_Direct_Emissions_Report_'))
+        with open(job_file_path(job), 'rb') as f:
+            sheet = load_workbook(BytesIO(f.read())).active
+        self.assertIn('Summary: 3 records | Total Emissions: 12.00 kg CO2e', sheet['A4'].value)
+
+    def test_failed_job(self):
+        """A renderer error fails the job without leaving a file behind"""
+        # Rejected when queued, but a job's data can change before it runs
+        with self.assertRaises(ValueError):
+            enqueue_report(self.user, 'emissions_analysis_xlsx', {'date_from': 'not-a-date'})
+        ReportJob.objects.create(created_by=self.user, kind='emission_report_xlsx', params={'scope': 'scope9x'})
+        job = run_report_job(claim_next_job())
+        self.assertEqual(job.status, 'failed')
+        self.assertIn("'9x'", job.error)
+        self.assertEqual([files for _, _, files in os.walk(self.directory.name) if files], [])
+
+        data = self.client.get(reverse('ghg:report_job_status', args=[job.pk])).json()
+        self.assertEqual(data['error'], 'The report could not be generated')
+
+    def test_queue_limits(self):
+        response = self.client.post(reverse('ghg:report_job_create'), {'kind': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+
+        with override_settings(REPORT_JOB_MAX_ACTIVE_PER_USER=2):
+            enqueue_report(self.user, 'emissions_pdf', {'scope': '1'})
+            enqueue_report(self.user, 'emissions_pdf', {'scope': '2'})
+            with self.assertRaises(ReportQueueFull):
+                enqueue_report(self.user, 'emissions_pdf', {'scope': '3'})
+            response = self.client.post(reverse('ghg:report_job_create'), {'kind': 'inventory_pdf'})
+            self.assertEqual(response.status_code, 429)
+
+    def test_claim_is_exclusive(self):
+        first = enqueue_report(self.user, 'emissions_pdf', {})
+        second = enqueue_report(self.user, 'inventory_pdf', {})
+        self.assertEqual(claim_next_job().pk, first.pk)
+        self.assertEqual(claim_next_job().pk, second.pk)
+        self.assertIsNone(claim_next_job())
+
+    def test_stale_jobs_are_requeued_then_failed(self):
+        job = enqueue_report(self.user, 'emissions_pdf', {})
+        claim_next_job()
+        stale = timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_SECONDS + 1)
+        ReportJob.objects.filter(pk=job.pk).update(updated_at=stale)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+
+        ReportJob.objects.filter(pk=job.pk).update(
+            status='running', attempts=settings.REPORT_JOB_MAX_ATTEMPTS, updated_at=stale
+        )
+        requeue_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_heartbeat_keeps_rendering_jobs_claimed(self):
+        """A job whose worker is alive is never requeued; a lost claim stops the heartbeat"""
+        job = enqueue_report(self.user, 'emissions_pdf', {})
+        claimed = claim_next_job()
+        stale = timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_SECONDS + 1)
+        ReportJob.objects.filter(pk=job.pk).update(updated_at=stale)
+        self.assertTrue(touch_job(claimed))
+        self.assertEqual(requeue_stale_jobs(), 0)
+
+        # Requeued and claimed again: the first claim no longer holds
+        ReportJob.objects.filter(pk=job.pk).update(updated_at=stale)
+        requeue_stale_jobs()
+        self.assertEqual(claim_next_job().attempts, 2)
+        self.assertFalse(touch_job(claimed))
+
+    def test_lost_claim_cannot_complete_or_fail_the_job(self):
+        """A worker whose job was requeued and claimed again leaves it (and its file) to the new worker"""
+        job = enqueue_report(self.user, 'emissions_pdf', {})
+        first = claim_next_job()
+        stale = timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_SECONDS + 1)
+        ReportJob.objects.filter(pk=job.pk).update(updated_at=stale)
+        requeue_stale_jobs()
+        second = claim_next_job()
+
+        self.assertEqual(run_report_job(first).status, 'running')
+        self.assertEqual(os.listdir(report_jobs.report_root()), [])
+
+        with mock.patch.object(report_jobs, 'render_report', side_effect=RuntimeError('boom')):
+            self.assertEqual(run_report_job(first).status, 'running')
+
+        run_report_job(second)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('completed', 2))
+        self.assertEqual(os.listdir(report_jobs.report_root()), [job.file_name])
+
+    def test_heartbeat_runs_while_rendering(self):
+        render = report_jobs.render_report
+
+        def slow_render(*args):
+            time.sleep(0.2)
+            return render(*args)
+
+        enqueue_report(self.user, 'emissions_pdf', {})
+        with mock.patch.object(report_jobs, 'HEARTBEAT_INTERVAL', 0.02), \
+                mock.patch.object(report_jobs, 'render_report', slow_render), \
+                mock.patch.object(report_jobs, 'touch_job', return_value=True) as touch:
+            job = run_report_job(claim_next_job())
+        self.assertEqual(job.status, 'completed')
+        self.assertGreater(touch.call_count, 1)
+
+    def test_expired_jobs_are_purged(self):
+        enqueue_report(self.user, 'emissions_pdf', {})
+        job = run_report_job(claim_next_job())
+        path = job_file_path(job)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(purge_expired_jobs(), 0)
+
+        expired = timezone.now() - timedelta(hours=settings.REPORT_JOB_RETENTION_HOURS + 1)
+        ReportJob.objects.filter(pk=job.pk).update(completed_at=expired)
+        self.assertEqual(purge_expired_jobs(), 1)
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,188 @@
+"""
+Tests for the incrementally maintained monthly emission rollups
+"""
+import json
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ghg.dashboard_services import get_dashboard_metrics
+from ghg.data_version import get_data_version
+from ghg.models import EmissionRecord, EmissionRollup, Supplier
+from ghg.rollups import aggregate_emissions, rebuild_rollups
+
+
+def rollup_rows(user):
+    return sorted(
+        EmissionRollup.objects.filter(user=user).values_list(
+            'month', 'scope', 'category', 'source_name', 'country', 'sum_kg', 'count'
+        )
+    )
+
+
+class EmissionRollupTest(TestCase):
+    """Test rollup maintenance and rollup-backed reads"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='rollup@example.com', email='rollup@example.com', password='TestPass123!'
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def create_record(self, scope='1', category='stationary', source_name='Coal', kg=1000.0, **kwargs):
+        return EmissionRecord.objects.create(
+            user=self.user, scope=scope, category=category, source=source_name.lower(),
+            source_name=source_name, activity_data=1, unit='kg', emission_factor=kg,
+            emissions_kg=kg, emissions_tons=kg / 1000, **kwargs,
+        )
+
+    def test_signals_maintain_rollups(self):
+        """Creates, updates and deletes move emissions between rollup rows"""
+        first = self.create_record(kg=1000.0)
+        self.create_record(kg=500.0)
+        rollup = EmissionRollup.objects.get(user=self.user)
+        self.assertEqual((rollup.sum_kg, rollup.count), (1500.0, 2))
+
+        first.emissions_kg = 1200.0
+        first.save()
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.sum_kg, rollup.count), (1700.0, 2))
+
+        first.scope = '2'
+        first.category = 'electricity'
+        first.save()
+        self.assertEqual(
+            [(row[1], row[5], row[6]) for row in rollup_rows(self.user)],
+            [('1', 500.0, 1), ('2', 1200.0, 1)],
+        )
+
+        first.delete()
+        self.assertEqual([(row[1], row[5], row[6]) for row in rollup_rows(self.user)], [('1', 500.0, 1)])
+
+    def test_bulk_endpoint_and_rebuild_match(self):
+        """Bulk-created records are rolled up like a rebuild from scratch"""
+        self.client.force_login(self.user)
+        items = [
+            {'category': 'stationary', 'source': 'coal', 'activity_data': 10},
+            {'category': 'stationary', 'source': 'coal', 'activity_data': 5},
+            {'category': 'electricity', 'source': 'grid-average', 'activity_data': 100},
+        ]
+        response = self.client.post(
+            reverse('ghg:calculate_emission_bulk'), json.dumps({'items': items}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        incremental = rollup_rows(self.user)
+        self.assertEqual(sum(row[6] for row in incremental), 3)
+        rebuild_rollups(self.user)
+        self.assertEqual(rollup_rows(self.user), incremental)
+
+    def test_partial_months_match_raw_aggregation(self):
+        """Ranges that start or end mid-month add raw records to whole months"""
+        for day, scope, kg in (
+            ((2025, 1, 10), '1', 100.0), ((2025, 1, 31), '2', 200.0),
+            ((2025, 2, 14), '1', 400.0), ((2025, 3, 1), '3', 800.0), ((2025, 3, 20), '1', 1600.0),
+        ):
+            record = self.create_record(scope=scope, kg=kg)
+            EmissionRecord.objects.filter(pk=record.pk).update(
+                created_at=datetime(*day, 12, tzinfo=dt_timezone.utc)
+            )
+        call_command('rebuild_emission_rollups', user='rollup@example.com', stdout=StringIO())
+
+        for date_from, date_to in (
+            (None, None), (date(2025, 1, 15), None), (None, date(2025, 3, 10)),
+            (date(2025, 1, 31), date(2025, 3, 1)), (date(2025, 2, 1), date(2025, 2, 28)),
+            (date(2025, 3, 5), date(2025, 3, 25)),
+        ):
+            raw = EmissionRecord.objects.filter(user=self.user)
+            if date_from:
+                raw = raw.filter(created_at__date__gte=date_from)
+            if date_to:
+                raw = raw.filter(created_at__date__lte=date_to)
+            expected = {
+                row['scope']: (row['sum_kg'], row['count'])
+                for row in raw.values('scope').annotate(sum_kg=Sum('emissions_kg'), count=Count('id'))
+            }
+            rows = aggregate_emissions(self.user, ('scope',), date_from=date_from, date_to=date_to)
+            self.assertEqual(
+                {row['scope']: (row['sum_kg'], row['count']) for row in rows}, expected, (date_from, date_to)
+            )
+
+    def test_admin_data_deletion_does_not_grow_with_records(self):
+        """Deleting a user's data rebuilds their rollups and bumps their version once"""
+        admin = User.objects.create_user(username='admin@example.com', password='TestPass123!', is_staff=True)
+        self.client.force_login(admin)
+        url = reverse('ghg:admin_delete_user_data', args=[self.user.pk])
+        counts = []
+        for records in (2, 20):
+            for _ in range(records):
+                self.create_record(kg=10.0)
+            supplier = Supplier.objects.create(user=self.user, name='Supplier')
+            self.create_record(kg=5.0, supplier=supplier)
+            version = get_data_version(self.user)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url)
+            counts.append(len(queries))
+
+            self.assertEqual(response.json()['deleted_counts']['emissions'], records + 1)
+            self.assertFalse(EmissionRecord.objects.filter(user=self.user).exists())
+            self.assertEqual(rollup_rows(self.user), [])
+            self.assertEqual(get_data_version(self.user), version + 1)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_dashboard_queries_do_not_grow_with_records(self):
+        """Dashboard metrics read rollups instead of scanning records"""
+        self.create_record(kg=100.0)
+        self.create_record(scope='2', category='electricity', source_name='Grid', kg=300.0)
+        with self.assertNumQueries(4):
+            metrics = get_dashboard_metrics(self.user)
+        for _ in range(20):
+            self.create_record(kg=10.0)
+        with self.assertNumQueries(4):
+            metrics = get_dashboard_metrics(self.user)
+
+        self.assertEqual(metrics['total_records'], 22)
+        self.assertAlmostEqual(metrics['total_emissions_tons'], 0.6)
+        self.assertEqual(metrics['scope_breakdown'][0]['scope'], 'Scope 1')
+        self.assertEqual(len(metrics['monthly_trends']), 1)
+
+    def test_dashboard_api_query_budget(self):
+        """The dashboard payload is a fixed number of queries"""
+        this_month = timezone.localdate().replace(day=1)
+        last_month = (this_month - timedelta(days=1)).replace(day=1)
+        for _ in range(3):
+            self.create_record(kg=1000.0)
+        old = self.create_record(kg=3000.0)
+        EmissionRecord.objects.filter(pk=old.pk).update(
+            created_at=datetime.combine(last_month, time(12), tzinfo=dt_timezone.utc)
+        )
+        rebuild_rollups(self.user)
+        self.client.force_login(self.user)
+
+        # session + user, data version, four for the metrics, one for the last six months
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('ghg:dashboard_api'))
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['total_records'], 4)
+        self.assertEqual(data['current_month_tons'], 3.0)
+        self.assertEqual(data['emissions_change_pct'], 0.0)
+        self.assertEqual(data['records_change_pct'], 200.0)
+        self.assertEqual(
+            [month['month'] for month in data['monthly_trends'][-2:]],
+            [last_month.strftime('%b %Y'), this_month.strftime('%b %Y')],
+        )
+        self.assertEqual(len(data['monthly_trends']), 6)
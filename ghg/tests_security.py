@@ -1,10 +1,17 @@
 """
-Tests for security features (Account Lockout)
+Tests for security features (Account Lockout, WAF)
 """
-from django.test import TestCase, Client
+import json
+from unittest import mock
+from django.test import TestCase, Client, RequestFactory, SimpleTestCase
 from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
 from django.urls import reverse
+from ghg.arcjet_simulation import WAF_MAX_BODY_BYTES, ArcjetSimulator, arcjet_protect
+from ghg.middleware import SecurityPipelineMiddleware
 from ghg.security import AccountLockout
+from ghg.security_context import SecurityContext, _AllowedRequestLog
 from django.core.cache import cache
 
 
@@ -121,3 +128,128 @@ class AccountLockoutTest(TestCase):
         remaining = AccountLockout.get_lockout_time_remaining(self.test_email)
         self.assertGreater(remaining, 0)
         self.assertLessEqual(remaining, 30 * 60)  # Max 30 minutes
+
+
+class WafMatcherTest(SimpleTestCase):
+    """Test the ArcjetSimulator WAF matcher"""
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.simulator = ArcjetSimulator()
+    
+    def test_detects_attacks_in_path_query_and_body(self):
+        """Every pattern is still matched, case-insensitively"""
+        self.assertTrue(self.simulator.is_attack(self.factory.get('/en/../../ETC/PASSWD')))
+        self.assertTrue(self.simulator.is_attack(self.factory.get('/en/', {'q': "1 UNION ALL SELECT pw"})))
+        self.assertTrue(self.simulator.is_attack(
+            self.factory.post('/en/api/', '{"a": "<Script>alert(1)</script>"}', content_type='application/json')
+        ))
+        self.assertFalse(self.simulator.is_attack(
+            self.factory.get('/en/api/dashboard/', {'from': '2025-01-01', 'scopes': '1,2'})
+        ))
+        # Parts are scanned separately: "union" in the path and "select" in the query do not match
+        self.assertFalse(self.simulator.is_attack(self.factory.get('/en/union/', {'q': 'select'})))
+    
+    def test_body_budget_and_file_uploads(self):
+        """Bodies are scanned up to the byte budget; multipart uploads are skipped"""
+        padding = 'x' * WAF_MAX_BODY_BYTES
+        self.assertFalse(self.simulator.is_attack(
+            self.factory.post('/en/api/', padding + '<script>', content_type='text/plain')
+        ))
+        upload = SimpleUploadedFile('data.csv', b'name\n<script>alert(1)</script>\n', content_type='text/csv')
+        self.assertFalse(self.simulator.is_attack(self.factory.post('/en/import/', {'file': upload})))
+
+
+
+class SecurityPipelineTest(SimpleTestCase):
+    """Test the consolidated security middleware"""
+    
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.seen = []
+        self.middleware = SecurityPipelineMiddleware(self.view)
+    
+    def tearDown(self):
+        cache.clear()
+    
+    def view(self, request):
+        self.seen.append(request.security)
+        return HttpResponse('ok')
+    
+    def test_allowed_request_gets_context_and_headers(self):
+        """Views see the parsed context; responses carry the security headers"""
+        request = self.factory.get('/en/Dashboard/', HTTP_USER_AGENT='Mozilla/5.0', HTTP_X_FORWARDED_FOR='203.0.113.7, 10.0.0.1')
+        response = self.middleware(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.seen, [SecurityContext(ip='203.0.113.7', path='/en/dashboard/', user_agent='mozilla/5.0')])
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertIn("default-src 'self'", response['Content-Security-Policy'])
+    
+    def test_denials_stop_the_pipeline(self):
+        """Bots and attacks are refused before the view, still with headers"""
+        bot = self.middleware(self.factory.get('/en/', HTTP_USER_AGENT='ExampleBot/1.0'))
+        attack = self.middleware(self.factory.get('/en/', {'q': 'union select'}))
+        self.assertEqual((bot.status_code, attack.status_code), (403, 403))
+        self.assertIn('X-Content-Type-Options', attack)
+        self.assertEqual(self.seen, [])
+        # Admin and static paths skip the Arcjet checks
+        self.assertEqual(self.middleware(self.factory.get('/admin/', HTTP_USER_AGENT='ExampleBot/1.0')).status_code, 200)
+    
+    def test_rate_limits(self):
+        """The per-path Arcjet limit answers 429, the global limit 403"""
+        limit = ArcjetSimulator.RATE_LIMITS['/signup/']['max']
+        for _ in range(limit):
+            self.middleware(self.factory.get('/en/signup/'))
+        response = self.middleware(self.factory.get('/en/signup/'))
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(json.loads(response.content)['retry_after'], 0)
+        
+        # The 429 stopped before the global limit was counted
+        for _ in range(100 - limit):
+            self.assertEqual(self.middleware(self.factory.get('/en/')).status_code, 200)
+        self.assertEqual(self.middleware(self.factory.get('/en/')).status_code, 403)
+    
+    def test_allowed_requests_are_logged_as_summaries(self):
+        """One INFO line per ALLOWED_LOG_EVERY allowed requests"""
+        self.middleware.allowed_log = _AllowedRequestLog(3)
+        with self.assertLogs('ghg.security', level='INFO') as logs:
+            for _ in range(7):
+                self.middleware(self.factory.get('/en/'))
+        summaries = [line for line in logs.output if 'requests allowed' in line]
+        self.assertEqual(len(summaries), 2)
+    
+    def test_decorated_views_reuse_the_pipeline_decision(self):
+        """arcjet_protect does not check or count a request the pipeline allowed"""
+        protected = SecurityPipelineMiddleware(arcjet_protect()(self.view))
+        limit = ArcjetSimulator.RATE_LIMITS['/signup/']['max']
+        for _ in range(limit):
+            self.assertEqual(protected(self.factory.get('/en/signup/')).status_code, 200)
+        self.assertEqual(protected(self.factory.get('/en/signup/')).status_code, 429)
+        
+        # Without the middleware the decorator runs the checks itself
+        view = arcjet_protect()(lambda request: HttpResponse('ok'))
+        self.assertEqual(view(self.factory.get('/en/', HTTP_USER_AGENT='ExampleBot/1.0')).status_code, 403)
+        with self.assertNoLogs('ghg.arcjet_simulation', level='INFO'):
+            self.assertEqual(view(self.factory.get('/en/')).status_code, 200)
+    
+    def test_no_decision_when_arcjet_rules_did_not_run(self):
+        """Disabled or failed Arcjet rules leave the decorated views to check for themselves"""
+        decisions = []
+        
+        def view(request):
+            decisions.append(getattr(request, 'security_decision', None))
+            return HttpResponse('ok')
+        
+        disabled = SecurityPipelineMiddleware(arcjet_protect()(view))
+        disabled.arcjet_enabled = False
+        self.assertEqual(disabled(self.factory.get('/en/', HTTP_USER_AGENT='ExampleBot/1.0')).status_code, 403)
+        self.assertEqual(disabled(self.factory.get('/en/')).status_code, 200)
+        
+        with mock.patch('ghg.middleware.hit', side_effect=ConnectionError('cache down')):
+            with self.assertLogs('ghg.security', level='ERROR'):
+                self.assertEqual(SecurityPipelineMiddleware(view)(self.factory.get('/en/')).status_code, 200)
+        self.assertEqual(decisions, [None, None])
+        
+        SecurityPipelineMiddleware(view)(self.factory.get('/en/'))
+        self.assertTrue(decisions[-1].allowed)
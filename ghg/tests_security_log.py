@@ -0,0 +1,102 @@
+"""
+Tests for the indexed security log reader
+"""
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ghg.security_log import SecurityLog
+
+
+def _line(number, level='INFO', event=None):
+    message = f'SECURITY EVENT: {event} | Identifier: user{number}' if event else f'message {number}'
+    return f'SECURITY {level} 2026-01-01 12:00:00,000 security {message}\n'
+
+
+class SecurityLogTest(SimpleTestCase):
+    """Test paging, filtering and rotation of SecurityLog"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'security.log')
+        self.log = SecurityLog(self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, lines, path=None, mode='a'):
+        with open(path or self.path, mode) as f:
+            f.writelines(lines)
+
+    def test_pages_are_newest_first(self):
+        """Any page is read directly; lines appended later are picked up"""
+        self.write([_line(number) for number in range(120)])
+        page = Paginator(self.log.lines(), 50).get_page(3)
+        self.assertEqual(page.paginator.count, 120)
+        self.assertEqual(list(page)[0], _line(19).strip())
+        self.assertEqual(list(page)[-1], _line(0).strip())
+
+        # A partial line is only indexed once its newline is written
+        self.write(['SECURITY WARNING 2026-01-01 12:00:00,000 middleware partial'])
+        self.assertEqual(len(self.log.lines()), 120)
+        self.write([' line\n'])
+        self.assertEqual(self.log.lines()[0:1], ['SECURITY WARNING 2026-01-01 12:00:00,000 middleware partial line'])
+
+    def test_filters_by_level_and_event(self):
+        """Level and event filters combine"""
+        self.write([
+            _line(1, 'WARNING'),
+            _line(2, 'INFO', 'login_failed'),
+            _line(3, 'WARNING', 'account_locked'),
+            _line(4, 'INFO', 'login_success'),
+            _line(5, 'WARNING', 'login_failed'),
+        ])
+        self.assertEqual(len(self.log.lines(level='WARNING')), 3)
+        self.assertEqual(len(self.log.lines(event='login_failed')), 2)
+        self.assertEqual(self.log.lines(level='WARNING', event='login_failed')[:], [_line(5, 'WARNING', 'login_failed').strip()])
+        self.assertEqual(len(self.log.lines(level='ERROR')), 0)
+        self.assertEqual(self.log.event_types(), ['account_locked', 'login_failed', 'login_success'])
+
+    def test_rotated_backups_follow_the_current_file(self):
+        """After rotation, paging continues from the current file into the backups"""
+        self.write([_line(number) for number in range(30)])
+        self.assertEqual(len(self.log.lines()), 30)
+        os.rename(self.path, f'{self.path}.1')
+        self.write([_line(number) for number in range(30, 40)])
+
+        lines = self.log.lines()
+        self.assertEqual(len(lines), 40)
+        self.assertEqual(lines[9:11], [_line(30).strip(), _line(29).strip()])
+        self.assertEqual(lines[-1], _line(0).strip())
+
+        # Truncated in place (e.g. by logrotate copytruncate)
+        self.write([_line(99)], mode='w')
+        self.assertEqual(self.log.lines()[0], _line(99).strip())
+        self.assertEqual(len(self.log.lines()), 31)
+
+
+class SecurityLogViewTest(TestCase):
+    """Test the admin security log page"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin@example.com', 'admin@example.com', 'AdminPass123!', is_staff=True)
+        self.client.force_login(self.admin)
+        self.directory = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.directory.name, 'logs'))
+        with open(os.path.join(self.directory.name, 'logs', 'security.log'), 'w') as f:
+            f.writelines([_line(1, 'WARNING'), _line(2, 'INFO', 'login_failed')])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_filtered_page(self):
+        with override_settings(BASE_DIR=self.directory.name):
+            response = self.client.get(reverse('ghg:admin_security_logs'), {'event': 'login_failed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_logs'], 1)
+        self.assertContains(response, 'SECURITY EVENT: login_failed')
+        self.assertNotContains(response, 'message 1')
@@ -0,0 +1,126 @@
+"""
+Tests for Monte Carlo uncertainty propagation
+"""
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ghg.factor_resolver import invalidate_factor_cache
+from ghg.models import EmissionRecord
+from ghg.models_emission_sources import (
+    EmissionCategory, EmissionFactorData, EmissionScope, EmissionSource,
+)
+from ghg.report_jobs import claim_next_job, run_report_job
+from ghg.reporting.services import InventoryFilters, compute_inventory_summary
+from ghg.uncertainty import cached_inventory_uncertainty, inventory_uncertainty, propagate_uncertainty
+
+
+class PropagateUncertaintyTest(SimpleTestCase):
+    """Test the sampling engine"""
+
+    def test_single_record_matches_analytical_combination(self):
+        """Independent factor and activity errors combine in quadrature"""
+        result = propagate_uncertainty([1000.0], ['1'], ['f'], [10.0], [5.0], samples=100000)
+
+        self.assertAlmostEqual(result['total']['mean_t'], 1.0, places=2)
+        self.assertAlmostEqual(result['total']['uncertainty_percent'], (10 ** 2 + 5 ** 2) ** 0.5, delta=0.5)
+        self.assertLess(result['total']['lower_t'], 1.0)
+        self.assertGreater(result['total']['upper_t'], 1.0)
+
+    def test_shared_factors_are_correlated(self):
+        """Records sharing a factor do not average out its uncertainty"""
+        values = [100.0] * 100
+        shared = propagate_uncertainty(values, ['1'] * 100, ['f'] * 100, [20.0] * 100, [0.0] * 100, samples=5000)
+        independent = propagate_uncertainty(values, ['1'] * 100, range(100), [20.0] * 100, [0.0] * 100, samples=5000)
+
+        self.assertAlmostEqual(shared['total']['uncertainty_percent'], 20.0, delta=1.0)
+        self.assertAlmostEqual(independent['total']['uncertainty_percent'], 2.0, delta=0.3)
+
+    def test_groups_chunking_and_seed(self):
+        """Groups sum to the total and chunked sampling is reproducible"""
+        args = ([100.0, 200.0, 300.0, 400.0], ['1', '2', '1', '3'], ['a', 'b', 'a', 'c'], [10.0] * 4, [5.0] * 4)
+        result = propagate_uncertainty(*args, samples=2000, chunk_elements=10)
+
+        self.assertEqual(sorted(result['groups']), ['1', '2', '3'])
+        self.assertAlmostEqual(
+            sum(group['mean_t'] for group in result['groups'].values()), result['total']['mean_t']
+        )
+        self.assertEqual(result, propagate_uncertainty(*args, samples=2000, chunk_elements=10))
+        self.assertEqual(propagate_uncertainty([], [], [], [], [])['samples'], 0)
+
+
+class InventoryUncertaintyTest(TestCase):
+    """Test uncertainty in inventory summaries and reports"""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_factor_cache()
+        self.user = User.objects.create_user(username='mc@example.com', password='TestPass123!')
+        scope = EmissionScope.objects.create(scope_number='1', name_en='Direct Emissions')
+        category = EmissionCategory.objects.create(scope=scope, code='stationary', name_en='Stationary')
+        source = EmissionSource.objects.create(category=category, code='coal', name_en='Coal', default_unit='kg')
+        with self.captureOnCommitCallbacks(execute=True):
+            EmissionFactorData.objects.create(
+                source=source, country_code='global', factor_value=2.42, unit='kg',
+                uncertainty_percentage=40.0,
+            )
+        for scope_number, category_key, source_key in (
+            ('1', 'stationary', 'coal'),
+            ('2', 'electricity', 'grid-average'),
+        ):
+            EmissionRecord.objects.create(
+                user=self.user, scope=scope_number, category=category_key, source=source_key,
+                source_name=source_key, activity_data=1000, unit='kg', emission_factor=1.0,
+                emissions_kg=1000.0, emissions_tons=1.0, activity_date=date(2025, 1, 1),
+            )
+
+    def tearDown(self):
+        cache.clear()
+        invalidate_factor_cache()
+
+    def test_factor_uncertainty_comes_from_factor_data(self):
+        """Database factors use their uncertainty, built-in factors the default"""
+        result = inventory_uncertainty(EmissionRecord.objects.filter(user=self.user), samples=20000)
+
+        self.assertGreater(result['groups']['1']['uncertainty_percent'], 30)
+        self.assertLess(result['groups']['2']['uncertainty_percent'], 20)
+
+    def test_cached_uncertainty_follows_data_version(self):
+        """Repeat summaries reuse the sampled intervals until the records change"""
+        records = EmissionRecord.objects.filter(user=self.user)
+        first = cached_inventory_uncertainty(self.user, records, ['all'])
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_inventory_uncertainty(self.user, records, ['all']), first)
+
+        # Other filters are other entries
+        scope_1 = cached_inventory_uncertainty(self.user, records.filter(scope='1'), ['1'])
+        self.assertEqual(sorted(scope_1['groups']), ['1'])
+
+        EmissionRecord.objects.create(
+            user=self.user, scope='1', category='stationary', source='coal', source_name='coal',
+            activity_data=1000, unit='kg', emission_factor=1.0, emissions_kg=1000.0, emissions_tons=1.0,
+        )
+        changed = cached_inventory_uncertainty(self.user, records, ['all'])
+        self.assertAlmostEqual(changed['total']['mean_t'], first['total']['mean_t'] + 1.0, delta=0.1)
+
+    def test_summary_and_pdf_include_confidence_intervals(self):
+        """compute_inventory_summary and the PDF report show 95% intervals"""
+        summary = compute_inventory_summary(InventoryFilters(user=self.user))
+
+        self.assertEqual(summary['uncertainty']['confidence'], 95)
+        self.assertLess(summary['uncertainty']['lower_t'], summary['totals']['total_t'])
+        self.assertGreater(summary['uncertainty']['upper_t'], summary['totals']['total_t'])
+        for item in summary['by_scope']:
+            self.assertLess(item['lower_t'], item['value_t'])
+            self.assertGreater(item['upper_t'], item['value_t'])
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('ghg:generate_pdf_report'))
+        self.assertEqual(response.status_code, 202)
+        run_report_job(claim_next_job())
+        response = self.client.get(reverse('ghg:generate_pdf_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
@@ -0,0 +1,169 @@
+"""
+Tests for unit conversion of activity data
+"""
+import json
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ghg.emission_factors import calculate_emissions, calculate_emissions_batch
+from ghg.models import EmissionRecord
+from ghg.units import (
+    UnitConversionError,
+    conversion_factor,
+    conversion_factors,
+    convert,
+    fuel_for_source,
+    normalize_unit,
+)
+
+
+class UnitConversionTest(SimpleTestCase):
+    """Test the conversion matrix"""
+
+    def test_same_dimension_conversions(self):
+        """Scale conversions work for any spelling"""
+        self.assertEqual(normalize_unit(' Litres '), 'liters')
+        self.assertEqual(normalize_unit('m³'), 'm3')
+        self.assertEqual(normalize_unit('MWh'), 'mwh')
+        self.assertAlmostEqual(convert(1, 'MWh', 'gj'), 3.6)
+        self.assertAlmostEqual(convert(2, 'm3', 'liters'), 2000)
+        self.assertAlmostEqual(convert(1.5, 't', 'kg'), 1500)
+        self.assertAlmostEqual(convert(10, 'miles', 'km'), 16.09344)
+        self.assertEqual(conversion_factor('passenger.km', 'passenger.km'), 1.0)
+
+    def test_fuel_conversions(self):
+        """Volume, mass and energy convert through fuel properties"""
+        self.assertEqual(fuel_for_source('on-road-diesel-desnz'), 'diesel')
+        self.assertEqual(fuel_for_source('natural-gas'), 'natural-gas')
+        self.assertIsNone(fuel_for_source('grid-average'))
+
+        self.assertAlmostEqual(convert(1000, 'liters', 'kg', 'diesel'), 832)
+        self.assertAlmostEqual(convert(1, 'tonnes', 'gj', 'diesel'), 43.0)
+        self.assertAlmostEqual(convert(1000, 'liters', 'gj', 'diesel'), 0.832 * 43.0)
+        # Round trips are exact up to float precision
+        self.assertAlmostEqual(convert(convert(7, 'gallons', 'mj', 'lpg'), 'mj', 'gallons', 'lpg'), 7)
+
+    def test_impossible_conversions(self):
+        """Unknown units and unrelated dimensions raise UnitConversionError"""
+        with self.assertRaises(UnitConversionError):
+            normalize_unit('furlongs')
+        with self.assertRaises(UnitConversionError):
+            convert(1, 'liters', 'kg')
+        with self.assertRaises(UnitConversionError):
+            convert(1, 'm3', 'gj', 'coal')
+        with self.assertRaises(UnitConversionError):
+            convert(1, 'km', 'kg', 'diesel')
+
+    def test_vectorized_factors(self):
+        """conversion_factors matches per-item conversion and reports failures"""
+        factors, errors = conversion_factors(
+            ['m3', None, 'kwh', 'km'],
+            ['liters', 'kg', 'gj', 'kg'],
+            [None, None, None, 'diesel'],
+        )
+
+        np.testing.assert_allclose(factors[:3], [1000, 1, 0.0036])
+        self.assertTrue(np.isnan(factors[3]))
+        self.assertEqual(errors[:3], [None, None, None])
+        self.assertIn('Cannot convert', errors[3])
+
+
+class UnitAwareCalculationTest(SimpleTestCase):
+    """Test calculations with activity data in other units"""
+
+    def test_single_calculation_converts_to_factor_unit(self):
+        """Activity data is converted before the factor is applied"""
+        base = calculate_emissions('stationary', 'diesel', 1000)
+        result = calculate_emissions('stationary', 'diesel', 1, unit='m3')
+
+        self.assertEqual(result['unit'], 'liters')
+        self.assertAlmostEqual(result['activity_data'], 1000)
+        self.assertAlmostEqual(result['emissions_kg'], base['emissions_kg'])
+        self.assertEqual(result['input_unit'], 'm3')
+        self.assertEqual(result['input_activity_data'], 1)
+
+        self.assertIn('error', calculate_emissions('stationary', 'diesel', 1, unit='km'))
+
+    def test_batch_matches_single_calculations(self):
+        """Batch conversion agrees with calculate_emissions item by item"""
+        items = [
+            ('stationary', 'diesel', 2.5, 'global', None, 'm3'),
+            ('stationary', 'natural-gas', 5000, 'global', None, 'kWh'),
+            ('stationary', 'coal', 1.2, 'global', None, 't'),
+            ('electricity', 'grid-average', 3, 'global', None, 'MWh'),
+            ('stationary', 'coal', 4, 'global', None, None),
+            ('stationary', 'coal', 4, 'global', None, 'liters'),
+        ]
+        batch = calculate_emissions_batch(items)
+
+        for index, (category, source, activity_data, country, _, unit) in enumerate(items[:5]):
+            expected = calculate_emissions(category, source, activity_data, country, unit=unit)
+            self.assertEqual(batch['emissions_kg'][index], expected['emissions_kg'])
+            self.assertAlmostEqual(batch['activity_data'][index], expected['activity_data'])
+
+        self.assertTrue(batch['error_mask'][5])
+        self.assertIsNone(batch['factor_data'][5])
+        self.assertIn('Cannot convert liters to kg', batch['errors'][5])
+
+
+class UnitAwareBulkEndpointTest(TestCase):
+    """Test units on /api/calculate/bulk/"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='units@example.com', password='TestPass123!')
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_records_store_activity_in_factor_unit(self):
+        """Saved records hold the converted activity data and the factor's unit"""
+        response = self.client.post(
+            reverse('ghg:calculate_emission_bulk'),
+            json.dumps({'items': [
+                {'category': 'electricity', 'source': 'grid-average', 'activity_data': 2, 'unit': 'MWh'},
+                {'category': 'stationary', 'source': 'diesel', 'activity_data': 1, 'unit': 'm3'},
+            ]}),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(results[0]['input_unit'], 'MWh')
+        record = EmissionRecord.objects.get(id=results[0]['record_id'])
+        self.assertEqual(record.unit, 'kwh')
+        self.assertAlmostEqual(record.activity_data, 2000)
+        self.assertAlmostEqual(
+            EmissionRecord.objects.get(id=results[1]['record_id']).activity_data, 1000
+        )
+
+    def test_activity_limit_applies_after_conversion(self):
+        """MAX_ACTIVITY_DATA is checked in the factor's unit, not the submitted one"""
+        def post(activity_data, unit):
+            return self.client.post(
+                reverse('ghg:calculate_emission_bulk'),
+                json.dumps({'items': [
+                    {'category': 'stationary', 'source': 'coal', 'activity_data': activity_data, 'unit': unit},
+                ]}),
+                content_type='application/json',
+            )
+
+        response = post(2000, 't')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('more than 1000000 kg', response.json()['errors'][0]['error'])
+
+        response = post(2000000, 'g')
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(response.json()['results'][0]['activity_data'], 2000)
+
+        response = self.client.post(
+            reverse('ghg:calculate_emission'),
+            json.dumps({'category': 'stationary', 'source': 'coal', 'activity_data': 2000, 'unit': 't'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,239 @@
+"""
+Monte Carlo uncertainty propagation for emission inventories (IPCC 2006
+Vol. 1, Ch. 3, Approach 2).
+
+Each record's emissions are sampled as
+
+    emissions_kg × factor multiplier × activity multiplier
+
+with lognormal multipliers of mean 1. Records sharing an emission factor
+share its draw (the factor error is fully correlated between them), while
+activity data errors are independent per record. Samples are drawn as
+(samples × records) NumPy matrices in chunks of samples, so memory stays
+bounded for large inventories.
+
+Uncertainties are relative half-widths of the 95% confidence interval in
+percent, like EmissionFactorData.uncertainty_percentage.
+
+cached_inventory_uncertainty keeps results under the user's data version
+and the factor version, so report pages only sample after a change.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .data_version import API_CACHE_TIMEOUT, get_data_version
+from .factor_resolver import factor_version, resolve_factor
+
+
+UNCERTAINTY_SAMPLES = getattr(settings, 'EMISSION_UNCERTAINTY_SAMPLES', 10000)
+
+# Upper bound on sample matrix elements held in memory at once (~8 MB of float32)
+UNCERTAINTY_CHUNK_ELEMENTS = 2_000_000
+
+# Fixed seed so the same inventory always reports the same interval
+UNCERTAINTY_SEED = 14064
+
+# Factor uncertainty (%) by data quality, used when a factor has no explicit value
+DATA_QUALITY_UNCERTAINTY = {
+    'high': 5.0,
+    'medium': 15.0,
+    'low': 30.0,
+    'estimated': 50.0,
+}
+
+# Built-in factors (IPCC/DEFRA/national inventory) and users' custom factors
+BUILTIN_FACTOR_UNCERTAINTY = DATA_QUALITY_UNCERTAINTY['medium']
+CUSTOM_FACTOR_UNCERTAINTY = DATA_QUALITY_UNCERTAINTY['estimated']
+
+# Metered or invoiced activity data
+ACTIVITY_UNCERTAINTY = 5.0
+
+
+def lognormal_sigma(uncertainty_percent) -> np.ndarray:
+    """Log-space standard deviation for a relative 95% half-width in percent"""
+    relative_sd = np.asarray(uncertainty_percent, dtype=float) / 100.0 / 1.96
+    return np.sqrt(np.log1p(relative_sd ** 2))
+
+
+def _interval(samples: np.ndarray) -> Dict[str, float]:
+    mean = float(samples.mean())
+    lower, upper = (float(value) for value in np.percentile(samples, [2.5, 97.5]))
+    return {
+        'mean_t': mean / 1000.0,
+        'lower_t': lower / 1000.0,
+        'upper_t': upper / 1000.0,
+        # Half-width of the interval relative to the mean, as reported by IPCC
+        'uncertainty_percent': (upper - lower) / 2.0 / mean * 100.0 if mean else 0.0,
+    }
+
+
+def propagate_uncertainty(
+    emissions_kg: Sequence[float],
+    groups: Sequence[Hashable],
+    factor_keys: Sequence[Hashable],
+    factor_uncertainty: Sequence[float],
+    activity_uncertainty: Sequence[float],
+    samples: int = UNCERTAINTY_SAMPLES,
+    seed: Optional[int] = UNCERTAINTY_SEED,
+    chunk_elements: int = UNCERTAINTY_CHUNK_ELEMENTS,
+) -> Dict[str, Any]:
+    """
+    Sample total emissions per group (e.g. scope) and overall.
+
+    Args:
+        emissions_kg: Calculated emissions per record
+        groups: Group of each record
+        factor_keys: Emission factor of each record; equal keys share draws
+        factor_uncertainty: Factor uncertainty (%) per record
+        activity_uncertainty: Activity data uncertainty (%) per record
+        samples: Number of Monte Carlo samples
+        seed: Random seed (None for a fresh one)
+        chunk_elements: Maximum samples × records drawn at once
+
+    Returns:
+        {'samples': n, 'total': interval, 'groups': {group: interval}}, where
+        each interval has mean_t, lower_t, upper_t and uncertainty_percent
+    """
+    values = np.asarray(emissions_kg, dtype=float)
+    if values.size == 0:
+        return {'samples': 0, 'total': _interval(np.zeros(1)), 'groups': {}}
+
+    group_labels, group_index = np.unique(np.asarray(groups, dtype=object).astype(str), return_inverse=True)
+    key_ids: Dict[Hashable, int] = {}
+    key_index = np.fromiter(
+        (key_ids.setdefault(key, len(key_ids)) for key in factor_keys), dtype=np.int64, count=values.size
+    )
+
+    # Order records by (group, factor) so each pair is a contiguous column range
+    order = np.lexsort((key_index, group_index))
+    values = values[order]
+    group_index = group_index[order]
+    key_index = key_index[order]
+    activity_sigma = lognormal_sigma(activity_uncertainty)[order]
+
+    pair_changes = np.flatnonzero(
+        (np.diff(group_index) != 0) | (np.diff(key_index) != 0)
+    ) + 1
+    pair_starts = np.concatenate(([0], pair_changes))
+    pair_keys = key_index[pair_starts]
+    pair_groups = group_index[pair_starts]
+    group_starts = np.flatnonzero(np.concatenate(([True], np.diff(pair_groups) != 0)))
+
+    # One sigma per distinct factor (records sharing a factor share its uncertainty)
+    factor_sigma = np.zeros(len(key_ids))
+    factor_sigma[key_index] = lognormal_sigma(factor_uncertainty)[order]
+
+    rng = np.random.default_rng(seed)
+    record_count = values.size
+    chunk = max(1, min(samples, chunk_elements // record_count))
+    activity_shift = (-activity_sigma ** 2 / 2).astype(np.float32)
+    activity_sigma = activity_sigma.astype(np.float32)
+    scaled_values = values.astype(np.float32)
+
+    group_samples = np.empty((samples, len(group_labels)))
+    for start in range(0, samples, chunk):
+        n = min(chunk, samples - start)
+
+        activity = rng.standard_normal((n, record_count), dtype=np.float32)
+        activity *= activity_sigma
+        activity += activity_shift
+        np.exp(activity, out=activity)
+        activity *= scaled_values
+        pair_totals = np.add.reduceat(activity, pair_starts, axis=1, dtype=np.float64)
+
+        factors = np.exp(
+            rng.standard_normal((n, factor_sigma.size)) * factor_sigma - factor_sigma ** 2 / 2
+        )
+        pair_totals *= factors[:, pair_keys]
+        group_samples[start:start + n] = np.add.reduceat(pair_totals, group_starts, axis=1)
+
+    return {
+        'samples': samples,
+        'total': _interval(group_samples.sum(axis=1)),
+        'groups': {
+            label: _interval(group_samples[:, index])
+            for index, label in enumerate(group_labels)
+        },
+    }
+
+
+def _factor_uncertainty(factor_data: Optional[Dict[str, Any]]) -> float:
+    if factor_data is None:
+        return BUILTIN_FACTOR_UNCERTAINTY
+    if factor_data.get('uncertainty') is not None:
+        return factor_data['uncertainty']
+    if 'data_quality' in factor_data:
+        return DATA_QUALITY_UNCERTAINTY.get(factor_data['data_quality'], BUILTIN_FACTOR_UNCERTAINTY)
+    return BUILTIN_FACTOR_UNCERTAINTY
+
+
+def inventory_uncertainty(queryset, samples: int = UNCERTAINTY_SAMPLES, seed: Optional[int] = UNCERTAINTY_SEED) -> Dict[str, Any]:
+    """
+    95% confidence intervals per scope and in total for a queryset of
+    EmissionRecords.
+
+    Factor uncertainties come from the factor in force on each record's
+    activity date (EmissionFactorData.uncertainty_percentage, else its data
+    quality rating); built-in and custom factors use the module defaults.
+    Factor lookups go through the in-memory factor index, one per distinct
+    (country, category, source, date).
+    """
+    rows = queryset.values_list(
+        'scope', 'category', 'source', 'country', 'emissions_kg', 'activity_date', 'created_at',
+    )
+
+    emissions: List[float] = []
+    scopes: List[str] = []
+    factor_keys: List[Hashable] = []
+    factor_uncertainty: List[float] = []
+    factors: Dict[tuple, Optional[Dict[str, Any]]] = {}
+
+    for scope, category, source, country, emissions_kg, activity_date, created_at in rows.iterator():
+        emissions.append(emissions_kg)
+        scopes.append(scope)
+        if country == 'custom':
+            # Records from a user's custom factor share that factor's draw
+            factor_keys.append(('custom', source))
+            factor_uncertainty.append(CUSTOM_FACTOR_UNCERTAINTY)
+            continue
+
+        key = ((country or 'global').lower(), category, source, activity_date or created_at.date())
+        if key not in factors:
+            factors[key] = resolve_factor(*key)
+        factor_data = factors[key]
+        factor_keys.append(('factor', factor_data['factor_id']) if factor_data else key[:3])
+        factor_uncertainty.append(_factor_uncertainty(factor_data))
+
+    return propagate_uncertainty(
+        emissions,
+        scopes,
+        factor_keys,
+        factor_uncertainty,
+        [ACTIVITY_UNCERTAINTY] * len(emissions),
+        samples=samples,
+        seed=seed,
+    )
+
+
+def cached_inventory_uncertainty(user, queryset, filters: Sequence[Any]) -> Dict[str, Any]:
+    """
+    inventory_uncertainty of a queryset of ``user``'s records, cached under
+    the user's data version and the factor version. ``filters`` (JSON
+    serializable) must identify the queryset among the user's.
+    """
+    parts = [UNCERTAINTY_SAMPLES, UNCERTAINTY_SEED, factor_version(), list(filters)]
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()[:32]
+    key = f'ghg:uncertainty:{user.pk}:{get_data_version(user)}:{digest}'
+    result = cache.get(key)
+    if result is None:
+        result = inventory_uncertainty(queryset)
+        cache.set(key, result, API_CACHE_TIMEOUT)
+    return result
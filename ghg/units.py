@@ -0,0 +1,249 @@
+"""
+Unit conversion for activity data.
+
+Every unit belongs to a dimension (energy, volume, mass, ...) with a scale
+to that dimension's base unit. Conversions between volume, mass and energy
+go through fuel-specific densities and net calorific values. All conversion
+factors are precomputed into one matrix at import time, so converting an
+item is an alias lookup plus a dict lookup.
+
+Unit names follow the factor units used in emission_factors.py
+('gj', 'liters', 'kg', 'kwh', 'km', 'tonne-km', 'm3', ...).
+"""
+
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class UnitConversionError(ValueError):
+    """Raised for unknown units or conversions that are not possible"""
+
+
+# ============================================
+# 1) UNITS: dimension and scale to the base unit
+# ============================================
+
+# Base units: gj (energy), liters (volume), kg (mass), km (distance)
+UNIT_DEFINITIONS: Dict[str, Tuple[str, float]] = {
+    # Energy
+    "gj": ("energy", 1.0),
+    "mj": ("energy", 0.001),
+    "tj": ("energy", 1000.0),
+    "kwh": ("energy", 0.0036),
+    "mwh": ("energy", 3.6),
+    "gwh": ("energy", 3600.0),
+    "therm": ("energy", 0.105506),
+    "mmbtu": ("energy", 1.055056),
+    # Volume
+    "liters": ("volume", 1.0),
+    "ml": ("volume", 0.001),
+    "m3": ("volume", 1000.0),
+    "gallons": ("volume", 3.785411784),      # US gallon
+    "uk-gallons": ("volume", 4.54609),
+    "barrels": ("volume", 158.987294928),    # oil barrel
+    # Mass
+    "kg": ("mass", 1.0),
+    "g": ("mass", 0.001),
+    "tonnes": ("mass", 1000.0),
+    "lb": ("mass", 0.45359237),
+    "short-tons": ("mass", 907.18474),
+    # Distance
+    "km": ("distance", 1.0),
+    "m": ("distance", 0.001),
+    "miles": ("distance", 1.609344),
+    # Freight
+    "tonne-km": ("freight", 1.0),
+    "tonne-miles": ("freight", 1.609344),
+    # Area
+    "m2": ("area", 1.0),
+    "ft2": ("area", 0.09290304),
+    # Counted units only convert to themselves
+    "units": ("units", 1.0),
+    "packages": ("packages", 1.0),
+    "usd": ("usd", 1.0),
+    "franchises": ("franchises", 1.0),
+}
+
+# Other spellings accepted from users and files
+UNIT_ALIASES: Dict[str, str] = {
+    "l": "liters", "liter": "liters", "litre": "liters", "litres": "liters", "lt": "liters",
+    "m³": "m3", "cubic-meters": "m3", "cubic meters": "m3", "sm3": "m3", "nm3": "m3",
+    "gal": "gallons", "gallon": "gallons", "us-gallons": "gallons",
+    "bbl": "barrels", "barrel": "barrels",
+    "t": "tonnes", "tonne": "tonnes", "ton": "tonnes", "tons": "tonnes", "metric-tons": "tonnes",
+    "kgs": "kg", "kilograms": "kg", "kilogram": "kg",
+    "grams": "g", "lbs": "lb", "pounds": "lb",
+    "kilometers": "km", "kilometres": "km", "meters": "m", "mi": "miles", "mile": "miles",
+    "tkm": "tonne-km", "t-km": "tonne-km", "tonne.km": "tonne-km",
+    "m²": "m2", "sqm": "m2", "sq-m": "m2", "sqft": "ft2",
+    "gigajoules": "gj", "megajoules": "mj", "terajoules": "tj",
+    "therms": "therm", "mmbtus": "mmbtu",
+    "unit": "units", "package": "packages", "$": "usd",
+}
+
+
+# ============================================
+# 2) FUEL PROPERTIES (volume <-> mass <-> energy)
+# ============================================
+
+# density: kg per liter; ncv: net calorific value in GJ per tonne (IPCC 2006 defaults)
+FUEL_PROPERTIES: Dict[str, Dict[str, float]] = {
+    "diesel": {"density": 0.832, "ncv": 43.0},
+    "gasoline": {"density": 0.745, "ncv": 44.3},
+    "lpg": {"density": 0.51, "ncv": 47.3},
+    "propane": {"density": 0.508, "ncv": 46.3},
+    "kerosene": {"density": 0.80, "ncv": 43.8},
+    "fuel-oil": {"density": 0.94, "ncv": 40.4},
+    "natural-gas": {"density": 0.0008, "ncv": 48.0},   # ~0.8 kg/m³ at standard conditions
+    "coal": {"ncv": 25.8},                             # no meaningful volume
+    "wood": {"ncv": 15.6},
+}
+
+# Source keys (or parts of them) mapped to a fuel in FUEL_PROPERTIES
+_FUEL_KEYWORDS: List[Tuple[str, str]] = [
+    ("natural-gas", "natural-gas"),
+    ("cng", "natural-gas"),
+    ("lng", "natural-gas"),
+    ("lpg", "lpg"),
+    ("propane", "propane"),
+    ("fuel-oil", "fuel-oil"),
+    ("kerosene", "kerosene"),
+    ("jet", "kerosene"),
+    ("diesel", "diesel"),
+    ("gas-oil", "diesel"),
+    ("gasoline", "gasoline"),
+    ("petrol", "gasoline"),
+    ("coal", "coal"),
+    ("wood", "wood"),
+]
+
+
+def fuel_for_source(source: str) -> Optional[str]:
+    """Fuel whose properties apply to an emission source key, if any"""
+    source = source.lower()
+    for keyword, fuel in _FUEL_KEYWORDS:
+        if keyword in source:
+            return fuel
+    return None
+
+
+# ============================================
+# 3) PRECOMPUTED CONVERSION MATRIX
+# ============================================
+
+def _kg_per_base_unit(fuel: Dict[str, float]) -> Dict[str, float]:
+    """kg of fuel per base unit of each dimension the fuel supports"""
+    factors = {"mass": 1.0}
+    if "density" in fuel:
+        factors["volume"] = fuel["density"]
+    if "ncv" in fuel:
+        factors["energy"] = 1000.0 / fuel["ncv"]
+    return factors
+
+
+def _build_conversion_matrix() -> Mapping[Tuple[Optional[str], str, str], float]:
+    matrix: Dict[Tuple[Optional[str], str, str], float] = {}
+    for from_unit, (from_dim, from_scale) in UNIT_DEFINITIONS.items():
+        for to_unit, (to_dim, to_scale) in UNIT_DEFINITIONS.items():
+            if from_dim == to_dim:
+                matrix[(None, from_unit, to_unit)] = from_scale / to_scale
+
+    for fuel_key, properties in FUEL_PROPERTIES.items():
+        kg_per_base = _kg_per_base_unit(properties)
+        for from_unit, (from_dim, from_scale) in UNIT_DEFINITIONS.items():
+            for to_unit, (to_dim, to_scale) in UNIT_DEFINITIONS.items():
+                if from_dim == to_dim or from_dim not in kg_per_base or to_dim not in kg_per_base:
+                    continue
+                matrix[(fuel_key, from_unit, to_unit)] = (
+                    from_scale * kg_per_base[from_dim] / kg_per_base[to_dim] / to_scale
+                )
+    return MappingProxyType(matrix)
+
+
+CONVERSION_MATRIX = _build_conversion_matrix()
+
+_UNIT_LOOKUP: Mapping[str, str] = MappingProxyType({
+    **{unit: unit for unit in UNIT_DEFINITIONS},
+    **{unit.upper(): unit for unit in UNIT_DEFINITIONS},
+    **UNIT_ALIASES,
+})
+
+
+# ============================================
+# 4) PUBLIC API
+# ============================================
+
+def normalize_unit(unit: str) -> str:
+    """Canonical unit name for ``unit`` (case and common spellings ignored)"""
+    canonical = _UNIT_LOOKUP.get(unit)
+    if canonical is None and isinstance(unit, str):
+        key = unit.strip().lower()
+        canonical = _UNIT_LOOKUP.get(key) or _UNIT_LOOKUP.get(key.replace(" ", "-"))
+    if canonical is None:
+        raise UnitConversionError(f"Unknown unit: {unit}")
+    return canonical
+
+
+@lru_cache(maxsize=4096)
+def conversion_factor(from_unit: str, to_unit: str, fuel: Optional[str] = None) -> float:
+    """
+    Multiplier converting a value in ``from_unit`` to ``to_unit``.
+
+    ``fuel`` (a FUEL_PROPERTIES key) enables volume/mass/energy conversions.
+    Results are memoized per spelling, so repeated lookups skip normalization.
+    """
+    if from_unit == to_unit:
+        return 1.0
+    from_key = normalize_unit(from_unit)
+    to_key = normalize_unit(to_unit)
+    factor = CONVERSION_MATRIX.get((None, from_key, to_key))
+    if factor is None and fuel is not None:
+        factor = CONVERSION_MATRIX.get((fuel, from_key, to_key))
+    if factor is None:
+        detail = f" for {fuel}" if fuel else ""
+        raise UnitConversionError(f"Cannot convert {from_unit} to {to_unit}{detail}")
+    return factor
+
+
+def convert(value: float, from_unit: str, to_unit: str, fuel: Optional[str] = None) -> float:
+    """Convert a single value"""
+    return value * conversion_factor(from_unit, to_unit, fuel)
+
+
+def conversion_factors(
+    from_units: Sequence[Optional[str]],
+    to_units: Sequence[Optional[str]],
+    fuels: Sequence[Optional[str]],
+) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """
+    Vectorized conversion factors for parallel sequences of units.
+
+    Items with no from/to unit get a factor of 1. Each distinct
+    (fuel, from, to) is looked up once.
+
+    Returns:
+        (float array of multipliers, NaN where conversion failed,
+         list of error messages, None where it succeeded)
+    """
+    count = len(from_units)
+    factors = np.ones(count)
+    errors: List[Optional[str]] = [None] * count
+    cache: Dict[Tuple[Optional[str], Optional[str], Optional[str]], Tuple[float, Optional[str]]] = {}
+
+    for i in range(count):
+        key = (fuels[i], from_units[i], to_units[i])
+        if key[1] is None or key[2] is None:
+            continue
+        lookup = cache.get(key)
+        if lookup is None:
+            try:
+                lookup = (conversion_factor(key[1], key[2], key[0]), None)
+            except UnitConversionError as e:
+                lookup = (np.nan, str(e))
+            cache[key] = lookup
+        factors[i], errors[i] = lookup
+
+    return factors, errors
@@ -31,6 +31,9 @@ urlpatterns = [
     
     # API endpoints
     path('api/calculate/', views.calculate_emission, name='calculate_emission'),
+    path('api/calculate/bulk/', views.calculate_emission_bulk, name='calculate_emission_bulk'),
+    path('api/import/', views.import_activity_data_view, name='import_activity_data'),
+    path('api/import/<str:import_id>/progress/', views.import_progress_api, name='import_progress'),
     path('api/user-summary/', views.get_user_emissions_summary, name='user_summary'),
     path('api/dashboard/', views.dashboard_api, name='dashboard_api'),
     path('api/analysis/emissions/summary/', views.emissions_summary_api, name='emissions_summary_api'),
@@ -63,6 +66,11 @@ urlpatterns = [
     path('reporting/inventory/', views.inventory_report, name='inventory_report'),
     path('reporting/pdf/', views.generate_pdf_report, name='generate_pdf_report'),
     
+    # Background report jobs
+    path('api/reports/', views.report_job_create, name='report_job_create'),
+    path('api/reports/<int:job_id>/', views.report_job_status, name='report_job_status'),
+    path('api/reports/download/<str:token>/', views.report_job_download, name='report_job_download'),
+    
     # Analysis pages
     path('analysis/', views.analysis_index, name='analysis_index'),
     path('analysis/emissions/', views.analysis, name='analysis'),
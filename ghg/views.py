@@ -7,12 +7,13 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
 from .forms import EmailLoginForm, EmailSignupForm
 from django.views.decorators.csrf import csrf_protect
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import condition, require_http_methods
 import logging
 import json
 
 # Import Arcjet simulation for enhanced security
 from .arcjet_simulation import arcjet_protect
+from .data_version import cache_per_data_version, get_global_version
 
 # PHASE 3 — RATE LIMIT (Prevent brute-force attacks)
 try:
@@ -68,7 +69,9 @@ def data_entry(request):
 def calculate_emission(request):
     """Calculate emissions with security checks"""
     try:
-        from .emission_factors import calculate_emissions
+        from .emission_factors import calculate_emissions, get_scope_for_category
+        from .calculation_services import activity_limit_error, parse_activity_date
+        from .factor_resolver import resolve_factor
         from .models import EmissionRecord, Supplier
         import logging
         logger = logging.getLogger(__name__)
@@ -83,26 +86,33 @@ def calculate_emission(request):
         fuel_name = data.get('fuel_name', '')
         supplier_id = data.get('supplier_id', None)
         save_record = data.get('save', True)
+        activity_date = parse_activity_date(data.get('activity_date'))
+        unit = data.get('unit') or None
+        if unit is not None and not isinstance(unit, str):
+            return JsonResponse({'error': 'Invalid unit'}, status=400)
         
         # Debug logging
         logger.info(f"Received calculation request - industry_type: '{industry_type}', supplier_id: '{supplier_id}'")
         
         # Security: Validate input data
-        if activity_data < 0 or activity_data > 1000000:
+        if activity_data < 0:
             security_logger.warning(f"Suspicious activity data: {activity_data} from user {request.user.id}")
             return JsonResponse({'error': 'Invalid activity data'}, status=400)
         
-        result = calculate_emissions(category, source, activity_data, country)
+        result = calculate_emissions(
+            category, source, activity_data, country, resolve=resolve_factor, on_date=activity_date, unit=unit
+        )
+        
+        # The limit applies in the factor's unit, after conversion
+        if 'error' not in result and activity_limit_error(result['activity_data'], result['unit']):
+            security_logger.warning(
+                f"Suspicious activity data: {activity_data} {unit or result['unit']} from user {request.user.id}"
+            )
+            return JsonResponse({'error': 'Invalid activity data'}, status=400)
         
         if 'error' not in result and save_record:
             # Determine scope based on category
-            scope = '1'  # Default
-            if category in ['electricity', 'steam-heat']:
-                scope = '2'
-            elif category in ['travel', 'waste', 'water', 'purchased-goods', 'capital-goods', 
-                             'fuel-energy', 'upstream-transport', 'commuting', 'upstream-leased',
-                             'downstream-transport', 'end-of-life', 'franchises', 'investments']:
-                scope = '3'
+            scope = get_scope_for_category(category)
             
             # PHASE 2 — AUTH & PERMISSIONS (Filter data by user)
             supplier_obj = None
@@ -121,11 +131,15 @@ def calculate_emission(request):
                 category=category,
                 source=source,
                 source_name=result['source_name'],
-                activity_data=activity_data,
+                activity_data=result['activity_data'],  # in the factor's unit
+                activity_date=activity_date,
                 unit=result['unit'],
                 emission_factor=result['factor'],
                 emissions_kg=result['emissions_kg'],
                 emissions_tons=result['emissions_tons'],
+                co2_kg=result.get('co2_kg'),
+                ch4_kg=result.get('ch4_kg'),
+                n2o_kg=result.get('n2o_kg'),
                 country=country,
                 reference=result.get('reference', ''),
                 description=description[:500],  # Limit description length
@@ -152,6 +166,110 @@ def calculate_emission(request):
         security_logger.error(f"Emission calculation error for user {request.user.id}: {str(e)}")
         return JsonResponse({'error': 'Calculation failed'}, status=500)
 
+# PHASE 2 — AUTH & PERMISSIONS + PHASE 3 — RATE LIMIT
+@login_required
+@csrf_protect
+@require_http_methods(["POST"])
+@ratelimit(key='user', rate='10/m', method='POST', block=True)
+@arcjet_protect()
+def calculate_emission_bulk(request):
+    """Calculate and save many line items in one all-or-nothing request"""
+    try:
+        from .calculation_services import (
+            BulkValidationError, build_emission_records, save_emission_records,
+        )
+        
+        data = json.loads(request.body)
+        if isinstance(data, list):
+            data = {'items': data}
+        if not isinstance(data, dict) or not isinstance(data.get('items'), list):
+            return JsonResponse({'error': 'Expected a list of items'}, status=400)
+        
+        save_records = data.get('save', True)
+        
+        try:
+            records, results = build_emission_records(
+                request.user, data['items'], data.get('country') or 'global'
+            )
+        except BulkValidationError as e:
+            security_logger.warning(f"Invalid bulk calculation from user {request.user.id}: {e}")
+            return JsonResponse({'error': 'Invalid items', 'errors': e.errors}, status=400)
+        
+        if save_records:
+            records = save_emission_records(records)
+            for result, record in zip(results, records):
+                result['record_id'] = record.id
+                result['saved'] = True
+        
+        total_kg = round(sum(result['emissions_kg'] for result in results), 4)
+        security_logger.info(
+            f"Bulk emissions calculated by user {request.user.id}: {len(results)} items, {total_kg} kg CO2e"
+        )
+        
+        return JsonResponse({
+            'results': results,
+            'count': len(results),
+            'total_emissions_kg': total_kg,
+            'total_emissions_tons': round(total_kg / 1000.0, 6),
+            'saved': bool(save_records),
+        })
+        
+    except json.JSONDecodeError:
+        security_logger.warning(f"Invalid JSON from user {request.user.id}")
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    except Exception as e:
+        security_logger.error(f"Bulk emission calculation error for user {request.user.id}: {str(e)}")
+        return JsonResponse({'error': 'Calculation failed'}, status=500)
+
+# PHASE 2 — AUTH & PERMISSIONS + PHASE 3 — RATE LIMIT
+@login_required
+@csrf_protect
+@require_http_methods(["POST"])
+@ratelimit(key='user', rate='5/m', method='POST', block=True)
+def import_activity_data_view(request):
+    """Import activity data rows from an uploaded CSV/XLSX file"""
+    import uuid
+    from .importers import ActivityImportError, import_activity_data, store_import_progress
+    
+    uploaded = request.FILES.get('file')
+    if not uploaded:
+        return JsonResponse({'error': 'No file uploaded'}, status=400)
+    
+    import_id = request.POST.get('import_id') or uuid.uuid4().hex
+    import_id = import_id[:64]
+    country = request.POST.get('country') or 'global'
+    
+    try:
+        progress = import_activity_data(
+            request.user,
+            uploaded.file,
+            uploaded.name,
+            default_country=country,
+            progress_callback=lambda p: store_import_progress(request.user.id, import_id, p),
+        )
+    except ActivityImportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        security_logger.error(f"Activity import error for user {request.user.id}: {str(e)}")
+        return JsonResponse({'error': 'Import failed'}, status=500)
+    
+    security_logger.info(
+        f"Activity data imported by user {request.user.id}: "
+        f"{progress.rows_imported} rows imported, {progress.rows_failed} rows skipped"
+    )
+    return JsonResponse({'import_id': import_id, **progress.as_dict()})
+
+
+@login_required
+def import_progress_api(request, import_id):
+    """Progress of a running or finished activity data import"""
+    from .importers import get_import_progress
+    
+    progress = get_import_progress(request.user.id, import_id)
+    if progress is None:
+        return JsonResponse({'error': 'Import not found'}, status=404)
+    return JsonResponse({'import_id': import_id, **progress})
+
 # PHASE 2 — AUTH & PERMISSIONS (5️⃣, 6️⃣, 7️⃣)
 @login_required
 @ratelimit(key='user', rate='10/m', method='GET', block=True)
@@ -373,19 +491,21 @@ def get_country_data(request, country_code):
     except Country.DoesNotExist:
         return JsonResponse({'error': 'Country not found'}, status=404)
 
+def _global_data_etag(request):
+    """ETag of the global emissions dataset (its version, bumped on any insert, delete or edit)"""
+    return f'"global-{get_global_version("emission_data")}"'
+
+
 @login_required
+@condition(etag_func=_global_data_etag)
 def get_global_data(request):
-    years = EmissionData.objects.values_list('year', flat=True).distinct().order_by('year')
+    totals = EmissionData.objects.values('year').annotate(total=Sum('total_ghg')).order_by('year')
     
     data = {
-        'years': list(years),
-        'emissions': []
+        'years': [row['year'] for row in totals],
+        'emissions': [round(row['total'] or 0, 2) for row in totals],
     }
     
-    for year in years:
-        total = EmissionData.objects.filter(year=year).aggregate(Sum('total_ghg'))['total_ghg__sum'] or 0
-        data['emissions'].append(round(total, 2))
-    
     return JsonResponse(data)
 
 @login_required
@@ -405,6 +525,7 @@ def get_top_emitters(request):
     return JsonResponse(data)
 
 @login_required
+@cache_per_data_version
 def emissions_summary_api(request):
     """API endpoint for emissions analysis summary data"""
     from django.db.models import Sum, Count
@@ -430,13 +551,11 @@ def emissions_summary_api(request):
 
 
 @login_required
+@cache_per_data_version
 def dashboard_api(request):
     """API endpoint for dashboard data"""
-    from datetime import datetime, date, timedelta
-    from .dashboard_services import get_dashboard_metrics
-    from django.db.models import Sum, Count
-    from django.db import models
-    from decimal import Decimal
+    from datetime import datetime
+    from .dashboard_services import get_dashboard_metrics, get_recent_months
     
     # Parse optional filters
     date_from = None
@@ -459,29 +578,11 @@ def dashboard_api(request):
         # Get comprehensive dashboard metrics
         metrics = get_dashboard_metrics(request.user, date_from, date_to, country)
         
-        # Calculate additional metrics for dashboard
-        user_records = EmissionRecord.objects.filter(user=request.user)
-        
-        # Current month emissions
-        current_month_start = date.today().replace(day=1)
-        current_month_records = user_records.filter(created_at__date__gte=current_month_start)
-        current_month_kg = current_month_records.aggregate(total=Sum('emissions_kg', output_field=models.FloatField()))['total'] or 0
-        current_month_tons = float(current_month_kg) / 1000
-        
-        # Previous month for comparison
-        if current_month_start.month == 1:
-            prev_month_start = current_month_start.replace(year=current_month_start.year - 1, month=12)
-            prev_month_end = current_month_start - timedelta(days=1)
-        else:
-            prev_month_start = current_month_start.replace(month=current_month_start.month - 1)
-            prev_month_end = current_month_start - timedelta(days=1)
-        
-        prev_month_records = user_records.filter(
-            created_at__date__gte=prev_month_start,
-            created_at__date__lte=prev_month_end
-        )
-        prev_month_kg = prev_month_records.aggregate(total=Sum('emissions_kg', output_field=models.FloatField()))['total'] or 0
-        prev_month_tons = float(prev_month_kg) / 1000
+        # Month-over-month figures and the 6-month chart share one grouped query
+        recent_months = get_recent_months(request.user, 6)
+        current_month, prev_month = recent_months[-1], recent_months[-2]
+        current_month_tons = current_month['emissions_kg'] / 1000
+        prev_month_tons = prev_month['emissions_kg'] / 1000
         
         # Calculate percentage changes
         emissions_change_pct = 0
@@ -490,39 +591,20 @@ def dashboard_api(request):
         if prev_month_tons > 0:
             emissions_change_pct = ((current_month_tons - prev_month_tons) / prev_month_tons) * 100
         
-        prev_month_count = prev_month_records.count()
-        current_month_count = current_month_records.count()
-        if prev_month_count > 0:
-            records_change_pct = ((current_month_count - prev_month_count) / prev_month_count) * 100
+        if prev_month['records'] > 0:
+            records_change_pct = ((current_month['records'] - prev_month['records']) / prev_month['records']) * 100
         
-        # Monthly trends for chart (last 6 months)
-        monthly_trends = []
-        for i in range(6):
-            month_date = current_month_start - timedelta(days=30 * i)
-            month_start = month_date.replace(day=1)
-            
-            if month_date.month == 12:
-                month_end = month_date.replace(year=month_date.year + 1, month=1, day=1) - timedelta(days=1)
-            else:
-                month_end = month_date.replace(month=month_date.month + 1, day=1) - timedelta(days=1)
-            
-            month_records = user_records.filter(
-                created_at__date__gte=month_start,
-                created_at__date__lte=month_end
-            )
-            month_kg = month_records.aggregate(total=Sum('emissions_kg', output_field=models.FloatField()))['total'] or 0
-            month_tons = float(month_kg) / 1000
-            
-            monthly_trends.append({
-                'month': month_date.strftime('%b %Y'),
-                'emissions_tons': round(month_tons, 2)
-            })
-        
-        # Reverse to show chronological order
-        monthly_trends.reverse()
+        # Monthly trends for chart (last 6 months, chronological)
+        monthly_trends = [
+            {
+                'month': month['month'].strftime('%b %Y'),
+                'emissions_tons': round(month['emissions_kg'] / 1000, 2),
+            }
+            for month in recent_months
+        ]
         
         # Suppliers count
-        suppliers_count = Supplier.objects.filter(user=request.user).count()
+        suppliers_count = metrics.get('suppliers_count', 0)
         
         # Prepare response data
         response_data = {
@@ -595,6 +677,7 @@ def emission_history(request):
     return render(request, 'emission_history.html', context)
 
 @login_required
+@cache_per_data_version
 def get_user_emissions_summary(request):
     """API endpoint for user's emission summary"""
     from .models import EmissionRecord
@@ -1449,6 +1532,7 @@ def get_emission_record(request, record_id):
             'source_name': record.source_name,
             'emissions_kg': record.emissions_kg,
             'emissions_tons': record.emissions_tons,
+            'activity_date': record.activity_date.isoformat() if record.activity_date else None,
             'created_at': record.created_at.isoformat()
         })
         
@@ -1527,153 +1611,8 @@ def delete_emission_record(request, record_id):
 
 @login_required
 def export_emission_report(request, scope):
-    """API endpoint to export emission records as Excel report"""
-    from .models import EmissionRecord
-    from django.http import HttpResponse
-    import io
-    from datetime import datetime
-    
-    try:
-        # Try to import openpyxl for Excel export
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-        from openpyxl.utils import get_column_letter
-    except ImportError:
-        return JsonResponse({'error': 'Excel export not available. Please install openpyxl.'}, status=500)
-    
-    # Filter records based on scope
-    records = EmissionRecord.objects.filter(user=request.user).order_by('-created_at')
-    
-    if scope != 'all':
-        scope_number = scope.replace('scope', '')
-        records = records.filter(scope=int(scope_number))
-    
-    # Create workbook and worksheet
-    wb = Workbook()
-    ws = wb.active
-    
-    # Set worksheet title based on scope (max 31 chars for Excel)
-    scope_titles = {
-        'all': 'All Scopes Report',
-        'scope1': 'Scope 1 Direct',
-        'scope2': 'Scope 2 Electricity', 
-        'scope3': 'Scope 3 Indirect'
-    }
-    ws.title = scope_titles.get(scope, 'Emission Report')
-    
-    # Define styles
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="2D7A5F", end_color="2D7A5F", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Add title
-    ws.merge_cells('A1:H1')
-    title_cell = ws['A1']
-    title_cell.value = f"SustIndex - {scope_titles.get(scope, 'Emission Report')}"
-    title_cell.font = Font(bold=True, size=16, color="2D7A5F")
-    title_cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Add generation info
-    ws.merge_cells('A2:H2')
-    info_cell = ws['A2']
-    info_cell.value = f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | User: {request.user.email}"
-    info_cell.font = Font(size=10, color="666666")
-    info_cell.alignment = Alignment(horizontal="center")
-    
-    # Add summary statistics
-    total_records = records.count()
-    total_emissions_kg = sum(record.emissions_kg for record in records)
-    total_emissions_tons = total_emissions_kg / 1000.0
-    
-    ws.merge_cells('A4:H4')
-    summary_cell = ws['A4']
-    summary_cell.value = f"Summary: {total_records} records | Total Emissions: {total_emissions_kg:.2f} kg CO2e ({total_emissions_tons:.3f} tons CO2e)"
-    summary_cell.font = Font(bold=True, size=12, color="2D7A5F")
-    summary_cell.alignment = Alignment(horizontal="center")
-    
-    # Headers
-    headers = ['Date', 'Time', 'Scope', 'Source', 'Activity Data', 'Unit', 'Emissions (kg CO2e)', 'Emissions (tons CO2e)', 'Country', 'Description']
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=6, column=col)
-        cell.value = header
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = border
-    
-    # Data rows
-    for row, record in enumerate(records, 7):
-        data = [
-            record.created_at.strftime('%Y-%m-%d'),
-            record.created_at.strftime('%H:%M:%S'),
-            f"Scope {record.scope}",
-            record.source_name,
-            record.activity_data,
-            record.unit,
-            round(record.emissions_kg, 3),
-            round(record.emissions_tons, 6),
-            'Turkey' if record.country == 'turkey' else 'Global',
-            record.description or ''
-        ]
-        
-        for col, value in enumerate(data, 1):
-            cell = ws.cell(row=row, column=col)
-            cell.value = value
-            cell.border = border
-            
-            # Color code by scope
-            if col == 3:  # Scope column
-                if record.scope == 1:
-                    cell.fill = PatternFill(start_color="FEE2E2", end_color="FEE2E2", fill_type="solid")
-                elif record.scope == 2:
-                    cell.fill = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
-                elif record.scope == 3:
-                    cell.fill = PatternFill(start_color="DBEAFE", end_color="DBEAFE", fill_type="solid")
-    
-    # Auto-adjust column widths
-    for col in range(1, len(headers) + 1):
-        column_letter = get_column_letter(col)
-        max_length = 0
-        for row in ws[column_letter]:
-            try:
-                if len(str(row.value)) > max_length:
-                    max_length = len(str(row.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Save to memory
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    # Create response
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    
-    # Set filename
-    scope_names = {
-        'all': 'All_Scopes',
-        'scope1': 'Scope_1_Direct_Emissions',
-        'scope2': 'Scope_2_Electricity',
-        'scope3': 'Scope_3_Indirect_Emissions'
-    }
-    
-    today = datetime.now().strftime('%Y-%m-%d')
-    filename = f"{scope_names.get(scope, 'Emission')}_Report_{today}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
+    """API endpoint to export emission records as Excel report (202 with a report job until it is rendered)"""
+    return _cached_report_or_job(request, 'emission_report_xlsx', {'scope': scope})
 
 
 
@@ -1685,13 +1624,10 @@ def analysis_index(request):
 @login_required
 def analysis(request):
     """Analysis page view"""
-    from .models import EmissionRecord
-    from django.db.models import Sum
+    from .rollups import emissions_total
     
     # Get user's emission statistics
-    records = EmissionRecord.objects.filter(user=request.user)
-    total_records = records.count()
-    total_emissions_kg = records.aggregate(Sum('emissions_kg'))['emissions_kg__sum'] or 0
+    total_emissions_kg, total_records = emissions_total(request.user)
     total_emissions = total_emissions_kg / 1000.0  # Convert to tons
     
     context = {
@@ -1704,16 +1640,15 @@ def analysis(request):
 
 
 @login_required
+@cache_per_data_version
 def analysis_scope_distribution(request):
     """API endpoint for scope distribution data"""
-    from .models import EmissionRecord
-    from django.db.models import Sum
-    
-    records = EmissionRecord.objects.filter(user=request.user)
+    from .rollups import aggregate_emissions
     
-    scope1 = records.filter(scope='1').aggregate(Sum('emissions_kg'))['emissions_kg__sum'] or 0
-    scope2 = records.filter(scope='2').aggregate(Sum('emissions_kg'))['emissions_kg__sum'] or 0
-    scope3 = records.filter(scope='3').aggregate(Sum('emissions_kg'))['emissions_kg__sum'] or 0
+    by_scope = {row['scope']: row['sum_kg'] for row in aggregate_emissions(request.user, ('scope',))}
+    scope1 = by_scope.get('1', 0)
+    scope2 = by_scope.get('2', 0)
+    scope3 = by_scope.get('3', 0)
     
     return JsonResponse({
         'scope1': round(scope1, 2),
@@ -1723,32 +1658,27 @@ def analysis_scope_distribution(request):
 
 
 @login_required
+@cache_per_data_version
 def analysis_monthly_trends(request):
     """API endpoint for monthly emission trends"""
-    from .models import EmissionRecord
-    from django.db.models import Sum
-    from django.db.models.functions import TruncMonth
-    from datetime import datetime, timedelta
+    from .rollups import aggregate_emissions
+    from datetime import timedelta
+    from django.utils import timezone
     
     # Get last 12 months of data
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=365)
+    start_date = (timezone.now() - timedelta(days=365)).date()
     
-    records = EmissionRecord.objects.filter(
-        user=request.user,
-        created_at__gte=start_date
-    ).annotate(
-        month=TruncMonth('created_at')
-    ).values('month').annotate(
-        total=Sum('emissions_kg')
-    ).order_by('month')
+    records = sorted(
+        aggregate_emissions(request.user, ('month',), date_from=start_date),
+        key=lambda row: row['month'],
+    )
     
     months = []
     emissions = []
     
     for record in records:
         months.append(record['month'].strftime('%b %Y'))
-        emissions.append(round(record['total'], 2))
+        emissions.append(round(record['sum_kg'], 2))
     
     return JsonResponse({
         'months': months,
@@ -1757,17 +1687,19 @@ def analysis_monthly_trends(request):
 
 
 @login_required
+@cache_per_data_version
 def analysis_top_sources(request):
     """API endpoint for top emission sources"""
-    from .models import EmissionRecord
-    from django.db.models import Sum
+    from .rollups import aggregate_emissions
     
     # Get top 10 emission sources
-    sources = EmissionRecord.objects.filter(
-        user=request.user
-    ).values('source_name').annotate(
-        total=Sum('emissions_kg')
-    ).order_by('-total')[:10]
+    sources = [
+        {'source_name': row['source_name'], 'total': row['sum_kg']}
+        for row in sorted(
+            aggregate_emissions(request.user, ('source_name',)),
+            key=lambda row: (-row['sum_kg'], row['source_name']),
+        )[:10]
+    ]
     
     # Calculate total for percentage
     total_emissions = sum(s['total'] for s in sources)
@@ -1805,12 +1737,11 @@ def emissions(request):
 
 
 @login_required
+@cache_per_data_version
 def emissions_data_api(request):
     """API endpoint for emissions data with filters"""
-    from .models import EmissionRecord
-    from django.db.models import Sum, Q
-    from datetime import datetime
-    import json
+    from .rollups import aggregate_emissions
+    from datetime import date
     
     # Get filter parameters
     method = request.GET.get('standard', 'ghg')
@@ -1820,45 +1751,42 @@ def emissions_data_api(request):
     categories = request.GET.get('categories', '').split(',') if request.GET.get('categories') else []
     sources = request.GET.get('sources', '').split(',') if request.GET.get('sources') else []
     
-    # Base queryset
-    records = EmissionRecord.objects.filter(user=request.user)
-    
-    # Apply date filter
+    # Apply date filter (inclusive dates)
+    filters = {}
     if date_from:
         try:
-            records = records.filter(created_at__gte=datetime.strptime(date_from, '%Y-%m-%d'))
+            filters['date_from'] = date.fromisoformat(date_from)
         except ValueError:
             pass
     if date_to:
         try:
-            records = records.filter(created_at__lte=datetime.strptime(date_to, '%Y-%m-%d'))
+            filters['date_to'] = date.fromisoformat(date_to)
         except ValueError:
             pass
     
     # Apply scope filter
     if scopes and scopes != ['']:
-        try:
-            scope_numbers = [int(s) for s in scopes if s.isdigit()]
-            if scope_numbers:
-                records = records.filter(scope__in=scope_numbers)
-        except ValueError:
-            pass
-    
-    # Calculate scope totals
-    scope1_total = records.filter(scope='1').aggregate(Sum('emissions_kg'))['emissions_kg__sum'] or 0
-    scope2_total = records.filter(scope='2').aggregate(Sum('emissions_kg'))['emissions_kg__sum'] or 0
-    scope3_total = records.filter(scope='3').aggregate(Sum('emissions_kg'))['emissions_kg__sum'] or 0
-    
-    # Get sources data
-    sources_data = records.values('source_name', 'scope').annotate(
-        total=Sum('emissions_kg')
-    ).order_by('-total')
+        scope_numbers = [s for s in scopes if s.isdigit()]
+        if scope_numbers:
+            filters['scopes'] = scope_numbers
+    
+    # Scope and source totals from the monthly rollups
+    sources_data = sorted(
+        aggregate_emissions(request.user, ('source_name', 'scope'), **filters),
+        key=lambda row: (-row['sum_kg'], row['scope'], row['source_name']),
+    )
+    scope_totals = {'1': 0, '2': 0, '3': 0}
+    for source in sources_data:
+        scope_totals[source['scope']] = scope_totals.get(source['scope'], 0) + source['sum_kg']
+    scope1_total = scope_totals['1']
+    scope2_total = scope_totals['2']
+    scope3_total = scope_totals['3']
     
     sources_list = []
     total_emissions = scope1_total + scope2_total + scope3_total
     
     for source in sources_data:
-        emissions = source['total']
+        emissions = source['sum_kg']
         percentage = (emissions / total_emissions * 100) if total_emissions > 0 else 0
         
         sources_list.append({
@@ -1892,7 +1820,7 @@ def emissions_data_api(request):
             'values': chart_values
         },
         'method': method,
-        'total_records': records.count(),
+        'total_records': sum(source['count'] for source in sources_data),
         'tree': {
             'scopes': [
                 {
@@ -2009,121 +1937,10 @@ def emissions_data_api(request):
 
 @login_required
 def emissions_export_api(request):
-    """Export emissions data as Excel"""
-    from .models import EmissionRecord
-    from django.http import HttpResponse
-    from datetime import datetime
-    import json
-    import io
-    
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    except ImportError:
-        return JsonResponse({'error': 'Excel export not available'}, status=500)
-    
-    # Get same filters as data API
-    method = request.GET.get('method', 'ghg')
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    scopes = request.GET.get('scopes', '1,2,3').split(',')
-    
-    # Base queryset
-    records = EmissionRecord.objects.filter(user=request.user)
-    
-    # Apply filters
-    if date_from:
-        records = records.filter(created_at__gte=datetime.strptime(date_from, '%Y-%m-%d'))
-    if date_to:
-        records = records.filter(created_at__lte=datetime.strptime(date_to, '%Y-%m-%d'))
-    if scopes:
-        scope_numbers = [int(s) for s in scopes if s.isdigit()]
-        records = records.filter(scope__in=scope_numbers)
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Emissions Analysis"
-    
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="10B981", end_color="10B981", fill_type="solid")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Title
-    ws.merge_cells('A1:F1')
-    title_cell = ws['A1']
-    title_cell.value = f"Emissions Analysis Report - {method.upper()} Method"
-    title_cell.font = Font(bold=True, size=16, color="10B981")
-    title_cell.alignment = Alignment(horizontal="center")
-    
-    # Date range
-    ws.merge_cells('A2:F2')
-    date_cell = ws['A2']
-    date_cell.value = f"Period: {date_from} to {date_to}"
-    date_cell.font = Font(size=12)
-    date_cell.alignment = Alignment(horizontal="center")
-    
-    # Headers
-    headers = ['Source', 'Scope', 'Activity Data', 'Unit', 'Emissions (kg CO2e)', 'Emissions (tCO2e)']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col)
-        cell.value = header
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Data
-    for row, record in enumerate(records.order_by('-emissions_kg'), 5):
-        data = [
-            record.source_name,
-            f"Scope {record.scope}",
-            record.activity_data,
-            record.unit,
-            round(record.emissions_kg, 3),
-            round(record.emissions_tons, 6)
-        ]
-        
-        for col, value in enumerate(data, 1):
-            cell = ws.cell(row=row, column=col)
-            cell.value = value
-            cell.border = border
-            
-            # Color code by scope
-            if col == 2:  # Scope column
-                if record.scope == 1:
-                    cell.fill = PatternFill(start_color="FEE2E2", end_color="FEE2E2", fill_type="solid")
-                elif record.scope == 2:
-                    cell.fill = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
-                elif record.scope == 3:
-                    cell.fill = PatternFill(start_color="DBEAFE", end_color="DBEAFE", fill_type="solid")
-    
-    # Auto-adjust column widths
-    for col in range(1, len(headers) + 1):
-        ws.column_dimensions[chr(64 + col)].width = 20
-    
-    # Save to memory
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    # Create response
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    
-    today = datetime.now().strftime('%Y-%m-%d')
-    filename = f"Emissions_Analysis_{method.upper()}_{today}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
+    """Export emissions data as Excel (202 with a report job until it is rendered)"""
+    from .reporting.renderers import report_params
+
+    return _cached_report_or_job(request, 'emissions_analysis_xlsx', report_params(request.GET))
 
 # New professional pages
 @login_required
@@ -2178,76 +1995,45 @@ def support(request):
 @login_required
 def inventory_report(request):
     """Inventory reporting page with filtering and PDF generation"""
-    from datetime import datetime, date
-    from django.db.models import Sum, Count, Q
-    from .models import EmissionRecord, ReportExtraInfo
+    from .models import ReportExtraInfo
+    from .reporting.renderers import inventory_filters
+    from .reporting.services import inventory_snapshot
     
     # Get filter parameters
-    date_from = request.GET.get('from')
-    date_to = request.GET.get('to')
+    filters = inventory_filters(request.user, request.GET)
+    date_from = request.GET.get('from') if filters.date_from else None
+    date_to = request.GET.get('to') if filters.date_to else None
     scope_filter = request.GET.get('scope', 'all')
     country_filter = request.GET.get('country', 'all')
     
-    # Base queryset
-    records = EmissionRecord.objects.filter(user=request.user)
-    
-    # Apply filters
-    if date_from:
-        try:
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-            records = records.filter(created_at__date__gte=date_from_obj)
-        except ValueError:
-            date_from = None
-    
-    if date_to:
-        try:
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-            records = records.filter(created_at__date__lte=date_to_obj)
-        except ValueError:
-            date_to = None
-    
-    if scope_filter != 'all':
-        records = records.filter(scope=scope_filter)
-    
-    if country_filter != 'all':
-        records = records.filter(country=country_filter)
-    
-    # Calculate summary data
-    total_emissions_kg = records.aggregate(total=Sum('emissions_kg'))['total'] or 0
-    total_emissions_tons = total_emissions_kg / 1000
-    total_records = records.count()
+    # Totals, scopes, sources and countries from one grouped rollup read
+    snapshot = inventory_snapshot(filters)
     
     # Scope breakdown
     scope_breakdown = []
     for scope in [1, 2, 3]:
-        scope_records = records.filter(scope=scope)
-        scope_kg = scope_records.aggregate(total=Sum('emissions_kg'))['total'] or 0
-        scope_tons = scope_kg / 1000
-        scope_count = scope_records.count()
-        
-        percentage = (scope_tons / total_emissions_tons * 100) if total_emissions_tons > 0 else 0
-        
+        totals = snapshot.by_scope.get(str(scope), {'sum_kg': 0, 'count': 0})
         scope_breakdown.append({
             'scope': scope,
-            'emissions_tons': round(scope_tons, 3),
-            'emissions_kg': scope_kg,
-            'records_count': scope_count,
-            'percentage': round(percentage, 1)
+            'emissions_tons': round(totals['sum_kg'] / 1000, 3),
+            'emissions_kg': totals['sum_kg'],
+            'records_count': totals['count'],
+            'percentage': round(snapshot.percentage(totals['sum_kg']), 1)
         })
     
     # Top emission sources
-    top_sources = (
-        records.values('source_name', 'scope', 'category')
-        .annotate(
-            total_kg=Sum('emissions_kg'),
-            records_count=Count('id')
-        )
-        .order_by('-total_kg')[:10]
-    )
-    
-    for source in top_sources:
-        source['total_tons'] = round(source['total_kg'] / 1000, 3)
-        source['percentage'] = round((source['total_kg'] / total_emissions_kg * 100), 1) if total_emissions_kg > 0 else 0
+    top_sources = [
+        {
+            'source_name': source['source_name'],
+            'scope': source['scope'],
+            'category': source['category'],
+            'total_kg': source['sum_kg'],
+            'records_count': source['count'],
+            'total_tons': round(source['sum_kg'] / 1000, 3),
+            'percentage': round(snapshot.percentage(source['sum_kg']), 1),
+        }
+        for source in snapshot.sources[:10]
+    ]
     
     # Get report extra info if exists
     try:
@@ -2255,17 +2041,14 @@ def inventory_report(request):
     except ReportExtraInfo.DoesNotExist:
         report_extra = None
     
-    # Countries for filter
-    countries = records.values_list('country', flat=True).distinct()
-    
     context = {
-        'total_emissions_tons': round(total_emissions_tons, 3),
-        'total_emissions_kg': total_emissions_kg,
-        'total_records': total_records,
+        'total_emissions_tons': round(snapshot.total_t, 3),
+        'total_emissions_kg': snapshot.total_kg,
+        'total_records': snapshot.records,
         'scope_breakdown': scope_breakdown,
         'top_sources': top_sources,
         'report_extra': report_extra,
-        'countries': countries,
+        'countries': snapshot.countries,
         'date_from': date_from,
         'date_to': date_to,
         'scope_filter': scope_filter,
@@ -2278,203 +2061,87 @@ def inventory_report(request):
 
 @login_required
 def generate_pdf_report(request):
-    """Generate PDF report for emissions inventory"""
-    from django.http import HttpResponse
-    from datetime import datetime, date
-    from django.db.models import Sum, Count
-    from .models import EmissionRecord, ReportExtraInfo
-    import io
-    
-    try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.lib import colors
-    except ImportError:
-        return JsonResponse({'error': 'PDF generation not available. Please install reportlab.'}, status=500)
-    
-    # Get filter parameters (same as inventory_report)
-    date_from = request.GET.get('from')
-    date_to = request.GET.get('to')
-    scope_filter = request.GET.get('scope', 'all')
-    country_filter = request.GET.get('country', 'all')
-    
-    # Base queryset
-    records = EmissionRecord.objects.filter(user=request.user)
-    
-    # Apply filters
-    if date_from:
-        try:
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-            records = records.filter(created_at__date__gte=date_from_obj)
-        except ValueError:
-            date_from = None
-    
-    if date_to:
-        try:
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-            records = records.filter(created_at__date__lte=date_to_obj)
-        except ValueError:
-            date_to = None
-    
-    if scope_filter != 'all':
-        records = records.filter(scope=scope_filter)
-    
-    if country_filter != 'all':
-        records = records.filter(country=country_filter)
-    
-    # Calculate data
-    total_emissions_kg = records.aggregate(total=Sum('emissions_kg'))['total'] or 0
-    total_emissions_tons = total_emissions_kg / 1000
-    
-    # Create PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-    
-    # Container for the 'Flowable' objects
-    elements = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        textColor=colors.HexColor('#1e293b')
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.HexColor('#374151')
+    """Generate PDF report for emissions inventory (202 with a report job until it is rendered)"""
+    from .reporting.renderers import report_params
+
+    return _cached_report_or_job(request, 'emissions_pdf', report_params(request.GET))
+
+
+def _report_job_response(job, status=200):
+    from django.urls import reverse
+    from .report_jobs import job_status
+
+    data = job_status(job)
+    data['status_url'] = reverse('ghg:report_job_status', args=[job.pk])
+    data['download_url'] = (
+        reverse('ghg:report_job_download', args=[job.download_token]) if job.status == 'completed' else None
     )
-    
-    # Title
-    title = Paragraph("GHG Emissions Inventory Report", title_style)
-    elements.append(title)
-    
-    # Organization info
-    org_info = f"""
-    <b>Organization:</b> {request.user.username.title()}<br/>
-    <b>Report Generated:</b> {datetime.now().strftime('%B %d, %Y at %I:%M %p')}<br/>
-    <b>Reporting Standard:</b> ISO 14064-1<br/>
-    <b>Report Period:</b> {date_from or 'All time'} to {date_to or 'Present'}
-    """
-    elements.append(Paragraph(org_info, styles['Normal']))
-    elements.append(Spacer(1, 20))
-    
-    # Executive Summary
-    elements.append(Paragraph("Executive Summary", heading_style))
-    summary_text = f"""
-    This report presents the greenhouse gas (GHG) emissions inventory for {request.user.username.title()} 
-    in accordance with ISO 14064-1 standards. The total emissions for the reporting period are 
-    <b>{total_emissions_tons:.3f} tCO₂e</b> across {records.count()} emission sources.
+    return JsonResponse(data, status=status)
+
+
+def _cached_report_or_job(request, kind, params):
     """
-    elements.append(Paragraph(summary_text, styles['Normal']))
-    elements.append(Spacer(1, 20))
-    
-    # Scope breakdown table
-    elements.append(Paragraph("Emissions by Scope", heading_style))
-    
-    scope_data = [['Scope', 'Description', 'Emissions (tCO₂e)', 'Percentage']]
-    for scope in [1, 2, 3]:
-        scope_records = records.filter(scope=scope)
-        scope_kg = scope_records.aggregate(total=Sum('emissions_kg'))['total'] or 0
-        scope_tons = scope_kg / 1000
-        percentage = (scope_tons / total_emissions_tons * 100) if total_emissions_tons > 0 else 0
-        
-        descriptions = {
-            1: 'Direct emissions from owned sources',
-            2: 'Indirect emissions from purchased energy',
-            3: 'Other indirect emissions in value chain'
-        }
-        
-        scope_data.append([
-            f'Scope {scope}',
-            descriptions[scope],
-            f'{scope_tons:.3f}',
-            f'{percentage:.1f}%'
-        ])
-    
-    scope_table = Table(scope_data)
-    scope_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f1f5f9')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#1e293b')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb'))
-    ]))
-    
-    elements.append(scope_table)
-    elements.append(Spacer(1, 20))
-    
-    # Top sources
-    elements.append(Paragraph("Top Emission Sources", heading_style))
-    
-    top_sources = (
-        records.values('source_name', 'scope', 'category')
-        .annotate(total_kg=Sum('emissions_kg'))
-        .order_by('-total_kg')[:10]
-    )
-    
-    sources_data = [['Source', 'Scope', 'Category', 'Emissions (tCO₂e)', 'Percentage']]
-    for source in top_sources:
-        source_tons = source['total_kg'] / 1000
-        percentage = (source['total_kg'] / total_emissions_kg * 100) if total_emissions_kg > 0 else 0
-        
-        sources_data.append([
-            source['source_name'],
-            f"Scope {source['scope']}",
-            source['category'].replace('-', ' ').title(),
-            f'{source_tons:.3f}',
-            f'{percentage:.1f}%'
-        ])
-    
-    sources_table = Table(sources_data)
-    sources_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f1f5f9')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#1e293b')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb'))
-    ]))
-    
-    elements.append(sources_table)
-    elements.append(Spacer(1, 20))
-    
-    # Methodology
-    elements.append(Paragraph("Methodology", heading_style))
-    methodology_text = """
-    This inventory was prepared following ISO 14064-1:2018 guidelines for greenhouse gas inventories. 
-    Emission factors were sourced from internationally recognized databases including IPCC, Defra, EPA, 
-    and country-specific sources. All calculations follow the operational control approach for 
-    organizational boundary definition.
+    Serve an unchanged report from the report cache; otherwise queue it
+    for the report worker and answer 202 with the job's status_url.
     """
-    elements.append(Paragraph(methodology_text, styles['Normal']))
-    
-    # Build PDF
-    doc.build(elements)
-    
-    # Get the value of the BytesIO buffer and write it to the response
-    pdf = buffer.getvalue()
-    buffer.close()
-    
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="emissions_inventory_{datetime.now().strftime("%Y%m%d")}.pdf"'
-    response.write(pdf)
-    
-    return response
+    from django.http import FileResponse
+    from .report_cache import cached_report
+    from .report_jobs import ReportQueueFull, enqueue_report
+    from .reporting.renderers import REPORT_TYPES
+
+    cached = cached_report(kind, request.user, params)
+    if cached is not None:
+        report, filename = cached
+        return FileResponse(report, as_attachment=True, filename=filename, content_type=REPORT_TYPES[kind].content_type)
+
+    try:
+        job = enqueue_report(request.user, kind, params)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ReportQueueFull as e:
+        return JsonResponse({'error': str(e)}, status=429)
+    return _report_job_response(job, status=202)
+
+
+@login_required
+@require_http_methods(["POST"])
+def report_job_create(request):
+    """Queue a PDF/Excel report; the client polls the returned status_url"""
+    from .report_jobs import ReportQueueFull, enqueue_report
+    from .reporting.renderers import report_params
+
+    try:
+        job = enqueue_report(request.user, request.POST.get('kind', ''), report_params(request.POST))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ReportQueueFull as e:
+        return JsonResponse({'error': str(e)}, status=429)
+
+    return _report_job_response(job, status=202)
+
+
+@login_required
+def report_job_status(request, job_id):
+    """Status and progress of one of the user's report jobs"""
+    from .models import ReportJob
+
+    job = get_object_or_404(ReportJob, pk=job_id, created_by=request.user)
+    return _report_job_response(job)
+
+
+@login_required
+def report_job_download(request, token):
+    """Download a rendered report by its token"""
+    from django.http import FileResponse, Http404
+    from .models import ReportJob
+    from .report_jobs import job_file_path
+
+    job = get_object_or_404(ReportJob, download_token=token, created_by=request.user, status='completed')
+    try:
+        report = open(job_file_path(job), 'rb')
+    except FileNotFoundError:
+        raise Http404('Report has expired')
+    return FileResponse(report, as_attachment=True, filename=job.filename, content_type=job.content_type)
 
 def landing_page(request):
     """صفحه لندینگ اصلی سایت"""
@@ -642,9 +642,9 @@
       return;
     }
 
-    const url = `/en/api/emissions/export/?${buildQuery()}`;
-    window.open(url, '_blank');
     showToast('Export started...', 'success');
+    ReportJobs.download('emissions_analysis_xlsx', new URLSearchParams(buildQuery()))
+      .catch(error => showToast(error.message, 'error'));
   }
 
   function showToast(message, type = 'success') {
@@ -0,0 +1,64 @@
+/* =========================================================
+   REPORT JOBS
+   Academia Carbon - Background PDF/Excel report downloads
+
+   ReportJobs.download(kind, params, onProgress) queues a report,
+   polls its status until the worker has rendered it, then starts
+   the download. Returns a promise that resolves with the job.
+========================================================= */
+
+(function() {
+    'use strict';
+
+    const POLL_INTERVAL = 1000;
+
+    function csrfToken() {
+        const cookie = document.cookie.split(';')
+            .map(part => part.trim())
+            .find(part => part.startsWith('csrftoken='));
+        if (cookie) {
+            return decodeURIComponent(cookie.substring('csrftoken='.length));
+        }
+        const input = document.querySelector('[name="csrfmiddlewaretoken"]');
+        return input ? input.value : '';
+    }
+
+    async function readJob(response) {
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.error || 'Failed to generate report');
+        }
+        return job;
+    }
+
+    function wait(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function download(kind, params, onProgress) {
+        const body = new URLSearchParams(params || {});
+        body.set('kind', kind);
+
+        let job = await readJob(await fetch('/en/api/reports/', {
+            method: 'POST',
+            headers: { 'X-CSRFToken': csrfToken() },
+            body: body,
+        }));
+
+        while (job.status === 'pending' || job.status === 'running') {
+            if (onProgress) {
+                onProgress(job);
+            }
+            await wait(POLL_INTERVAL);
+            job = await readJob(await fetch(job.status_url));
+        }
+
+        if (job.status !== 'completed') {
+            throw new Error(job.error || 'Failed to generate report');
+        }
+        window.location.href = job.download_url;
+        return job;
+    }
+
+    window.ReportJobs = { download: download };
+})();